@@ -0,0 +1,70 @@
+"""Run Pandoc from asyncio code without blocking the event loop."""
+
+import asyncio
+import contextlib
+import subprocess
+import weakref
+
+from .metrics import count_process_started
+from .prefetch import available_cpus
+from .timing import record_subprocess
+
+# Semaphores limiting the Pandoc processes run at once, keyed on the event
+# loop they belong to as asyncio primitives cannot be shared between loops
+_SEMAPHORES = weakref.WeakKeyDictionary()
+
+
+def get_semaphore(limit=None):
+    """Return the semaphore of the running event loop, creating it if needed.
+
+    limit defaults to the number of CPUs available and only applies when the
+    semaphore is created.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(limit or available_cpus())
+        _SEMAPHORES[loop] = semaphore
+    return semaphore
+
+
+async def run_pandoc(pandoc_cmd, content=None, limit=None):
+    """Run pandoc_cmd with content on its stdin and return its stdout.
+
+    Raises subprocess.CalledProcessError if Pandoc fails, as subprocess.run
+    does with check=True. Pandoc is killed if the calling task is cancelled.
+    """
+    async with get_semaphore(limit):
+        count_process_started()
+        process = await asyncio.create_subprocess_exec(
+            *pandoc_cmd,
+            stdin=subprocess.DEVNULL if content is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        record_subprocess(process.pid)
+        try:
+            stdout, stderr = await process.communicate(
+                None if content is None else content.encode("utf-8")
+            )
+        except asyncio.CancelledError:
+            with contextlib.suppress(ProcessLookupError):
+                process.kill()
+            await asyncio.shield(process.wait())
+            raise
+
+    stdout, stderr = decode_output(stdout), decode_output(stderr)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, pandoc_cmd, output=stdout, stderr=stderr
+        )
+    return stdout
+
+
+def decode_output(data):
+    """Decode output with the newline translation of subprocess.run.
+
+    The replacements return the decoded text itself when there are no
+    carriage returns, so output is only copied once in the usual case.
+    """
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
@@ -0,0 +1,221 @@
+"""Convert several articles sharing a Pandoc command line in a single run."""
+
+import dataclasses
+import os
+import subprocess
+import tempfile
+
+from .defaults import user_data_directory
+from .metrics import count_process_started
+from .resources import MeasuredPopen
+from .timing import record_subprocess, record_usage
+
+# Lua filter that reads, filters and writes each document of a batch
+BATCH_DRIVER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "filters", "batch.lua")
+)
+
+# Environment variable telling the driver where the documents of a batch are
+BATCH_DIRECTORY_VARIABLE = "PANDOC_READER_BATCH_DIR"
+
+# The driver relies on pandoc.utils.run_lua_filter added in Pandoc 3.2.1
+BATCH_MINIMUM_VERSION = (3, 2, 1)
+
+DEFAULT_BATCH_SIZE = 50
+
+# Options that change how documents are read or filtered in ways the driver
+# cannot reproduce, so articles converted with them are converted one by one
+UNBATCHABLE_ARGUMENTS = (
+    "--filter",
+    "-F",
+    "--metadata-file",
+    "--shift-heading-level-by",
+    "--base-header-level",
+    "--file-scope",
+    "--extract-media",
+)
+UNBATCHABLE_DEFAULTS = (
+    "metadata-file",
+    "metadata-files",
+    "shift-heading-level-by",
+    "file-scope",
+    "extract-media",
+    "input-file",
+    "input-files",
+)
+DEFAULTS_ARGUMENTS = ("--defaults", "-d")
+INPUT_FORMAT_ARGUMENTS = ("--from", "-f", "--read", "-r")
+LUA_FILTER_ARGUMENTS = ("--lua-filter", "-L")
+CITEPROC_ARGUMENTS = ("--citeproc", "-C")
+
+
+@dataclasses.dataclass(frozen=True)
+class BatchPlan:
+    """Input format and filters the driver applies to each document of a batch."""
+
+    input_format: str
+    steps: tuple = ()
+
+
+def get_batch_plan(pandoc_cmd, defaults=None):
+    """Return the BatchPlan for pandoc_cmd or None if it cannot be batched.
+
+    defaults holds the merged defaults files passed in pandoc_cmd, if any.
+    """
+    command_line = _parse_command_line(pandoc_cmd)
+    if command_line is None:
+        return None
+    input_format, steps, has_defaults = command_line
+
+    if has_defaults:
+        if defaults is None:
+            return None
+        input_format = defaults.get("reader") or defaults.get("from") or input_format
+
+        defaults_steps = _get_defaults_steps(defaults)
+        if defaults_steps is None:
+            return None
+        steps.extend(defaults_steps)
+
+    resolved_steps = []
+    for kind, path in steps:
+        if kind == "lua":
+            path = _find_lua_filter(path)
+            if path is None:
+                return None
+        resolved_steps.append((kind, path))
+
+    if not input_format:
+        return None
+    return BatchPlan(input_format=input_format, steps=tuple(resolved_steps))
+
+
+def convert_batch(pandoc_cmd, batch_plan, contents):
+    """Convert contents with pandoc_cmd in a single Pandoc run.
+
+    Return the output for each document in the order given, with None in
+    place of the documents that Pandoc failed to convert.
+    """
+    with tempfile.TemporaryDirectory(prefix="pandoc-reader-") as batch_directory:
+        _write(os.path.join(batch_directory, "format"), batch_plan.input_format)
+        _write(
+            os.path.join(batch_directory, "steps"),
+            "".join(
+                f"{kind} {path}\n" if path else f"{kind}\n"
+                for kind, path in batch_plan.steps
+            ),
+        )
+        for index, content in enumerate(contents, 1):
+            _write(os.path.join(batch_directory, f"{index}.md"), content)
+
+        # The driver runs first so that it sees the documents before any of
+        # the filters given on the command line
+        batch_cmd = [pandoc_cmd[0], f"--lua-filter={BATCH_DRIVER}", *pandoc_cmd[1:]]
+        count_process_started()
+        with MeasuredPopen(
+            batch_cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env={**os.environ, BATCH_DIRECTORY_VARIABLE: batch_directory},
+        ) as process:
+            record_subprocess(process.pid)
+            process.wait()
+        record_usage(process.usage)
+        if process.returncode != 0:
+            return [None] * len(contents)
+
+        outputs = []
+        for index in range(1, len(contents) + 1):
+            try:
+                with open(
+                    os.path.join(batch_directory, f"{index}.html"), encoding="utf-8"
+                ) as file_handle:
+                    outputs.append(file_handle.read())
+            except OSError:
+                outputs.append(None)
+        return outputs
+
+
+def _parse_command_line(pandoc_cmd):
+    """Return the input format, filters and use of defaults files in pandoc_cmd.
+
+    Return None if pandoc_cmd includes options that cannot be batched.
+    """
+    input_format = None
+    steps = []
+    has_defaults = False
+
+    arguments = iter(pandoc_cmd[1:])
+    for argument in arguments:
+        option, has_value, value = argument.partition("=")
+        if not option.startswith("--"):
+            # Short options may be directly followed by their value
+            option, has_value, value = option[:2], bool(option[2:]), option[2:]
+
+        if option in UNBATCHABLE_ARGUMENTS:
+            return None
+        if option in DEFAULTS_ARGUMENTS:
+            has_defaults = True
+        elif option in CITEPROC_ARGUMENTS:
+            steps.append(("citeproc", None))
+        elif option in INPUT_FORMAT_ARGUMENTS + LUA_FILTER_ARGUMENTS:
+            if not has_value:
+                value = next(arguments, "")
+            if option in INPUT_FORMAT_ARGUMENTS:
+                input_format = value
+            else:
+                steps.append(("lua", value))
+    return input_format, steps, has_defaults
+
+
+def _get_defaults_steps(defaults):
+    """Return the filters given in defaults or None if they cannot be batched."""
+    if any(key in defaults for key in UNBATCHABLE_DEFAULTS):
+        return None
+
+    filters = list(defaults.get("filters") or [])
+    if defaults.get("citeproc"):
+        if filters:
+            # Where citeproc runs among the other filters is ambiguous
+            return None
+        filters.append("citeproc")
+
+    steps = []
+    for defaults_filter in filters:
+        if isinstance(defaults_filter, dict):
+            filter_type = defaults_filter.get("type")
+            filter_path = defaults_filter.get("path") or ""
+        elif defaults_filter == "citeproc":
+            filter_type, filter_path = "citeproc", None
+        elif defaults_filter.endswith(".lua"):
+            filter_type, filter_path = "lua", defaults_filter
+        else:
+            filter_type, filter_path = "json", defaults_filter
+
+        if filter_type == "citeproc":
+            steps.append(("citeproc", None))
+        elif filter_type == "lua" and "${" not in filter_path:
+            steps.append(("lua", filter_path))
+        else:
+            return None
+    return steps
+
+
+def _find_lua_filter(path):
+    """Find a Lua filter the way Pandoc does, returning None if it is missing."""
+    path = os.path.expanduser(path)
+    candidates = [os.path.abspath(path)]
+    if not os.path.isabs(path):
+        candidates.append(os.path.join(user_data_directory(), "filters", path))
+
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _write(path, text):
+    """Write text to path encoded as UTF-8."""
+    with open(path, "w", encoding="utf-8", newline="") as file_handle:
+        file_handle.write(text)
@@ -0,0 +1,431 @@
+"""Benchmark the PandocReader on generated corpora of articles.
+
+Run with ``python -m pelican.plugins.pandoc_reader.benchmark --help`` to see
+the options. Results are written as JSON so that runs of successive versions
+can be compared.
+"""
+
+import argparse
+import concurrent.futures
+import dataclasses
+import datetime as dt
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+from pelican.settings import read_settings
+
+from .pandoc_reader import PandocReader
+from .resources import max_rss_bytes
+from .timing import finish_timings
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the layout of the results changes
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (100, 1000, 10000)
+
+# Settings keeping Pelican from warning about what the benchmark does not use
+BASE_SETTINGS = {"SITEURL": "https://example.com", "TIMEZONE": "UTC"}
+
+# Inline markup sentences of articles are given, and how often
+SENTENCE_MARKUP = ("emphasis", "link", "dash", None)
+SENTENCE_MARKUP_WEIGHTS = (2, 1, 1, 6)
+
+# Words the prose of articles is made of
+WORDS_TEXT = """
+about above across action after again against algorithm always among analysis
+answer approach argument article average because become before begin behind
+being below between both build cache case change check class close common
+compare complete content control could course data debate default design detail
+develop different document during early effect either energy enough error even
+every example field figure final follow force format function general given
+graph group however idea include input issue large later least level light
+likely little local measure method might model moment most much network never
+number often order output paper particle pattern people physics place point
+possible problem process program question quite range reader reason record
+result sample science second series several should simple since small source
+space speed stage state still string structure study system table test theory
+there these thing those though through time together toward under until value
+various version water while whole within without world would
+"""
+WORDS = WORDS_TEXT.split()
+CODE_BLOCK = """```python
+def {name}(values):
+    \"\"\"Return the {word} of values.\"\"\"
+    total = 0
+    for value in values:
+        total += value * {number}
+    return total / len(values)
+```"""
+DISPLAY_MATH = (
+    "$$\n\\int_0^{{{number}}} {letter}^2 \\, d{letter} = \\frac{{{number}^3}}{{3}}\n$$"
+)
+INLINE_MATH = "${letter}_{{{number}}} = \\sqrt{{{letter}^2 + {number}}}$"
+BIB_ENTRY = """@article{{{key},
+  title = {{{title}}},
+  author = {{{author}}},
+  journal = {{Journal of {journal}}},
+  year = {{{year}}},
+  volume = {{{volume}}},
+  pages = {{{first_page}--{last_page}}}
+}}
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class CorpusSpec:
+    """What the articles of a generated corpus are made of.
+
+    Each article has sections of paragraphs_per_section paragraphs, and
+    code_blocks, math and citations give how many of each every article
+    has, with citations taken from a bibliography generated for it.
+    """
+
+    articles: int = 100
+    paragraphs: int = 12
+    paragraphs_per_section: int = 3
+    words_per_paragraph: int = 80
+    code_blocks: int = 2
+    math: int = 2
+    citations: int = 0
+    table_of_contents: bool = False
+    seed: int = 0
+
+
+def generate_corpus(spec, content_path):
+    """Write the articles described by spec to content_path.
+
+    Returns the paths of the articles written, which are the same for the
+    same spec.
+    """
+    rng = random.Random(spec.seed)
+    os.makedirs(content_path, exist_ok=True)
+
+    source_paths = []
+    for number in range(spec.articles):
+        # Spread articles over directories as sites with many articles do
+        directory_path = os.path.join(content_path, f"{number // 100:03d}")
+        os.makedirs(directory_path, exist_ok=True)
+        stem = f"article-{number:05d}"
+
+        keys = []
+        if spec.citations:
+            keys = [f"{stem}-ref{index}" for index in range(spec.citations)]
+            _write(
+                os.path.join(directory_path, f"{stem}.bib"),
+                "\n".join(_bib_entry(rng, key) for key in keys),
+            )
+
+        source_path = os.path.join(directory_path, f"{stem}.md")
+        _write(source_path, _article(rng, spec, number, keys))
+        source_paths.append(source_path)
+    return source_paths
+
+
+def run_benchmark(spec, settings=None, trace_memory=False, work_path=None):
+    """Read a corpus generated from spec and return what it cost as a dict.
+
+    settings are added to the Pelican settings the articles are read with.
+    With trace_memory, the peak memory allocated by Python is traced too,
+    which slows reading down. The corpus is generated in a temporary
+    directory in work_path.
+    """
+    with tempfile.TemporaryDirectory(dir=work_path) as temp_path:
+        content_path = os.path.join(temp_path, "content")
+        source_paths = generate_corpus(spec, content_path)
+        source_bytes = sum(os.path.getsize(path) for path in source_paths)
+
+        arguments = ["--mathjax", "--wrap=none"]
+        if spec.table_of_contents:
+            arguments.append("--toc")
+        if spec.citations:
+            arguments.append("--citeproc")
+        pelican_settings = read_settings(
+            override={
+                **BASE_SETTINGS,
+                "PATH": content_path,
+                "CACHE_PATH": os.path.join(temp_path, "cache"),
+                "PANDOC_ARGS": arguments,
+                "PANDOC_EXTENSIONS": ["+smart"],
+                **(settings or {}),
+                "PANDOC_TIMINGS": True,
+            }
+        )
+
+        gc.collect()
+        if trace_memory:
+            tracemalloc.start()
+        start_time = time.perf_counter()
+        start_cpu_time = time.process_time()
+
+        reader = PandocReader(pelican_settings)
+        output_bytes = 0
+        for source_path in source_paths:
+            output, _ = reader.read(source_path)
+            # Deferred bodies are converted as Pelican would for writing them
+            output_bytes += len(str(output).encode("utf-8"))
+
+        seconds = time.perf_counter() - start_time
+        cpu_seconds = time.process_time() - start_cpu_time
+        python_peak = None
+        if trace_memory:
+            python_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    timings = finish_timings(pelican_settings).report()
+    return {
+        "spec": dataclasses.asdict(spec),
+        "settings": settings or {},
+        "documents": len(source_paths),
+        "source_bytes": source_bytes,
+        "output_bytes": output_bytes,
+        "seconds": seconds,
+        "cpu_seconds": cpu_seconds,
+        "documents_per_second": len(source_paths) / seconds if seconds else None,
+        "bytes_per_second": source_bytes / seconds if seconds else None,
+        "per_document": timings["per_article"],
+        "stages": timings["stages"],
+        # CPU time, peak memory and page faults of the Pandoc processes
+        "pandoc_resources": timings.get("resources"),
+        "memory": {
+            "python_peak": python_peak,
+            "max_rss": _max_rss(resource.RUSAGE_SELF) if resource else None,
+            "children_max_rss": (
+                _max_rss(resource.RUSAGE_CHILDREN) if resource else None
+            ),
+        },
+    }
+
+
+def run_isolated(spec, settings=None, trace_memory=False, work_path=None):
+    """Call run_benchmark() in a new process, keeping peak memory to the run."""
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(
+            run_benchmark, spec, settings, trace_memory, work_path
+        ).result()
+
+
+def describe_environment():
+    """Return what the results of a run depend on besides the corpus."""
+    probe_settings = read_settings(override=BASE_SETTINGS)
+    pandoc_executable, pandoc_info = PandocReader(probe_settings)._get_pandoc()
+    return {
+        "date": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandoc_executable": pandoc_executable,
+        "pandoc_version": pandoc_info.version,
+    }
+
+
+def main(argv=None):
+    """Benchmark reading corpora of the sizes given on the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m pelican.plugins.pandoc_reader.benchmark",
+        description="Benchmark the PandocReader on generated corpora.",
+    )
+    defaults = CorpusSpec()
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=list(DEFAULT_SIZES),
+        help="numbers of articles to read, one run for each",
+    )
+    parser.add_argument("--paragraphs", type=int, default=defaults.paragraphs)
+    parser.add_argument(
+        "--words-per-paragraph", type=int, default=defaults.words_per_paragraph
+    )
+    parser.add_argument("--code-blocks", type=int, default=defaults.code_blocks)
+    parser.add_argument("--math", type=int, default=defaults.math)
+    parser.add_argument("--citations", type=int, default=defaults.citations)
+    parser.add_argument("--toc", action="store_true", help="request a ToC")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument(
+        "--setting",
+        action="append",
+        default=[],
+        metavar="NAME=JSON",
+        help="Pelican setting to read with, given as JSON, for example"
+        " PANDOC_BACKEND='\"lua\"'",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also trace the peak memory allocated by Python, which is slower",
+    )
+    parser.add_argument(
+        "--output", default="benchmark.json", help="file to write results to"
+    )
+    options = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    settings = {}
+    for setting in options.setting:
+        name, _, value = setting.partition("=")
+        settings[name] = json.loads(value)
+
+    results = {"version": RESULTS_VERSION, "environment": describe_environment()}
+    results["runs"] = []
+    for size in options.sizes:
+        spec = CorpusSpec(
+            articles=size,
+            paragraphs=options.paragraphs,
+            words_per_paragraph=options.words_per_paragraph,
+            code_blocks=options.code_blocks,
+            math=options.math,
+            citations=options.citations,
+            table_of_contents=options.toc,
+            seed=options.seed,
+        )
+        run = run_isolated(spec, settings, options.trace_memory)
+        results["runs"].append(run)
+        logger.info(
+            "%d articles: %.2f s, %.1f articles/s, max RSS %s, Pandoc max RSS %s",
+            size,
+            run["seconds"],
+            run["documents_per_second"],
+            _format_bytes(run["memory"]["max_rss"]),
+            _format_bytes(run["memory"]["children_max_rss"]),
+        )
+
+    with open(options.output, "w", encoding="utf-8") as file_handle:
+        json.dump(results, file_handle, indent=1)
+    logger.info("Results written to %s", options.output)
+
+
+def _article(rng, spec, number, keys):
+    """Return the Markdown source of an article."""
+    blocks = []
+    for index in range(spec.paragraphs):
+        if index % max(spec.paragraphs_per_section, 1) == 0:
+            blocks.append(f"## {_sentence(rng, 4)[:-1]}")
+        blocks.append(_paragraph(rng, spec.words_per_paragraph))
+
+    # Spread code, math and citations over the paragraphs
+    paragraph_indexes = [
+        index for index, block in enumerate(blocks) if not block.startswith("#")
+    ]
+    for count, make in (
+        (spec.code_blocks, _code_block),
+        (spec.math, _display_math),
+    ):
+        for _ in range(count):
+            index = rng.choice(paragraph_indexes)
+            blocks[index] += "\n\n" + make(rng)
+    for index, key in enumerate(keys):
+        paragraph = paragraph_indexes[index % len(paragraph_indexes)]
+        blocks[paragraph] += f" See [@{key}, p. {rng.randint(1, 300)}]."
+    for _ in range(spec.math):
+        index = rng.choice(paragraph_indexes)
+        blocks[index] += (
+            " With "
+            + INLINE_MATH.format(letter=rng.choice("xyz"), number=rng.randint(1, 9))
+            + "."
+        )
+
+    date = dt.date(2020, 1, 1) + dt.timedelta(days=number % 1000)
+    front_matter = [
+        "---",
+        f"title: {_sentence(rng, 5)[:-1]}",
+        "author: Benchmark Author",
+        f"date: {date.isoformat()}",
+        f"tags: [{', '.join(rng.sample(WORDS, 3))}]",
+        f"summary: {_sentence(rng, 15)}",
+        "---",
+    ]
+    return "\n".join(front_matter) + "\n\n" + "\n\n".join(blocks) + "\n"
+
+
+def _sentence(rng, length):
+    """Return a sentence of length words."""
+    words = rng.choices(WORDS, k=length)
+    return " ".join(words).capitalize() + "."
+
+
+def _paragraph(rng, length):
+    """Return a paragraph of about length words with some inline markup."""
+    sentences = []
+    while length > 0:
+        sentence_length = min(rng.randint(8, 20), length)
+        sentence = _sentence(rng, sentence_length)
+        markup = rng.choices(SENTENCE_MARKUP, SENTENCE_MARKUP_WEIGHTS)[0]
+        if markup == "emphasis":
+            word = rng.choice(WORDS)
+            sentence = sentence.replace(f" {word} ", f" *{word}* ", 1)
+        elif markup == "link":
+            word = rng.choice(WORDS)
+            sentence = sentence.replace(
+                f" {word} ", f" [{word}](https://example.com/{word}) ", 1
+            )
+        elif markup == "dash":
+            sentence = sentence[:-1] + " -- or so it seems."
+        sentences.append(sentence)
+        length -= sentence_length
+    return " ".join(sentences)
+
+
+def _code_block(rng):
+    """Return a fenced code block."""
+    return CODE_BLOCK.format(
+        name=f"{rng.choice(WORDS)}_{rng.choice(WORDS)}",
+        word=rng.choice(WORDS),
+        number=rng.randint(2, 99),
+    )
+
+
+def _display_math(rng):
+    """Return a display math block."""
+    return DISPLAY_MATH.format(letter=rng.choice("xyz"), number=rng.randint(2, 9))
+
+
+def _bib_entry(rng, key):
+    """Return a BibTeX entry for key."""
+    first_page = rng.randint(1, 500)
+    return BIB_ENTRY.format(
+        key=key,
+        title=_sentence(rng, 6)[:-1],
+        author=f"{rng.choice(WORDS).capitalize()}, {rng.choice('ABCDEFGH')}.",
+        journal=rng.choice(WORDS).capitalize(),
+        year=rng.randint(1950, 2024),
+        volume=rng.randint(1, 80),
+        first_page=first_page,
+        last_page=first_page + rng.randint(1, 30),
+    )
+
+
+def _write(path, text):
+    """Write text to the file at path."""
+    with open(path, "w", encoding="utf-8") as file_handle:
+        file_handle.write(text)
+
+
+def _max_rss(who):
+    """Return the peak resident set size of this process or its children in bytes."""
+    return max_rss_bytes(resource.getrusage(who).ru_maxrss)
+
+
+def _format_bytes(size):
+    """Return a size in bytes in megabytes for printing."""
+    return "n/a" if size is None else f"{size / 2**20:.1f} MB"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Index of bibliography files used to find the bibliography of each article."""
+
+import collections
+import hashlib
+import os
+import subprocess
+import threading
+
+from .cache import atomic_write, file_digest
+from .metrics import count_process_started
+
+VALID_BIB_EXTENSIONS = ["json", "yaml", "bibtex", "bib"]
+
+# Pandoc input formats of bibliographies worth converting to CSL JSON,
+# matching the formats Pandoc itself assumes for these extensions
+CONVERTIBLE_BIB_FORMATS = {".bib": "biblatex", ".bibtex": "bibtex"}
+
+# Custom writer that keeps the rich text markup Pandoc's csljson writer drops
+CSL_JSON_WRITER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "writers", "csljson.lua")
+)
+
+# The writer relies on the pandoc.json module added in Pandoc 3.1.1
+CSL_JSON_WRITER_MINIMUM_VERSION = (3, 1, 1)
+
+# Directory trees indexed so far, keyed on the absolute path of their root
+_TREES = {}
+_TREES_LOCK = threading.Lock()
+
+_Directory = collections.namedtuple("_Directory", ["mtime", "bibs", "subdirectories"])
+
+
+def convert_to_csl_json(pandoc_executable, bib_path, cache_path):
+    """Return the path of a CSL JSON copy of a BibTeX or BibLaTeX bibliography.
+
+    Parsing BibTeX is the slowest part of processing citations, so each
+    bibliography is converted once by Pandoc and stored in cache_path under
+    the digest of its contents. Other bibliographies are returned unchanged,
+    as are those Pandoc fails to convert so that the error is reported when
+    the article itself is converted.
+    """
+    bib_format = CONVERTIBLE_BIB_FORMATS.get(os.path.splitext(bib_path)[1])
+    if bib_format is None:
+        return bib_path
+
+    csl_json_digest = hashlib.sha256(
+        f"{file_digest(bib_path)}:{file_digest(CSL_JSON_WRITER)}".encode()
+    ).hexdigest()
+    csl_json_path = os.path.join(cache_path, "csl-json", f"{csl_json_digest}.json")
+    if not os.path.exists(csl_json_path):
+        count_process_started()
+        output = subprocess.run(
+            [
+                pandoc_executable,
+                "--from",
+                bib_format,
+                "--to",
+                CSL_JSON_WRITER,
+                bib_path,
+            ],
+            capture_output=True,
+            encoding="utf-8",
+            check=False,
+        )
+        if output.returncode != 0:
+            return bib_path
+        atomic_write(csl_json_path, output.stdout)
+    return csl_json_path
+
+
+class BibliographyIndex:
+    """Find bibliographies named after an article in and below its directory.
+
+    All bibliographies under the content path are indexed in a single walk
+    the first time one is looked up, after which each lookup is a dictionary
+    access. The index is shared by all readers and is brought up to date by
+    each new reader, re-listing only those directories whose modification
+    time has changed since they were indexed.
+    """
+
+    def __init__(self, content_path):
+        """Index bibliographies under content_path."""
+        self.content_path = os.path.abspath(content_path)
+        self._refreshed = set()
+
+    def find(self, source_path):
+        """Return bibliographies named like source_path in and below its directory."""
+        filename = os.path.splitext(os.path.basename(source_path))[0]
+        directory_path = os.path.dirname(os.path.abspath(source_path))
+
+        tree = self._get_tree(directory_path)
+        return [
+            bib_path
+            for bib_directory, bib_path in tree.find(filename)
+            if bib_directory == directory_path
+            or bib_directory.startswith(directory_path + os.sep)
+        ]
+
+    def _get_tree(self, directory_path):
+        """Return the indexed tree that directory_path belongs to."""
+        with _TREES_LOCK:
+            root = None
+            for candidate in (self.content_path, *_TREES):
+                if directory_path == candidate or directory_path.startswith(
+                    candidate + os.sep
+                ):
+                    root = candidate
+                    break
+            if root is None:
+                # Files outside the content path get a tree of their own
+                root = directory_path
+
+            tree = _TREES.get(root)
+            if tree is None:
+                tree = _TREES[root] = _BibliographyTree(root)
+                self._refreshed.add(root)
+
+        if root not in self._refreshed:
+            tree.refresh()
+            self._refreshed.add(root)
+        return tree
+
+
+class _BibliographyTree:
+    """Bibliographies found in a directory and all of its subdirectories."""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._directories = {}
+        self._stems = {}
+        with self._lock:
+            self._scan_tree(root)
+            self._build_stems()
+
+    def find(self, stem):
+        """Return (directory, path) pairs of bibliographies with the given stem."""
+        with self._lock:
+            return self._stems.get(stem, ())
+
+    def refresh(self):
+        """Re-list directories that have changed since they were indexed."""
+        with self._lock:
+            changed = False
+            for directory_path, directory in list(self._directories.items()):
+                if directory_path not in self._directories:
+                    # Removed along with a parent directory that disappeared
+                    continue
+                try:
+                    mtime = os.stat(directory_path).st_mtime_ns
+                except OSError:
+                    mtime = None
+
+                if mtime is None:
+                    changed = True
+                    self._remove_tree(directory_path)
+                elif mtime != directory.mtime:
+                    changed = True
+                    subdirectories = self._index_directory(directory_path)
+                    for subdirectory in directory.subdirectories:
+                        if subdirectory not in subdirectories:
+                            self._remove_tree(
+                                os.path.join(directory_path, subdirectory)
+                            )
+                    for subdirectory in subdirectories:
+                        if subdirectory not in directory.subdirectories:
+                            self._scan_tree(os.path.join(directory_path, subdirectory))
+
+            if changed:
+                self._build_stems()
+
+    def _scan_tree(self, top):
+        """Index top and all directories below it."""
+        pending = [top]
+        while pending:
+            directory_path = pending.pop()
+            pending.extend(
+                os.path.join(directory_path, subdirectory)
+                for subdirectory in self._index_directory(directory_path)
+            )
+
+    def _index_directory(self, directory_path):
+        """Index the files in directory_path and return its subdirectories."""
+        try:
+            mtime = os.stat(directory_path).st_mtime_ns
+            with os.scandir(directory_path) as entries:
+                entries = list(entries)
+        except OSError:
+            # Unreadable directories are skipped just like os.walk does
+            self._directories.pop(directory_path, None)
+            return ()
+
+        file_names = set()
+        subdirectories = []
+        for entry in entries:
+            try:
+                is_directory = entry.is_dir()
+            except OSError:
+                is_directory = False
+
+            # Like os.walk, do not descend into symbolic links to directories
+            if not is_directory:
+                file_names.add(entry.name)
+            elif not entry.is_symlink():
+                subdirectories.append(entry.name)
+
+        bibs = collections.defaultdict(list)
+        for stem in {os.path.splitext(file_name)[0] for file_name in file_names}:
+            for extension in VALID_BIB_EXTENSIONS:
+                bib_name = f"{stem}.{extension}"
+                if bib_name in file_names:
+                    bibs[stem].append(bib_name)
+
+        subdirectories = tuple(subdirectories)
+        self._directories[directory_path] = _Directory(
+            mtime, dict(bibs), subdirectories
+        )
+        return subdirectories
+
+    def _remove_tree(self, top):
+        """Forget top and all directories below it."""
+        directory = self._directories.pop(top, None)
+        if directory is not None:
+            for subdirectory in directory.subdirectories:
+                self._remove_tree(os.path.join(top, subdirectory))
+
+    def _build_stems(self):
+        """Map each stem to its bibliographies in the order os.walk finds them."""
+        stems = collections.defaultdict(list)
+        pending = [self.root]
+        while pending:
+            directory_path = pending.pop()
+            directory = self._directories.get(directory_path)
+            if directory is None:
+                continue
+
+            for stem, bib_names in directory.bibs.items():
+                stems[stem].extend(
+                    (directory_path, os.path.join(directory_path, bib_name))
+                    for bib_name in bib_names
+                )
+
+            # Visit subdirectories depth first and in listing order
+            pending.extend(
+                os.path.join(directory_path, subdirectory)
+                for subdirectory in reversed(directory.subdirectories)
+            )
+        self._stems = {stem: tuple(paths) for stem, paths in stems.items()}
@@ -0,0 +1,87 @@
+"""On-disk cache for content converted by the PandocReader."""
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import tempfile
+
+CACHE_DIRECTORY_NAME = "pandoc-reader"
+
+# Digests of files that take part in cache keys, e.g. the HTML template,
+# bibliographies and defaults files, keyed on (path, mtime, size) so that
+# each one is hashed at most once per build
+_FILE_DIGESTS = {}
+
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of the contents of the given file."""
+    path = os.path.abspath(path)
+    stat_result = os.stat(path)
+    stamp = (path, stat_result.st_mtime_ns, stat_result.st_size)
+
+    digest = _FILE_DIGESTS.get(stamp)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, "rb") as file_handle:
+            for chunk in iter(lambda: file_handle.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        _FILE_DIGESTS[stamp] = digest
+    return digest
+
+
+def atomic_write(path, data):
+    """Write data to path so that readers never observe a partial file."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    # Write to a temporary file in the same directory and rename it over the
+    # destination, which is atomic on POSIX and Windows alike
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file_handle:
+            file_handle.write(data)
+            if hasattr(os, "fchmod"):
+                # mkstemp() creates files only their owner may read, whereas
+                # files such as metrics are read by other users' processes
+                os.fchmod(file_descriptor, 0o666 & ~_umask())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+@functools.cache
+def _umask():
+    """Return the umask of the process, which can only be read by setting it."""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+class PandocCache:
+    """Content-addressed store of converted articles."""
+
+    def __init__(self, cache_path):
+        """Store entries under the given directory."""
+        self.cache_path = cache_path
+
+    def get(self, key):
+        """Return the entry stored under key or None if there is none."""
+        try:
+            with open(self._entry_path(key), encoding="utf-8") as file_handle:
+                return json.load(file_handle)
+        except (OSError, ValueError):
+            # Missing or unreadable entries are treated as a cache miss
+            return None
+
+    def set(self, key, entry):
+        """Store the entry under key."""
+        atomic_write(self._entry_path(key), json.dumps(entry))
+
+    def _entry_path(self, key):
+        """Return the path of the file holding the entry for key."""
+        return os.path.join(self.cache_path, key[:2], f"{key}.json")
@@ -0,0 +1,235 @@
+"""Load and merge Pandoc defaults files."""
+
+import dataclasses
+import os
+import re
+import threading
+
+from ruamel.yaml import YAML, constructor
+
+DEFAULTS_FILE_EXTENSION = ".yaml"
+
+# Keys whose values are maps that Pandoc merges rather than replaces
+MERGED_KEYS = ("metadata", "variables")
+
+# Keys whose values are lists that Pandoc concatenates rather than replaces,
+# taking a single value as a list of one
+CONCATENATED_KEYS = (
+    "bibliography",
+    "css",
+    "epub-fonts",
+    "filters",
+    "include-after-body",
+    "include-before-body",
+    "include-in-header",
+    "input-files",
+    "metadata-files",
+    "resource-path",
+    "syntax-definitions",
+)
+
+# Keys whose values are file paths, or lists of them, in which Pandoc expands
+# ${.}, ${USERDATA} and environment variables
+PATH_KEYS = (
+    "abbreviations",
+    "bibliography",
+    "citation-abbreviations",
+    "csl",
+    "css",
+    "epub-cover-image",
+    "epub-fonts",
+    "epub-metadata",
+    "extract-media",
+    "filters",
+    "highlight-style",
+    "include-after-body",
+    "include-before-body",
+    "include-in-header",
+    "input-file",
+    "input-files",
+    "log-file",
+    "metadata-file",
+    "metadata-files",
+    "output-file",
+    "reference-doc",
+    "resource-path",
+    "syntax-definition",
+    "syntax-definitions",
+    "template",
+)
+
+# Merged defaults, keyed on the tuple of defaults files given in the settings
+_RESOLVED_DEFAULTS = {}
+_RESOLVED_DEFAULTS_LOCK = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class ResolvedDefaults:
+    """Merged contents of one or more defaults files."""
+
+    defaults: dict
+    stamps: tuple
+
+    @property
+    def files(self):
+        """Return the paths of all defaults files including nested ones."""
+        return tuple(path for path, _ in self.stamps)
+
+    def is_current(self):
+        """Check that none of the defaults files changed since they were read."""
+        try:
+            return all(_mtime(path) == mtime for path, mtime in self.stamps)
+        except OSError:
+            return False
+
+
+def resolve_defaults(defaults_files):
+    """Return the merged contents of the given defaults files.
+
+    Files are parsed once and the result is reused until one of them, or a
+    file included from one of them through the defaults key, is modified.
+    """
+    key = tuple(os.path.abspath(defaults_file) for defaults_file in defaults_files)
+
+    with _RESOLVED_DEFAULTS_LOCK:
+        resolved = _RESOLVED_DEFAULTS.get(key)
+        if resolved is not None and resolved.is_current():
+            return resolved
+
+    defaults = {}
+    stamps = []
+    for defaults_file in key:
+        file_defaults = _load_defaults_file(defaults_file, stamps, ())
+
+        # The same key in separate defaults files leads to unexpected output
+        if set(defaults).intersection(file_defaults):
+            raise ValueError("Duplicate keys defined in multiple defaults files.")
+        defaults.update(file_defaults)
+
+    resolved = ResolvedDefaults(defaults=defaults, stamps=tuple(stamps))
+    with _RESOLVED_DEFAULTS_LOCK:
+        _RESOLVED_DEFAULTS[key] = resolved
+    return resolved
+
+
+def _load_defaults_file(defaults_file, stamps, including_files):
+    """Load a defaults file, merging in any defaults files it includes."""
+    if defaults_file in including_files:
+        raise ValueError(f"Defaults file {defaults_file} includes itself.")
+
+    stamps.append((defaults_file, _mtime(defaults_file)))
+    with open(defaults_file, encoding="utf-8") as file_handle:
+        try:
+            file_defaults = YAML().load(file_handle) or {}
+        except constructor.DuplicateKeyError as duplicate_key_error:
+            raise ValueError(
+                "Duplicate keys defined in multiple defaults files."
+            ) from duplicate_key_error
+
+    _expand_paths(file_defaults, defaults_file)
+
+    included_files = file_defaults.pop("defaults", None) or []
+    if isinstance(included_files, str):
+        included_files = [included_files]
+
+    # Included files are applied first so that the including file takes precedence
+    defaults = {}
+    for included_file in included_files:
+        included_path = _find_defaults_file(included_file, defaults_file)
+        _merge(
+            defaults,
+            _load_defaults_file(
+                included_path, stamps, (*including_files, defaults_file)
+            ),
+        )
+    _merge(defaults, file_defaults)
+    return defaults
+
+
+def _merge(defaults, new_defaults):
+    """Merge new_defaults into defaults the way Pandoc does."""
+    for key, value in new_defaults.items():
+        if key in MERGED_KEYS and isinstance(defaults.get(key), dict):
+            defaults[key] = {**defaults[key], **value}
+        elif key in CONCATENATED_KEYS and defaults.get(key) is not None:
+            defaults[key] = [*_as_list(defaults[key]), *_as_list(value)]
+        else:
+            defaults[key] = value
+
+
+def _as_list(value):
+    """Return the value of a list option, which may be given as a single value."""
+    if value is None:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+
+def _expand_paths(file_defaults, defaults_file):
+    """Expand variables in the paths given in the defaults file at defaults_file."""
+    for key in PATH_KEYS:
+        value = file_defaults.get(key)
+        if isinstance(value, str):
+            file_defaults[key] = _expand_path(value, defaults_file)
+        elif isinstance(value, list):
+            file_defaults[key] = [
+                _expand_path(item, defaults_file) if isinstance(item, str) else item
+                for item in value
+            ]
+            for item in file_defaults[key]:
+                # Filters may be given as maps with their type and path
+                if isinstance(item, dict) and isinstance(item.get("path"), str):
+                    item["path"] = _expand_path(item["path"], defaults_file)
+
+
+def _expand_path(path, defaults_file):
+    """Expand variables in a path given in the defaults file at defaults_file."""
+    # ${.} refers to the directory containing the defaults file
+    path = path.replace("${.}", os.path.dirname(defaults_file))
+    path = path.replace("${USERDATA}", user_data_directory())
+    return _expand_variables(path)
+
+
+def _find_defaults_file(name, including_file):
+    """Find a defaults file included from another defaults file."""
+    name = os.path.expanduser(_expand_path(name, including_file))
+    if not os.path.splitext(name)[1]:
+        name += DEFAULTS_FILE_EXTENSION
+
+    # Pandoc looks in the working directory first and then in the
+    # defaults directory of the user data directory
+    candidates = [os.path.abspath(name)]
+    if not os.path.isabs(name):
+        candidates.append(os.path.join(user_data_directory(), "defaults", name))
+
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    raise ValueError(f"Could not find defaults file {name}.")
+
+
+def _expand_variables(value):
+    """Expand ${VARIABLE} references to environment variables."""
+    return re.sub(
+        r"\$\{(\w+)\}",
+        lambda match: os.environ.get(match.group(1), match.group(0)),
+        value,
+    )
+
+
+def user_data_directory():
+    """Return the Pandoc user data directory."""
+    xdg_data_home = os.environ.get("XDG_DATA_HOME") or os.path.expanduser(
+        os.path.join("~", ".local", "share")
+    )
+    data_directory = os.path.join(xdg_data_home, "pandoc")
+    if not os.path.isdir(data_directory):
+        # Pandoc falls back to the legacy location if the XDG one is missing
+        legacy_directory = os.path.expanduser(os.path.join("~", ".pandoc"))
+        if os.path.isdir(legacy_directory):
+            return legacy_directory
+    return data_directory
+
+
+def _mtime(path):
+    """Return the modification time of path in nanoseconds."""
+    return os.stat(path).st_mtime_ns
@@ -0,0 +1,108 @@
+"""Content whose body is only converted by Pandoc once it is first needed."""
+
+import mmap
+import threading
+
+from pelican.readers import find_empty_alt
+
+# Words that the links Pelican copies static files for are marked with
+STATIC_LINK_MARKERS = ("static", "attach")
+
+
+class DeferredContent:
+    """The body of an article, converted the first time it is asked for.
+
+    Pelican's readers look at the content they are given before creating
+    the content object, so deferred content is false until it is rendered
+    for them to leave it as it is. Calling str() renders it. Pickling it,
+    as Pelican's content cache does, pickles the rendered body.
+    """
+
+    def __init__(self, render, source_path, may_link_static):
+        """Defer the body returned by calling render().
+
+        may_link_static tells if the body may hold links to static files,
+        which Pelican needs to know about before the body is used.
+        """
+        self.source_path = source_path
+        self.may_link_static = may_link_static
+        self._render = render
+        self._lock = threading.Lock()
+        self._text = None
+
+    def __str__(self):
+        """Return the body, rendering it if it has not been yet."""
+        return self.render()
+
+    def __bool__(self):
+        """Check if the body has been rendered and is not empty."""
+        return bool(self._text)
+
+    def __reduce__(self):
+        """Pickle the body as a string."""
+        return str, (self.render(),)
+
+    @property
+    def rendered(self):
+        """Check if the body has been rendered."""
+        return self._text is not None
+
+    def render(self):
+        """Return the body, running Pandoc the first time it is asked for."""
+        with self._lock:
+            if self._text is None:
+                self._text = self._render()
+                self._render = None
+        return self._text
+
+    def attach(self, content_object):
+        """Have the Pelican content object holding this render it when needed.
+
+        The body is rendered when the content object is first asked for it,
+        and also when it is asked for the static files the body links to,
+        unless it cannot link to any.
+        """
+
+        def get_content():
+            return self._resolve(content_object)._content
+
+        def get_static_links():
+            if not self.may_link_static and not self.rendered:
+                return set()
+            return self._resolve(content_object).get_static_links()
+
+        content_object._get_content = get_content
+        content_object.get_static_links = get_static_links
+
+    def _resolve(self, content_object):
+        """Put the rendered body in place of this in content_object."""
+        text = self.render()
+        if content_object._content is self:
+            # Warn about images without alt text as Pelican's readers do
+            find_empty_alt(text, self.source_path)
+            content_object._content = text
+            del content_object._get_content
+            del content_object.get_static_links
+        return content_object
+
+
+def mentions_static_links(content=None, source_path=None):
+    """Check if a source mentions any of the STATIC_LINK_MARKERS.
+
+    Looks in content if given, or else in the file at source_path. Bodies
+    of sources that do not mention them cannot link to static files.
+    """
+    if content is not None:
+        return any(marker in content for marker in STATIC_LINK_MARKERS)
+
+    with open(source_path, "rb") as file_handle:
+        try:
+            mapped_file = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return False
+        with mapped_file:
+            return any(
+                mapped_file.find(marker.encode()) != -1
+                for marker in STATIC_LINK_MARKERS
+            )
@@ -0,0 +1,275 @@
+"""Track the files other than its source that each article is converted with."""
+
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+
+from .cache import atomic_write, file_digest
+from .defaults import resolve_defaults, user_data_directory
+
+logger = logging.getLogger(__name__)
+
+DEPENDENCY_GRAPH_FILE_NAME = "dependencies.json"
+
+# Options naming files Pandoc reads, with the subdirectory of the user data
+# directory Pandoc looks in when they are not found in the working directory
+FILE_OPTIONS = {
+    "--bibliography": None,
+    "--citation-abbreviations": None,
+    "--csl": "csl",
+    "--defaults": "defaults",
+    "--filter": "filters",
+    "--include-after-body": None,
+    "--include-before-body": None,
+    "--include-in-header": None,
+    "--lua-filter": "filters",
+    "--metadata-file": "metadata",
+    "--syntax-definition": None,
+    "--template": "templates",
+}
+SHORT_OPTIONS = {
+    "-A": "--include-after-body",
+    "-B": "--include-before-body",
+    "-F": "--filter",
+    "-H": "--include-in-header",
+    "-L": "--lua-filter",
+    "-d": "--defaults",
+}
+
+# Extensions Pandoc adds to the files given to options without one
+DEFAULT_EXTENSIONS = {"--csl": ".csl", "--template": ".html5"}
+
+# Files given as URLs, which Pandoc fetches
+URL_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*://")
+
+# Options whose files are also looked up in the resource path
+RESOURCE_PATH_OPTIONS = ("--bibliography", "--citation-abbreviations", "--csl")
+
+# Keys of defaults files naming files, where they differ from the options
+DEFAULTS_KEYS = {
+    "filters": "--filter",
+    "metadata-files": "--metadata-file",
+    "syntax-definitions": "--syntax-definition",
+}
+
+# Dependency graphs keyed on the cache directory they are stored in
+_GRAPHS = {}
+_GRAPHS_LOCK = threading.Lock()
+
+
+def find_dependencies(pandoc_cmd):
+    """Return the absolute paths of the files Pandoc reads to run pandoc_cmd.
+
+    Covers files given to the options in FILE_OPTIONS on the command line or
+    in defaults files, including the defaults files themselves. URLs are
+    left out. Returns None if any of the files cannot be found, as what is
+    converted with pandoc_cmd cannot then be told apart from what was
+    converted with other versions of that file.
+    """
+    named_files = _parse_options(pandoc_cmd[1:])
+    resource_paths = named_files.pop("--resource-path", [])
+
+    dependencies = set()
+    defaults_files = []
+    for name in named_files.pop("--defaults", []):
+        path = _find_file("--defaults", name, resource_paths)
+        if path is None:
+            return None
+        defaults_files.append(path)
+    if defaults_files:
+        resolved = resolve_defaults(defaults_files)
+        dependencies.update(resolved.files)
+        for key, value in resolved.defaults.items():
+            option = DEFAULTS_KEYS.get(key, f"--{key}")
+            if option in FILE_OPTIONS:
+                named_files.setdefault(option, []).extend(_defaults_paths(value))
+        resource_paths.extend(_defaults_paths(resolved.defaults.get("resource-path")))
+
+    for option, names in named_files.items():
+        for name in names:
+            if (option == "--filter" and name == "citeproc") or URL_PATTERN.match(name):
+                continue
+            path = _find_file(option, name, resource_paths)
+            if path is None:
+                return None
+            dependencies.add(path)
+    return sorted(dependencies)
+
+
+def get_dependency_graph(cache_path):
+    """Return the dependency graph stored in cache_path, loading it if needed."""
+    with _GRAPHS_LOCK:
+        graph = _GRAPHS.get(cache_path)
+        if graph is None:
+            graph = DependencyGraph(
+                os.path.join(cache_path, DEPENDENCY_GRAPH_FILE_NAME)
+            )
+            _GRAPHS[cache_path] = graph
+            changed = graph.changed()
+            if changed:
+                logger.info(
+                    "%d articles depend on files changed since the last build: %s",
+                    len(graph.dependents(*changed)),
+                    ", ".join(changed),
+                )
+        return graph
+
+
+def save_dependency_graphs():
+    """Write out the dependency graphs changed since they were loaded."""
+    with _GRAPHS_LOCK:
+        graphs = list(_GRAPHS.values())
+        _GRAPHS.clear()
+    for graph in graphs:
+        graph.save()
+
+
+class DependencyGraph:
+    """Reverse index from the files articles depend on to the articles.
+
+    Stored as JSON giving, for each dependency, its digest when articles
+    were last converted with it and the articles depending on it.
+    """
+
+    def __init__(self, path):
+        """Load the graph stored at path, starting afresh if there is none."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._modified = False
+        self._digests = {}
+        self._articles = {}
+
+        try:
+            with open(path, encoding="utf-8") as file_handle:
+                stored = json.load(file_handle)["dependencies"]
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing or unreadable graphs are rebuilt as articles are read
+            stored = {}
+
+        for dependency, record in stored.items():
+            self._digests[dependency] = record["digest"]
+            for article in record["articles"]:
+                self._articles.setdefault(article, set()).add(dependency)
+
+    def record(self, source_path, dependencies):
+        """Record the files the article at source_path was converted with."""
+        source_path = os.path.abspath(source_path)
+        digests = {path: file_digest(path) for path in dependencies}
+        with self._lock:
+            if self._articles.get(source_path) == set(digests) and all(
+                self._digests.get(path) == digest for path, digest in digests.items()
+            ):
+                return
+            self._articles[source_path] = set(digests)
+            self._digests.update(digests)
+            self._modified = True
+
+    def dependencies(self, source_path):
+        """Return the files the article at source_path depends on."""
+        with self._lock:
+            return sorted(self._articles.get(os.path.abspath(source_path), ()))
+
+    def dependents(self, *paths):
+        """Return the articles depending on any of the files at paths."""
+        paths = {os.path.abspath(path) for path in paths}
+        with self._lock:
+            return sorted(
+                article
+                for article, dependencies in self._articles.items()
+                if not paths.isdisjoint(dependencies)
+            )
+
+    def changed(self):
+        """Return the dependencies changed or removed since they were recorded."""
+        with self._lock:
+            digests = dict(self._digests)
+
+        changed = []
+        for path, digest in sorted(digests.items()):
+            try:
+                if file_digest(path) != digest:
+                    changed.append(path)
+            except OSError:
+                changed.append(path)
+        return changed
+
+    def save(self):
+        """Write the graph out if it changed since it was loaded."""
+        with self._lock:
+            if not self._modified:
+                return
+            stored = {}
+            for article, dependencies in sorted(self._articles.items()):
+                for dependency in sorted(dependencies):
+                    stored.setdefault(
+                        dependency,
+                        {"digest": self._digests[dependency], "articles": []},
+                    )["articles"].append(article)
+            self._modified = False
+        atomic_write(self.path, json.dumps({"dependencies": stored}, indent=1))
+
+
+def _parse_options(arguments):
+    """Return the values of file and resource path options in arguments."""
+    named_files = {}
+    arguments = iter(arguments)
+    for argument in arguments:
+        option, separator, value = argument.partition("=")
+        if option in SHORT_OPTIONS:
+            option = SHORT_OPTIONS[option]
+        elif argument[:2] in SHORT_OPTIONS:
+            # Short options may be given with their value attached
+            option, separator, value = SHORT_OPTIONS[argument[:2]], "=", argument[2:]
+
+        if option not in FILE_OPTIONS and option != "--resource-path":
+            continue
+        if not separator:
+            value = next(arguments, None)
+            if value is None:
+                break
+
+        if option == "--resource-path":
+            named_files.setdefault(option, []).extend(value.split(os.pathsep))
+        else:
+            named_files.setdefault(option, []).append(value)
+    return named_files
+
+
+def _defaults_paths(value):
+    """Return the file names given by the value of a defaults file key."""
+    if not value:
+        return []
+    if isinstance(value, (str, dict)):
+        value = [value]
+    return [
+        item.get("path") if isinstance(item, dict) else item
+        for item in value
+        if isinstance(item, str) or (isinstance(item, dict) and item.get("path"))
+    ]
+
+
+def _find_file(option, name, resource_paths):
+    """Find the file given to option the way Pandoc looks it up."""
+    name = os.path.expanduser(name)
+    if option in DEFAULT_EXTENSIONS and not os.path.splitext(name)[1]:
+        name += DEFAULT_EXTENSIONS[option]
+
+    candidates = [name]
+    if not os.path.isabs(name):
+        if option in RESOURCE_PATH_OPTIONS:
+            candidates.extend(os.path.join(path, name) for path in resource_paths)
+        if FILE_OPTIONS[option] is not None:
+            candidates.append(
+                os.path.join(user_data_directory(), FILE_OPTIONS[option], name)
+            )
+        if option == "--filter" and os.path.basename(name) == name:
+            # Filters that are not found are run from the PATH
+            candidates.append(shutil.which(name) or name)
+
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return os.path.abspath(candidate)
+    return None
@@ -0,0 +1,61 @@
+-- converts a batch of documents in a single Pandoc run
+--
+-- The directory named by the PANDOC_READER_BATCH_DIR environment variable
+-- holds the input format in "format", the filters to apply in "steps" and
+-- the documents to convert in 1.md, 2.md, ... Each document is read, has the
+-- metadata given on the command line applied, is run through the filters and
+-- is written with the writer options of this run to 1.html, 2.html, ...
+-- Documents that fail are reported in 1.err, 2.err, ... instead.
+
+local conversion = dofile(
+  pandoc.path.join({ pandoc.path.directory(PANDOC_SCRIPT_FILE), "conversion.lua" })
+)
+
+local function read_file(path)
+  local file = assert(io.open(path, "rb"))
+  local text = file:read("a")
+  file:close()
+  return text
+end
+
+local function write_file(path, text)
+  local file = assert(io.open(path, "wb"))
+  file:write(text)
+  file:close()
+end
+
+-- Not a global so that it is not picked up by the filters run from here
+local function convert_batch(doc)
+  local directory = os.getenv("PANDOC_READER_BATCH_DIR")
+  if not directory then
+    return nil
+  end
+
+  local input_format = read_file(directory .. "/format")
+  local steps = conversion.parse_steps(read_file(directory .. "/steps"))
+
+  local index = 1
+  while true do
+    local input_path = directory .. "/" .. index .. ".md"
+    local input_file = io.open(input_path, "rb")
+    if not input_file then
+      break
+    end
+    input_file:close()
+
+    local ok, result = pcall(
+      conversion.convert, read_file(input_path), input_format, steps, doc.meta
+    )
+    if ok then
+      write_file(directory .. "/" .. index .. ".html", result)
+    else
+      write_file(directory .. "/" .. index .. ".err", tostring(result))
+    end
+    index = index + 1
+  end
+
+  -- Leave nothing for the filters and writer that follow to work on
+  return pandoc.Pandoc({}, {})
+end
+
+return { { Pandoc = convert_batch } }
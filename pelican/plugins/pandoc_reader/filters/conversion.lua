@@ -0,0 +1,38 @@
+-- converts a single document as Pandoc would, for the batch and worker drivers
+--
+-- Loaded by the drivers with dofile rather than run as a filter.
+
+local conversion = {}
+
+-- Parse the filters to apply from lines such as "citeproc" or "lua <path>"
+function conversion.parse_steps(text)
+  local steps = {}
+  for line in text:gmatch("[^\n]+") do
+    local kind, path = line:match("^(%S+) ?(.*)$")
+    steps[#steps + 1] = { kind = kind, path = path }
+  end
+  return steps
+end
+
+-- Read input, apply the metadata given on the command line and the filters,
+-- and write it with the writer options of this run
+function conversion.convert(input, input_format, steps, command_line_meta)
+  local doc = pandoc.read(input, input_format, PANDOC_READER_OPTIONS)
+
+  -- Metadata given on the command line overrides the document's own
+  for key, value in pairs(command_line_meta) do
+    doc.meta[key] = value
+  end
+
+  for _, step in ipairs(steps) do
+    if step.kind == "citeproc" then
+      doc = pandoc.utils.citeproc(doc)
+    else
+      doc = pandoc.utils.run_lua_filter(doc, step.path)
+    end
+  end
+
+  return pandoc.write(doc, FORMAT, PANDOC_WRITER_OPTIONS)
+end
+
+return conversion
@@ -1,56 +1,36 @@
 -- counts words in a document
+--
+-- The number of words in the body is stored in the "pandoc-reader-words"
+-- metadata field, which the plugin takes out of the metadata it passes on
+-- to Pelican and uses to calculate the reading time.
 
-words = 0
-characters = 0
-characters_and_spaces = 0
-process_anyway = false
+local words = 0
 
-wordcount = {
+local function count_code(el)
+  local _, n = el.text:gsub("%S+", "")
+  words = words + n
+end
+
+local wordcount = {
   Str = function(el)
     -- we don't count a word if it's entirely punctuation:
     if el.text:match("%P") then
-        words = words + 1
+      words = words + 1
     end
-    characters = characters + utf8.len(el.text)
-    characters_and_spaces = characters_and_spaces + utf8.len(el.text)
   end,
 
-  Space = function(el)
-    characters_and_spaces = characters_and_spaces + 1
-  end,
+  Code = count_code,
 
-  Code = function(el)
-    _,n = el.text:gsub("%S+","")
-    words = words + n
-    text_nospace = el.text:gsub("%s", "")
-    characters = characters + utf8.len(text_nospace)
-    characters_and_spaces = characters_and_spaces + utf8.len(el.text)
-  end,
-
-  CodeBlock = function(el)
-    _,n = el.text:gsub("%S+","")
-    words = words + n
-    text_nospace = el.text:gsub("%s", "")
-    characters = characters + utf8.len(text_nospace)
-    characters_and_spaces = characters_and_spaces + utf8.len(el.text)
-  end
+  CodeBlock = count_code,
 }
 
--- check if the `wordcount` variable is set to `process-anyway`
-function Meta(meta)
-  if meta.wordcount and (meta.wordcount=="process-anyway"
-    or meta.wordcount=="process" or meta.wordcount=="convert") then
-      process_anyway = true
-  end
+-- Not a global so that it is not picked up by the filters run after this one
+local function count_words(doc)
+  -- skip metadata, just count body:
+  words = 0
+  pandoc.walk_block(pandoc.Div(doc.blocks), wordcount)
+  doc.meta["pandoc-reader-words"] = pandoc.MetaString(tostring(words))
+  return doc
 end
 
-function Pandoc(el)
-    -- skip metadata, just count body:
-    pandoc.walk_block(pandoc.Div(el.blocks), wordcount)
-    print(words .. " words in body")
-    print(characters .. " characters in body")
-    print(characters_and_spaces .. " characters in body (including spaces)")
-    if not process_anyway then
-      os.exit(0)
-    end
-end
+return { { Pandoc = count_words } }
@@ -0,0 +1,105 @@
+-- converts documents sent over stdin in a long-running Pandoc process
+--
+-- Requests and responses are frames made of a 4-byte big-endian length
+-- followed by that many bytes. The first request holds the input format on
+-- its first line and the filters to apply on the following ones. Every
+-- request after that holds lines such as "bibliography <path>" giving
+-- metadata for that document only, an empty line and the document, which
+-- is converted as in a batch and answered with "+" followed by the output,
+-- or "-" followed by the error. The worker stops when stdin is closed.
+
+local conversion = dofile(
+  pandoc.path.join({ pandoc.path.directory(PANDOC_SCRIPT_FILE), "conversion.lua" })
+)
+
+local requests = io.stdin
+local responses = io.stdout
+
+local function read_frame()
+  local header = requests:read(4)
+  if not header or #header < 4 then
+    return nil
+  end
+  local length = string.unpack(">I4", header)
+  if length == 0 then
+    return ""
+  end
+  return requests:read(length)
+end
+
+local function write_frame(text)
+  responses:write(string.pack(">I4", #text), text)
+  responses:flush()
+end
+
+-- Split a request into the metadata given for its document and the document
+local function read_request(request)
+  local meta = {}
+  local position = 1
+  while true do
+    local line_end = request:find("\n", position, true)
+    if not line_end then
+      error("request without a document")
+    end
+    local line = request:sub(position, line_end - 1)
+    position = line_end + 1
+    if line == "" then
+      break
+    end
+
+    local field, value = line:match("^(%S+) (.*)$")
+    if field == "bibliography" then
+      -- Bibliographies add up as they do on the command line
+      meta[field] = meta[field] or pandoc.List({})
+      meta[field]:insert(value)
+    else
+      meta[field] = value
+    end
+  end
+  return meta, request:sub(position)
+end
+
+-- Not a global so that it is not picked up by the filters run from here
+local function serve(doc)
+  local config = read_frame()
+  if not config then
+    return pandoc.Pandoc({}, {})
+  end
+  local input_format, steps_text = config:match("^([^\n]*)\n?(.*)$")
+  local steps = conversion.parse_steps(steps_text)
+
+  -- Keep filters that print from writing into the responses
+  print = function(...)
+    io.stderr:write(table.concat({ ... }, "\t"), "\n")
+  end
+  io.output(io.stderr)
+
+  while true do
+    local request = read_frame()
+    if not request then
+      break
+    end
+
+    local ok, result = pcall(function()
+      local document_meta, input = read_request(request)
+      local meta = {}
+      for key, value in pairs(doc.meta) do
+        meta[key] = value
+      end
+      for key, value in pairs(document_meta) do
+        meta[key] = value
+      end
+      return conversion.convert(input, input_format, steps, meta)
+    end)
+    if ok then
+      write_frame("+" .. result)
+    else
+      write_frame("-" .. tostring(result))
+    end
+  end
+
+  -- Leave nothing for the filters and writer that follow to work on
+  return pandoc.Pandoc({}, {})
+end
+
+return { { Pandoc = serve } }
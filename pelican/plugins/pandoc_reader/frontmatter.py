@@ -0,0 +1,178 @@
+"""Find the YAML metadata block at the start of a source without reading it all."""
+
+import codecs
+import dataclasses
+import mmap
+import re
+
+from ruamel.yaml import YAML, YAMLError
+
+OPENING_DELIMITERS = ("---",)
+CLOSING_DELIMITERS = ("---", "...")
+
+# Lines end where str.splitlines() splits them, with "\r\n" counted once as
+# it is when files are read in text mode
+LINE_BREAKS = (
+    "\r\n",
+    "\r",
+    "\n",
+    "\x0b",
+    "\x0c",
+    "\x1c",
+    "\x1d",
+    "\x1e",
+    "\x85",
+    "\u2028",
+    "\u2029",
+)
+TEXT_LINE_PATTERN = re.compile(
+    f"[^{''.join(LINE_BREAKS[1:])}]*(?:{'|'.join(LINE_BREAKS)})?"
+)
+
+# The same in UTF-8, where the last three line breaks take several bytes
+# whose first bytes may also start other characters
+BYTES_LINE_PATTERN = re.compile(
+    rb"(?:[^\r\n\x0b\x0c\x1c\x1d\x1e\xc2\xe2]|\xc2(?!\x85)|\xe2(?!\x80[\xa8\xa9]))*"
+    rb"(?:\r\n|[\r\n\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9])?"
+)
+
+# Values Pandoc gives back unchanged when it renders metadata as Markdown:
+# words separated by single spaces and a few punctuation marks that none of
+# the Markdown extensions Pandoc enables by default, smart typography
+# included, does anything with
+PLAIN_VALUE_PATTERN = re.compile(r"(?:[^\W_]|[,:/%]|-(?!-)| (?! ))*")
+
+# Plain values YAML reads as something other than text, except for whole
+# numbers which Pandoc writes back as they are
+NON_TEXT_VALUE_PATTERN = re.compile(
+    r"(?i:true|false|null)|[-+]?(?:\.[0-9]+|0[0-9]+|[0-9]+\.[0-9]*)(?:e[-+]?[0-9]+)?"
+    r"|[-+]?[0-9]+e[-+]?[0-9]+|0o[0-7]+|0x[0-9a-fA-F]+"
+)
+
+# Anchors, aliases, tags, complex keys and directives, which Pandoc may read
+# differently or reject
+YAML_FEATURES_PATTERN = re.compile(r"[&*!?]|^%", re.MULTILINE)
+
+
+@dataclasses.dataclass(frozen=True)
+class FrontMatter:
+    """Where the YAML metadata block of a source starts and ends.
+
+    end is the offset just past the line break after the closing delimiter.
+    Offsets count characters in text and bytes in files.
+    """
+
+    start: int
+    end: int
+
+
+def find_front_matter(content):
+    """Return the FrontMatter of content, scanning no further than its end.
+
+    Raises the exceptions PandocReader raises for a missing metadata block.
+    """
+    return _find_front_matter(
+        (match.start(), match.end(), match.group())
+        for match in TEXT_LINE_PATTERN.finditer(content)
+    )
+
+
+def scan_front_matter(source_path):
+    """Return the FrontMatter of the file at source_path, in bytes.
+
+    The file is memory-mapped so that only the pages up to the end of the
+    metadata block are read. A UTF-8 byte order mark is skipped over.
+    """
+    with open(source_path, "rb") as file_handle:
+        try:
+            mapped_file = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return find_front_matter("")
+
+        with mapped_file:
+            start = (
+                len(codecs.BOM_UTF8)
+                if mapped_file[: len(codecs.BOM_UTF8)] == codecs.BOM_UTF8
+                else 0
+            )
+            lines = (
+                (
+                    match.start(),
+                    match.end(),
+                    match.group().decode("utf-8", errors="replace"),
+                )
+                for match in BYTES_LINE_PATTERN.finditer(mapped_file, start)
+            )
+            try:
+                return _find_front_matter(lines)
+            finally:
+                # Release the matches holding on to the mapped file
+                lines.close()
+
+
+def _find_front_matter(lines):
+    """Find the metadata block in (start, end, text) lines of a source."""
+    lines = iter(lines)
+    first_line = next(lines, None)
+
+    # Check that the given content is not empty
+    if first_line is None or first_line[1] == first_line[0]:
+        raise Exception("Could not find metadata. File is empty.")
+
+    # Check that the first line of the file starts with a YAML block
+    start, _, text = first_line
+    if text.rstrip() not in OPENING_DELIMITERS:
+        raise Exception("Could not find metadata header '---'.")
+
+    # Find the end of the YAML block, which has to come after at least one
+    # line of metadata
+    for line_number, (line_start, end, text) in enumerate(lines):
+        if end == line_start:
+            # Nothing but the end of the source is left
+            break
+        if text.rstrip() in CLOSING_DELIMITERS:
+            if line_number:
+                return FrontMatter(start, end)
+            break
+
+    raise Exception("Could not find end of metadata block.")
+
+
+def parse_plain_metadata(block):
+    """Return the metadata in block as Pandoc would render it, if that is easy.
+
+    block is the YAML metadata block, delimiters included. Returns None if
+    Pandoc would change any of its values when rendering them as Markdown,
+    or if the block is not a mapping YAML can read.
+    """
+    text = "".join(block.splitlines(keepends=True)[1:-1])
+    if YAML_FEATURES_PATTERN.search(text):
+        return None
+
+    try:
+        metadata = YAML(typ="base").load(text)
+    except YAMLError:
+        return None
+
+    if not isinstance(metadata, dict) or not _is_plain(metadata):
+        return None
+    return metadata
+
+
+def _is_plain(value):
+    """Check if Pandoc renders a value read from YAML exactly as it is."""
+    if isinstance(value, dict):
+        # Pandoc leaves out fields whose names end with an underscore
+        return all(
+            isinstance(key, str) and not key.endswith("_") and _is_plain(item)
+            for key, item in value.items()
+        )
+    if isinstance(value, list):
+        return all(_is_plain(item) for item in value)
+    return (
+        isinstance(value, str)
+        and not value.startswith("-")
+        and PLAIN_VALUE_PATTERN.fullmatch(value) is not None
+        and NON_TEXT_VALUE_PATTERN.fullmatch(value) is None
+    )
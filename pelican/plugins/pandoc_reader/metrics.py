@@ -0,0 +1,192 @@
+"""Export metrics of reading articles in the Prometheus text format.
+
+The metrics of a build are written at its end to PANDOC_METRICS_FILE, for
+the textfile collector of the Prometheus node exporter to pick up.
+"""
+
+import bisect
+import os
+import threading
+
+from .cache import atomic_write
+
+METRIC_PREFIX = "pandoc_reader_"
+
+# Upper bounds in seconds of the buckets of the stage histograms
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Type and help text of each metric, in the order they are written
+METRICS = {
+    "documents_read_total": ("counter", "Documents returned by the reader."),
+    "document_failures_total": ("counter", "Documents the reader failed to read."),
+    "documents_converted_total": ("counter", "Documents converted by Pandoc."),
+    "cache_hits_total": ("counter", "Documents served from the Pandoc cache."),
+    "documents_deferred_total": (
+        "counter",
+        "Documents read with the conversion of their body deferred.",
+    ),
+    "citation_documents_total": (
+        "counter",
+        "Documents converted with citations processed.",
+    ),
+    "input_bytes_total": ("counter", "Bytes of the sources converted by Pandoc."),
+    "output_bytes_total": ("counter", "Bytes of HTML output by Pandoc."),
+    "pandoc_processes_total": ("counter", "Pandoc processes started."),
+    "reading_times_total": ("counter", "Reading times calculated."),
+    "reading_time_failures_total": (
+        "counter",
+        "Reading times that could not be calculated.",
+    ),
+    "stage_seconds": (
+        "histogram",
+        "Seconds spent on each document in each stage of reading it.",
+    ),
+}
+
+# Pandoc processes started by this process, whichever build they were for
+_processes_started = 0
+_PROCESSES_LOCK = threading.Lock()
+
+# Metrics of running builds keyed on the id of their settings
+_METRICS = {}
+_METRICS_LOCK = threading.Lock()
+
+
+def count_process_started():
+    """Count a Pandoc process about to be started."""
+    global _processes_started  # noqa: PLW0603
+    with _PROCESSES_LOCK:
+        _processes_started += 1
+
+
+def get_metrics(settings):
+    """Return the Metrics of a build, or None if PANDOC_METRICS_FILE is not set."""
+    if not settings.get("PANDOC_METRICS_FILE"):
+        return None
+    with _METRICS_LOCK:
+        metrics = _METRICS.get(id(settings))
+        if metrics is None or metrics.settings is not settings:
+            metrics = Metrics(settings)
+            _METRICS[id(settings)] = metrics
+        return metrics
+
+
+def finish_metrics(settings):
+    """Stop collecting the metrics of a build, returning them or None."""
+    with _METRICS_LOCK:
+        metrics = _METRICS.get(id(settings))
+        if metrics is None or metrics.settings is not settings:
+            return None
+        del _METRICS[id(settings)]
+    return metrics
+
+
+class Metrics:
+    """Counters and histograms of the documents read in a build."""
+
+    def __init__(self, settings):
+        """Start collecting the metrics of the build with the given settings."""
+        self.settings = settings
+        self._lock = threading.Lock()
+        # Counters are written even if nothing counted them
+        self._counters = {
+            (name, ()): 0
+            for name, (metric_type, _) in METRICS.items()
+            if metric_type == "counter"
+        }
+        self._histograms = {}
+        with _PROCESSES_LOCK:
+            self._processes_at_start = _processes_started
+
+    def increment(self, name, amount=1, **labels):
+        """Add amount to the counter with the given name and labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """Add value to the histogram with the given name and labels."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {
+                    "buckets": [0] * (len(SECONDS_BUCKETS) + 1),
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            histogram["buckets"][bisect.bisect_left(SECONDS_BUCKETS, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def add_timings(self, articles):
+        """Observe the seconds spent in each stage of each article.
+
+        articles is what Timings.articles() returns.
+        """
+        for stages in articles.values():
+            for stage, seconds in stages.items():
+                self.observe("stage_seconds", seconds, stage=stage)
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        with _PROCESSES_LOCK:
+            processes = _processes_started - self._processes_at_start
+        with self._lock:
+            counters = dict(self._counters)
+            counters[("pandoc_processes_total", ())] = processes
+            histograms = {
+                key: {**histogram, "buckets": list(histogram["buckets"])}
+                for key, histogram in self._histograms.items()
+            }
+
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+            if metric_type == "counter":
+                for (counter, labels), value in sorted(counters.items()):
+                    if counter == name:
+                        lines.append(f"{METRIC_PREFIX}{name}{_labels(labels)} {value}")
+                continue
+
+            for (histogram_name, labels), histogram in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(
+                    (*SECONDS_BUCKETS, "+Inf"), histogram["buckets"]
+                ):
+                    cumulative += count
+                    bucket_labels = (*labels, ("le", str(bound)))
+                    lines.append(
+                        f"{METRIC_PREFIX}{name}_bucket{_labels(bucket_labels)}"
+                        f" {cumulative}"
+                    )
+                lines.append(
+                    f"{METRIC_PREFIX}{name}_sum{_labels(labels)} {histogram['sum']}"
+                )
+                lines.append(
+                    f"{METRIC_PREFIX}{name}_count{_labels(labels)} {histogram['count']}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def write_metrics(metrics):
+    """Write the metrics of a build to PANDOC_METRICS_FILE."""
+    atomic_write(
+        os.path.abspath(metrics.settings["PANDOC_METRICS_FILE"]), metrics.render()
+    )
+
+
+def _labels(labels):
+    """Format label pairs as they are written after a metric name."""
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels)
+    return f"{{{pairs}}}"
+
+
+def _escape(value):
+    """Escape a label value as the text format requires."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -1,35 +1,110 @@
 """Reader that processes Pandoc Markdown and returns HTML5."""
 
+import asyncio
+import contextlib
+import dataclasses
+import fnmatch
+import functools
+import hashlib
 import json
+import logging
 import math
 import os
-import shutil
+import re
 import subprocess
-
-import bs4
-from ruamel.yaml import YAML, constructor
+import threading
+import time
+import uuid
 
 from pelican import signals
+from pelican.cache import FileStampDataCacher
 from pelican.readers import BaseReader
-from pelican.utils import pelican_open
+from pelican.utils import file_suffix, pelican_open
+
+from .aio import decode_output, run_pandoc as run_pandoc_async
+from .batch import (
+    BATCH_MINIMUM_VERSION,
+    DEFAULT_BATCH_SIZE,
+    convert_batch,
+    get_batch_plan,
+)
+from .bibliography import (
+    CSL_JSON_WRITER_MINIMUM_VERSION,
+    VALID_BIB_EXTENSIONS,  # noqa: F401
+    BibliographyIndex,
+    convert_to_csl_json,
+)
+from .cache import CACHE_DIRECTORY_NAME, PandocCache, file_digest
+from .defaults import resolve_defaults
+from .deferred import DeferredContent, mentions_static_links
+from .dependencies import (
+    find_dependencies,
+    get_dependency_graph,
+    save_dependency_graphs,
+)
+from .frontmatter import (
+    FrontMatter,
+    find_front_matter,
+    parse_plain_metadata,
+    scan_front_matter,
+)
+from .metrics import (
+    count_process_started,
+    finish_metrics,
+    get_metrics,
+    write_metrics,
+)
+from .postprocess import (
+    ENCODED_LINKS_TO_RAW_LINKS_MAP,  # noqa: F401
+    HtmlPipeline,
+    HtmlTransform,  # noqa: F401
+    RawLinksTransform,
+)
+from .prefetch import start_prefetcher, stop_prefetcher, take_prefetched
+from .probe import (
+    PANDOC_SUPPORTED_MAJOR_VERSION,  # noqa: F401
+    PANDOC_SUPPORTED_MINOR_VERSION,  # noqa: F401
+    probe_pandoc,
+)
+from .resources import MeasuredPopen
+from .server import convert_with_server
+from .timing import (
+    finish_timings,
+    get_timings,
+    log_resource_summary,
+    record_subprocess,
+    record_usage,
+    reports_timings,
+    write_report,
+    write_trace,
+)
+from .workers import (
+    DEFAULT_WORKER_MAX_DOCUMENTS,
+    DEFAULT_WORKER_MAX_MEMORY,
+    convert_with_worker,
+    stop_workers,
+)
+
+logger = logging.getLogger(__name__)
 
+# Bump whenever the layout of cache entries or the way keys are computed changes
+CACHE_VERSION = 3
+DEFAULT_BACKEND = "subprocess"
 DEFAULT_READING_SPEED = 200  # Words per minute
 DEFAULT_PANDOC_EXECUTABLE = "pandoc"
 DIR_PATH = os.path.dirname(__file__)
-ENCODED_LINKS_TO_RAW_LINKS_MAP = {
-    "%7Bstatic%7D": "{static}",
-    "%7Battach%7D": "{attach}",
-    "%7Bfilename%7D": "{filename}",
-}
 FILE_EXTENSIONS = ["md", "mkd", "mkdn", "mdwn", "mdown", "markdown", "Rmd"]
 FILTERS_PATH = os.path.abspath(os.path.join(DIR_PATH, "filters"))
 PANDOC_READER_HTML_TEMPLATE = "pandoc-reader-default.html"
-PANDOC_SUPPORTED_MAJOR_VERSION = 2
-PANDOC_SUPPORTED_MINOR_VERSION = 11
+
+# Emitted by the template between the table of contents and the body
+BODY_SENTINEL = "<!-- pandoc-reader:body -->"
 
 TEMPLATES_PATH = os.path.abspath(os.path.join(DIR_PATH, "templates"))
 UNSUPPORTED_ARGUMENTS = ("--standalone", "--self-contained")
-VALID_BIB_EXTENSIONS = ["json", "yaml", "bibtex", "bib"]
+
+# Metadata field the wordcount.lua filter stores the number of words in
+WORDCOUNT_METADATA_KEY = "pandoc-reader-words"
 
 # Markdown variants supported in defaults files
 # Update as Pandoc adds or removes support for formats
@@ -43,6 +118,48 @@ VALID_INPUT_FORMATS = (
     "markdown_strict",
 )
 VALID_OUTPUT_FORMATS = ("html", "html5")
+VALID_BACKENDS = ("subprocess", "server", "lua")
+
+# Settings a profile in PANDOC_PROFILES may give for the files it matches
+PROFILE_SETTINGS = ("PANDOC_ARGS", "PANDOC_EXTENSIONS", "PANDOC_DEFAULTS_FILES")
+
+# Citations and table of contents request values of validated defaults files,
+# keyed on the stamps of the files they were read from
+_CHECKED_DEFAULTS = {}
+_CHECKED_DEFAULTS_LOCK = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class ConversionProfile:
+    """The Pandoc command line and the options it requests, compiled once.
+
+    pandoc_cmd holds everything but the bibliographies of an article, which
+    are added to it for each article if citations are processed.
+    dependencies are the files named on the command line or in defaults
+    files, as absolute paths, or None if some of them cannot be found.
+    """
+
+    pandoc_cmd: tuple
+    defaults_files: tuple
+    table_of_contents: bool
+    citations: bool
+    reading_time: bool
+    dependencies: tuple
+
+
+@dataclasses.dataclass
+class _Conversion:
+    """An article on its way through Pandoc."""
+
+    source_path: str
+    content: str  # None when Pandoc reads the file at source_path itself
+    pandoc_executable: str
+    pandoc_cmd: list
+    profile: ConversionProfile
+    front_matter: FrontMatter = None
+    cache_key: str = None
+    entry: dict = None
+    error: Exception = None
 
 
 class PandocReader(BaseReader):
@@ -51,47 +168,521 @@ class PandocReader(BaseReader):
     enabled = True
     file_extensions = FILE_EXTENSIONS
 
-    def read(self, source_path):
-        """Parse Pandoc Markdown and return HTML5 markup and metadata."""
+    def __init__(self, *args, **kwargs):
+        """Set up caches shared by all the files read."""
+        super().__init__(*args, **kwargs)
+
+        self._cache_path = None
+        self._cache = None
+        self._dependency_graph = None
+        if self.settings.get("PANDOC_CACHE", False):
+            self._cache_path = self.settings.get("PANDOC_CACHE_PATH") or os.path.join(
+                self.settings.get("CACHE_PATH", "cache"), CACHE_DIRECTORY_NAME
+            )
+            self._cache = PandocCache(self._cache_path)
+            self._dependency_graph = get_dependency_graph(self._cache_path)
+
+        # Time spent in each stage of reading articles and metrics of the
+        # articles read, if asked for
+        self._timings = get_timings(self.settings)
+        self._metrics = get_metrics(self.settings)
+
+        # Bibliographies are looked up in an index of the content directory
+        # rather than by walking the directory of every article
+        self._bibliography_index = BibliographyIndex(
+            self.settings.get("PATH", os.curdir)
+        )
+
         # Get the user-defined path to the Pandoc executable or fall back to default
-        pandoc_executable = self.settings.get(
+        self._pandoc_executable = self.settings.get(
             "PANDOC_EXECUTABLE_PATH", DEFAULT_PANDOC_EXECUTABLE
         )
 
         # If user-defined path, expand and make it absolute in case the path is relative
-        if pandoc_executable != DEFAULT_PANDOC_EXECUTABLE:
-            pandoc_executable = os.path.abspath(os.path.expanduser(pandoc_executable))
+        if self._pandoc_executable != DEFAULT_PANDOC_EXECUTABLE:
+            self._pandoc_executable = os.path.abspath(
+                os.path.expanduser(self._pandoc_executable)
+            )
 
-        # Check if pandoc is installed and is executable
-        if not shutil.which(pandoc_executable):
-            raise Exception("Could not find Pandoc. Please install.")
+        # Settings are validated and command lines built once for all the
+        # files read, for the files matched by each of PANDOC_PROFILES and
+        # for the others. Pelican sets up readers whether or not there are
+        # files for them, so invalid settings are reported for each file read
+        # with them, the exception being kept in place of the profile.
+        compiled = {}
+        with self._timed("validation"):
+            self._profiles = {
+                pattern: self._try_compile_profile(options, compiled)
+                for pattern, options in self.settings.get("PANDOC_PROFILES", {}).items()
+            }
+            self._default_profile = self._try_compile_profile({}, compiled)
 
-        # Check if the version of pandoc installed is 2.11 or higher
-        self._check_pandoc_version(pandoc_executable)
+    def read(self, source_path):
+        """Parse Pandoc Markdown and return HTML5 markup and metadata."""
+        with self._timed_article(source_path), self._counted_reads():
+            return self._read(source_path)
 
-        # Open Markdown file and read content
-        content = ""
-        with pelican_open(source_path) as file_content:
-            content = file_content
+    def _read(self, source_path):
+        """Do the work of read()."""
+        # Collect the file if it has already been converted in the background
+        conversion = take_prefetched(self.settings, source_path)
+        if conversion is not None:
+            return self._finalize_metadata(conversion.entry)
+
+        pandoc_executable, pandoc_info = self._get_pandoc()
+
+        # Open Markdown file and read content, unless Pandoc is to read it
+        content = None
+        if not self._passes_source_path():
+            with self._timed("read"):
+                content = self._read_content(source_path)
 
         # Retrieve HTML content and metadata
-        output, metadata = self._create_html(source_path, content, pandoc_executable)
+        output, metadata = self._create_html(
+            source_path, content, pandoc_executable, pandoc_info
+        )
 
         return output, metadata
 
-    def _create_html(self, source_path, content, pandoc_executable):
+    async def aread(self, source_path):
+        """Parse Pandoc Markdown and return HTML5 markup and metadata.
+
+        Does the same as read() for use from asyncio code, running Pandoc
+        without blocking the event loop. At most PANDOC_ASYNC_CONCURRENCY
+        Pandoc processes, by default one per CPU, run at once in each event
+        loop, and cancelling the task kills the Pandoc process it waits for.
+        """
+        with self._timed_article(source_path), self._counted_reads():
+            return await self._aread(source_path)
+
+    async def _aread(self, source_path):
+        """Do the work of aread()."""
+        pandoc_executable, pandoc_info = await asyncio.to_thread(self._get_pandoc)
+        content = None
+        if not self._passes_source_path():
+            with self._timed("read"):
+                content = await asyncio.to_thread(self._read_content, source_path)
+        conversion = await asyncio.to_thread(
+            self._prepare_conversion,
+            source_path,
+            content,
+            pandoc_executable,
+            pandoc_info,
+        )
+
+        if conversion.entry is None:
+            concurrency = self.settings.get("PANDOC_ASYNC_CONCURRENCY")
+            if self.settings.get("PANDOC_BACKEND", DEFAULT_BACKEND) == DEFAULT_BACKEND:
+                with self._timed("pandoc"):
+                    output = await run_pandoc_async(
+                        *self._get_pandoc_input(conversion), concurrency
+                    )
+            else:
+                # The other backends keep Pandoc running and are only waited on
+                output = await asyncio.to_thread(self._convert, conversion, pandoc_info)
+
+            await asyncio.to_thread(self._complete_conversion, conversion, output)
+
+        return self._finalize_metadata(conversion.entry)
+
+    def read_many(self, source_paths):
+        """Parse several Pandoc Markdown files converting them in batches.
+
+        Files converted with the same Pandoc command line are converted in a
+        single run of Pandoc, PANDOC_BATCH_SIZE files at a time, to save
+        starting Pandoc for each of them. Returns a list of the HTML5 markup
+        and metadata of each file in the order given.
+        """
+        with self._counted_reads(len(source_paths)):
+            return self._read_many(source_paths)
+
+    def _read_many(self, source_paths):
+        """Do the work of read_many()."""
+        pandoc_executable, pandoc_info = self._get_pandoc()
+
+        conversions = [
+            self._prepare_conversion(
+                source_path, None, pandoc_executable, pandoc_info, read_content=True
+            )
+            for source_path in source_paths
+        ]
+        self._convert_in_batches(
+            [conversion for conversion in conversions if conversion.entry is None],
+            pandoc_info,
+        )
+
+        for conversion in conversions:
+            if conversion.error is not None:
+                raise conversion.error
+
+        results = []
+        for conversion in conversions:
+            with self._timed_article(conversion.source_path):
+                results.append(self._finalize_metadata(conversion.entry))
+        return results
+
+    def _prefetch(self, source_paths):
+        """Convert files in a prefetch worker thread.
+
+        Returns the _Conversion of each file, or the exception converting
+        it raised so that it is raised when Pelican reads the file.
+        """
+        pandoc_executable, pandoc_info = self._get_pandoc()
+
+        results = []
+        conversions = []
+        for source_path in source_paths:
+            try:
+                conversion = self._prepare_conversion(
+                    source_path,
+                    None,
+                    pandoc_executable,
+                    pandoc_info,
+                    read_content=True,
+                )
+            except Exception as prepare_error:  # noqa: BLE001
+                results.append(prepare_error)
+            else:
+                results.append(conversion)
+                conversions.append(conversion)
+
+        self._convert_in_batches(
+            [conversion for conversion in conversions if conversion.entry is None],
+            pandoc_info,
+        )
+        return [
+            result.error if isinstance(result, _Conversion) and result.error else result
+            for result in results
+        ]
+
+    def _get_pandoc(self):
+        """Return the Pandoc executable to run and its PandocInfo."""
+        pandoc_executable = self._pandoc_executable
+
+        # Check that pandoc is installed and is 2.11 or higher, running it
+        # only the first time a given executable is seen
+        with self._timed("probe"):
+            pandoc_info = probe_pandoc(pandoc_executable, self._cache_path)
+
+        return pandoc_executable, pandoc_info
+
+    def _timed(self, stage, source_path=None):
+        """Time a stage of reading the article at source_path or the current one.
+
+        Does nothing unless timings were asked for.
+        """
+        if self._timings is None:
+            return contextlib.nullcontext()
+        return self._timings.stage(stage, source_path)
+
+    def _timed_article(self, source_path):
+        """Attribute the stages timed within to the article at source_path."""
+        if self._timings is None:
+            return contextlib.nullcontext()
+        return self._timings.article(source_path)
+
+    def _count(self, name, amount=1):
+        """Add amount to a counter of the metrics, if asked for."""
+        if self._metrics is not None:
+            self._metrics.increment(name, amount)
+
+    @contextlib.contextmanager
+    def _counted_reads(self, documents=1):
+        """Count the documents read within as read or as failed."""
+        try:
+            yield
+        except Exception:
+            self._count("document_failures_total", documents)
+            raise
+        self._count("documents_read_total", documents)
+
+    def _passes_source_path(self):
+        """Check if source files are passed to Pandoc by path, not read here.
+
+        Only the subprocess backend reads files itself, the others need
+        their content to send it on.
+        """
+        return (
+            self.settings.get("PANDOC_PASS_SOURCE_PATH", False)
+            and self.settings.get("PANDOC_BACKEND", DEFAULT_BACKEND) == DEFAULT_BACKEND
+        )
+
+    @staticmethod
+    def _read_content(source_path):
+        """Return the content of the Markdown file at source_path."""
+        with pelican_open(source_path) as file_content:
+            return file_content
+
+    def _create_html(self, source_path, content, pandoc_executable, pandoc_info):
         """Create HTML5 content."""
-        # Get settings set in pelicanconf.py
-        defaults_files = self.settings.get("PANDOC_DEFAULTS_FILES", [])
-        arguments = self.settings.get("PANDOC_ARGS", [])
-        extensions = self.settings.get("PANDOC_EXTENSIONS", [])
+        conversion = self._prepare_conversion(
+            source_path, content, pandoc_executable, pandoc_info
+        )
+
+        if conversion.entry is None and self._can_defer(conversion):
+            # Only convert the body once Pelican needs it
+            self._count("documents_deferred_total")
+            return self._defer_conversion(conversion, pandoc_info)
+
+        if conversion.entry is None:
+            # Create HTML content using pandoc-reader-default.html template
+            output = self._convert(conversion, pandoc_info)
+            self._complete_conversion(conversion, output)
+
+        return self._finalize_metadata(conversion.entry)
+
+    def _can_defer(self, conversion):
+        """Check if the body of an article can be converted after its metadata.
+
+        The table of contents and reading time are only known once the body
+        is converted, and typogrify is applied to the body as Pelican reads
+        it. Pelican's generator cache pickles content objects, which does
+        not work with deferred bodies. Anything the command line depends
+        on besides the plugin's template, such as a filter, could add
+        metadata from the body.
+        """
+        if (
+            not self.settings.get("PANDOC_DEFER_CONTENT", False)
+            or conversion.profile.table_of_contents
+            or conversion.profile.reading_time
+            or self.settings.get("TYPOGRIFY", False)
+            or (
+                self.settings.get("CACHE_CONTENT", False)
+                and self.settings.get("CONTENT_CACHING_LAYER") == "generator"
+            )
+        ):
+            return False
+
+        dependencies = find_dependencies(conversion.pandoc_cmd)
+        return dependencies is not None and all(
+            os.path.dirname(path) == TEMPLATES_PATH for path in dependencies
+        )
+
+    def _defer_conversion(self, conversion, pandoc_info):
+        """Return the metadata of an article and its body to be converted later."""
+        front_matter = self._read_front_matter(conversion)
+
+        pandoc_metadata = None
+        if self._renders_metadata_plainly(conversion, pandoc_info):
+            pandoc_metadata = parse_plain_metadata(front_matter)
+        if pandoc_metadata is None:
+            # Let Pandoc render values it would change, converting only the
+            # metadata block
+            with self._timed("pandoc"):
+                output = self._run_pandoc(conversion.pandoc_cmd, front_matter)
+            with self._timed("extraction"):
+                _, _, pandoc_metadata = self._extract_contents(output, False)
+
+        deferred = DeferredContent(
+            functools.partial(self._render_deferred, conversion, pandoc_info),
+            conversion.source_path,
+            self.settings.get("PANDOC_HTML_TRANSFORMS", [])
+            or mentions_static_links(conversion.content, conversion.source_path),
+        )
+        with self._timed("metadata"):
+            metadata = self._process_metadata(pandoc_metadata)
+        return deferred, metadata
+
+    def _render_deferred(self, conversion, pandoc_info):
+        """Convert the body of an article whose conversion was deferred."""
+        with self._timed_article(conversion.source_path):
+            output = self._convert(conversion, pandoc_info)
+            self._complete_conversion(conversion, output)
+            with self._timed("transform"):
+                return self._transform_html(conversion.entry["output"])
+
+    @staticmethod
+    def _read_front_matter(conversion):
+        """Return the YAML metadata block of the source of a conversion."""
+        front_matter = conversion.front_matter
+        if conversion.content is not None:
+            return conversion.content[front_matter.start : front_matter.end]
+
+        # Offsets are in bytes when Pandoc is to read the file
+        with open(conversion.source_path, "rb") as file_handle:
+            file_handle.seek(front_matter.start)
+            return decode_output(
+                file_handle.read(front_matter.end - front_matter.start)
+            )
+
+    @staticmethod
+    def _renders_metadata_plainly(conversion, pandoc_info):
+        """Check if metadata comes from the YAML block alone, read as Markdown.
+
+        Otherwise metadata may also be set on the command line or in
+        defaults files, or be read differently by other input formats or by
+        extensions Pandoc does not enable by default, such as emoji.
+        """
+        arguments = conversion.pandoc_cmd[1:]
+        input_format, *extensions = re.split(
+            r"(?=[+-])", arguments[arguments.index("--from") + 1]
+        )
+        return (
+            not conversion.profile.defaults_files
+            and input_format == "markdown"
+            and all(
+                extension[0] == "-"
+                or extension[1:] in pandoc_info.default_markdown_extensions
+                for extension in extensions
+            )
+            and not any(
+                argument.startswith(("-M", "--metadata"))
+                or "yaml_metadata_block" in argument
+                for argument in arguments
+            )
+        )
+
+    def _prepare_conversion(
+        self, source_path, content, pandoc_executable, pandoc_info, read_content=False
+    ):
+        """Validate content and settings and set up its conversion.
+
+        The content is read from source_path first if read_content is true.
+        The entry of the returned _Conversion is already filled in if the
+        converted content was found in the cache.
+        """
+        with self._timed_article(source_path):
+            if read_content:
+                with self._timed("read"):
+                    content = self._read_content(source_path)
+            return self._set_up_conversion(
+                source_path, content, pandoc_executable, pandoc_info
+            )
+
+    def _set_up_conversion(self, source_path, content, pandoc_executable, pandoc_info):
+        """Do the work of _prepare_conversion()."""
+        # Check if source content has a YAML metadata block, reading no more
+        # of the file than the block if Pandoc is to read it
+        with self._timed("front_matter"):
+            if content is None:
+                front_matter = scan_front_matter(source_path)
+            else:
+                front_matter = self._check_yaml_metadata_block(content)
+
+        pandoc_cmd, profile, dependencies = self._prepare_command(
+            source_path, pandoc_info, self._cache is not None
+        )
 
+        conversion = _Conversion(
+            source_path=source_path,
+            content=content,
+            pandoc_executable=pandoc_executable,
+            pandoc_cmd=pandoc_cmd,
+            profile=profile,
+            front_matter=front_matter,
+        )
+
+        # Serve the converted content from the cache if nothing it depends on
+        # has changed since it was stored, which cannot be told if some of
+        # the files it depends on cannot be found
+        if self._cache is not None and dependencies is not None:
+            with self._timed("cache"):
+                self._dependency_graph.record(source_path, dependencies)
+
+                # Files Pandoc reads itself are hashed as they are on disk
+                source = (
+                    f"file:{file_digest(source_path)}".encode()
+                    if content is None
+                    else content.encode("utf-8")
+                )
+                conversion.cache_key = self._compute_cache_key(
+                    source, pandoc_cmd, dependencies, pandoc_info.version
+                )
+                conversion.entry = self._cache.get(conversion.cache_key)
+            if conversion.entry is not None:
+                self._count("cache_hits_total")
+
+        return conversion
+
+    def _prepare_command(self, source_path, pandoc_info, track_dependencies):
+        """Return the Pandoc command for source_path.
+
+        Returns the command, the ConversionProfile it was built from and,
+        if track_dependencies is true, the files the command depends on, or
+        None if some of them cannot be found.
+        """
+        profile = self._get_profile(source_path)
+        pandoc_cmd = list(profile.pandoc_cmd)
+
+        # Files named on the command line or in defaults files, to which the
+        # bibliographies found below are added
+        dependencies = []
+        if track_dependencies and profile.dependencies is not None:
+            dependencies = list(profile.dependencies)
+        elif track_dependencies:
+            dependencies = None
+
+        # Find and add bibliography if citations are specified
+        if profile.citations:
+            with self._timed("bibliography"):
+                bib_files = self._find_bibs(source_path)
+                for bib_file in bib_files:
+                    if self._should_convert_bibs(pandoc_info):
+                        # Pass a cached CSL JSON copy to Pandoc to save parsing
+                        # BibTeX
+                        bib_file = convert_to_csl_json(
+                            self._pandoc_executable, bib_file, self._cache_path
+                        )
+                    pandoc_cmd.append(f"--bibliography={bib_file}")
+            if track_dependencies and dependencies is not None:
+                dependencies = sorted({*dependencies, *map(os.path.abspath, bib_files)})
+
+        return pandoc_cmd, profile, dependencies
+
+    def _get_profile(self, source_path):
+        """Return the ConversionProfile to convert the file at source_path with.
+
+        The first of PANDOC_PROFILES whose pattern matches the path of the
+        file within the content directory is used, if any. Raises the error
+        compiling the profile failed with, if it did.
+        """
+        profile = self._default_profile
+        if self._profiles:
+            path = os.path.relpath(
+                source_path, self.settings.get("PATH", os.curdir)
+            ).replace(os.sep, "/")
+            for pattern, pattern_profile in self._profiles.items():
+                if fnmatch.fnmatchcase(path, pattern):
+                    profile = pattern_profile
+                    break
+
+        if isinstance(profile, Exception):
+            raise profile.with_traceback(None)
+        return profile
+
+    def _try_compile_profile(self, options, compiled):
+        """Compile the profile of options given over the settings.
+
+        Returns the ConversionProfile, or the exception compiling it raised.
+        Profiles are looked up in and added to compiled, so that profiles
+        with the same settings are compiled once.
+        """
+        try:
+            self._check_profile_settings(options)
+
+            # Settings left out of a profile are taken from the settings file
+            defaults_files, arguments, extensions = (
+                options.get(name, self.settings.get(name, []))
+                for name in (
+                    "PANDOC_DEFAULTS_FILES",
+                    "PANDOC_ARGS",
+                    "PANDOC_EXTENSIONS",
+                )
+            )
+            key = (tuple(defaults_files), tuple(arguments), tuple(extensions))
+            if key not in compiled:
+                compiled[key] = self._compile_profile(
+                    defaults_files, arguments, extensions
+                )
+            return compiled[key]
+        except Exception as profile_error:  # noqa: BLE001
+            return profile_error
+
+    def _compile_profile(self, defaults_files, arguments, extensions):
+        """Validate settings for converting files and return their profile."""
         if isinstance(extensions, list):
             extensions = "".join(extensions)
 
-        # Check if source content has a YAML metadata block
-        self._check_yaml_metadata_block(content)
-
         # Check validity of arguments or defaults files
         table_of_contents, citations = self._validate_fields(
             defaults_files, arguments, extensions
@@ -99,42 +690,286 @@ class PandocReader(BaseReader):
 
         # Construct preliminary pandoc command
         pandoc_cmd = self._construct_pandoc_command(
-            pandoc_executable, defaults_files, arguments, extensions
+            self._pandoc_executable, defaults_files, arguments, extensions
         )
 
-        # Find and add bibliography if citations are specified
-        if citations:
-            for bib_file in self._find_bibs(source_path):
-                pandoc_cmd.append(f"--bibliography={bib_file}")
+        reading_time = bool(self.settings.get("CALCULATE_READING_TIME", []))
+        if reading_time:
+            # Count words in the same run, before any other filter changes the
+            # document, with the result returned in the metadata
+            pandoc_cmd.insert(
+                1, f"--lua-filter={os.path.join(FILTERS_PATH, 'wordcount.lua')}"
+            )
+
+        dependencies = find_dependencies(pandoc_cmd)
+        return ConversionProfile(
+            pandoc_cmd=tuple(pandoc_cmd),
+            defaults_files=tuple(defaults_files),
+            table_of_contents=table_of_contents,
+            citations=citations,
+            reading_time=reading_time,
+            dependencies=dependencies if dependencies is None else tuple(dependencies),
+        )
 
-        # Create HTML content using pandoc-reader-default.html template
-        output = self._run_pandoc(pandoc_cmd, content)
+    def fingerprint(self, source_path):
+        """Return a digest of everything but its source read() output depends on.
+
+        Covers the Pandoc command line and version, the contents of defaults
+        files, bibliographies, filters, templates and includes, and the
+        settings and transforms the output is processed with. Used to keep
+        Pelican from serving content it cached before any of these changed.
+        Returns None if some of the files it depends on cannot be found.
+        """
+        _, pandoc_info = self._get_pandoc()
+        pandoc_cmd, _, dependencies = self._prepare_command(
+            source_path, pandoc_info, True
+        )
+        if dependencies is None:
+            return None
+
+        inputs = self._get_cache_inputs(pandoc_cmd, dependencies, pandoc_info.version)
+        inputs["html_transforms"] = [
+            f"{type(transform).__module__}.{type(transform).__qualname__}"
+            for transform in self.settings.get("PANDOC_HTML_TRANSFORMS", [])
+        ]
+        return hashlib.sha256(
+            json.dumps(inputs, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def _convert(self, conversion, pandoc_info):
+        """Convert a single article with the backend given in PANDOC_BACKEND."""
+        with self._timed("pandoc", conversion.source_path):
+            return self._convert_with_backend(conversion, pandoc_info)
+
+    def _convert_with_backend(self, conversion, pandoc_info):
+        """Do the work of _convert()."""
+        backend = self.settings.get("PANDOC_BACKEND", DEFAULT_BACKEND)
+        if backend not in VALID_BACKENDS:
+            backends = ", ".join(VALID_BACKENDS[:-1]) + f" or {VALID_BACKENDS[-1]}"
+            raise ValueError(f"Backend must be either {backends}.")
+
+        output = None
+        if backend == "server" and pandoc_info.server:
+            output = convert_with_server(
+                conversion.pandoc_executable,
+                conversion.pandoc_cmd,
+                conversion.content,
+                self._get_defaults(conversion.profile),
+            )
+        elif (
+            backend == "lua"
+            and pandoc_info.lua
+            and pandoc_info.version_info >= BATCH_MINIMUM_VERSION
+        ):
+            # Workers convert documents the way batches do, so they support
+            # the same command lines
+            batch_plan = get_batch_plan(
+                conversion.pandoc_cmd, self._get_defaults(conversion.profile)
+            )
+            if batch_plan is not None:
+                output = convert_with_worker(
+                    conversion.pandoc_cmd,
+                    batch_plan,
+                    conversion.content,
+                    self.settings.get(
+                        "PANDOC_WORKER_MAX_DOCUMENTS", DEFAULT_WORKER_MAX_DOCUMENTS
+                    ),
+                    self.settings.get(
+                        "PANDOC_WORKER_MAX_MEMORY", DEFAULT_WORKER_MAX_MEMORY
+                    ),
+                )
+        if output is not None:
+            return output
+
+        # Options the backend does not support and errors are left to Pandoc
+        return self._run_pandoc(*self._get_pandoc_input(conversion))
 
+    @staticmethod
+    def _get_pandoc_input(conversion):
+        """Return the command to run Pandoc on a conversion and its stdin."""
+        if conversion.content is None:
+            # Pandoc reads the file itself, which is given as an absolute path
+            # so that it is never taken for an option
+            return [
+                *conversion.pandoc_cmd,
+                os.path.abspath(conversion.source_path),
+            ], None
+        return conversion.pandoc_cmd, conversion.content
+
+    @staticmethod
+    def _get_defaults(profile):
+        """Return the merged defaults files of a profile or None if there are none."""
+        if not profile.defaults_files:
+            return None
+        return resolve_defaults(profile.defaults_files).defaults
+
+    def _complete_conversion(self, conversion, output):
+        """Fill in the entry of a conversion from the output of Pandoc."""
         # Extract table of contents, text and metadata from HTML output
-        output, toc, pandoc_metadata = self._extract_contents(output, table_of_contents)
-
-        # Replace all occurrences of %7Bstatic%7D to {static},
-        # %7Battach%7D to {attach} and %7Bfilename%7D to {filename}
-        # so that static links are resolvable by pelican
-        for encoded_str, raw_str in ENCODED_LINKS_TO_RAW_LINKS_MAP.items():
-            output = output.replace(encoded_str, raw_str)
-
-        # Parse Pandoc metadata and add it to Pelican
-        metadata = self._process_metadata(pandoc_metadata)
-
-        if table_of_contents:
-            # Create table of contents and add to metadata
-            metadata["toc"] = self.process_metadata("toc", toc)
-
-        if self.settings.get("CALCULATE_READING_TIME", []):
-            # Calculate reading time and add to metadata
-            metadata["reading_time"] = self.process_metadata(
-                "reading_time",
-                self._calculate_reading_time(pandoc_executable, source_path),
+        with self._timed("extraction", conversion.source_path):
+            output, toc, pandoc_metadata = self._extract_contents(
+                output, conversion.profile.table_of_contents
+            )
+
+        # The word count is only there for the reading time
+        words = pandoc_metadata.pop(WORDCOUNT_METADATA_KEY, None)
+
+        entry = {
+            "output": output,
+            "metadata": pandoc_metadata,
+            "toc": toc if conversion.profile.table_of_contents else None,
+            "reading_time": None,
+        }
+
+        if conversion.profile.reading_time:
+            # Calculate reading time
+            with self._timed("reading_time", conversion.source_path):
+                try:
+                    entry["reading_time"] = self._calculate_reading_time(words)
+                except ValueError:
+                    self._count("reading_time_failures_total")
+                    raise
+            self._count("reading_times_total")
+
+        if self._metrics is not None:
+            self._count("documents_converted_total")
+            self._count("citation_documents_total", int(conversion.profile.citations))
+            self._count(
+                "input_bytes_total",
+                os.path.getsize(conversion.source_path)
+                if conversion.content is None
+                else len(conversion.content.encode("utf-8")),
             )
+            self._count("output_bytes_total", len(output.encode("utf-8")))
+
+        if conversion.cache_key is not None:
+            self._cache.set(conversion.cache_key, entry)
+
+        conversion.entry = entry
+
+    def _convert_in_batches(self, conversions, pandoc_info):
+        """Convert articles sharing a Pandoc command line together.
+
+        Errors are recorded in the conversion of the article that raised them
+        so that one failing article does not hold up the others.
+        """
+        batch_size = self.settings.get("PANDOC_BATCH_SIZE", DEFAULT_BATCH_SIZE)
+
+        groups = {}
+        for conversion in conversions:
+            groups.setdefault(tuple(conversion.pandoc_cmd), []).append(conversion)
+
+        for pandoc_cmd, group in groups.items():
+            batch_plan = None
+            if (
+                batch_size > 1
+                and len(group) > 1
+                and pandoc_info.lua
+                and pandoc_info.version_info >= BATCH_MINIMUM_VERSION
+            ):
+                batch_plan = get_batch_plan(
+                    pandoc_cmd, self._get_defaults(group[0].profile)
+                )
+
+            for start in range(0, len(group), max(batch_size, 1)):
+                batch = group[start : start + max(batch_size, 1)]
+                outputs = [None] * len(batch)
+                if batch_plan is not None:
+                    start_time = time.perf_counter()
+                    # Traced as a span of its own, being for no single article
+                    with self._timed("batch"):
+                        outputs = convert_batch(
+                            pandoc_cmd,
+                            batch_plan,
+                            [conversion.content for conversion in batch],
+                        )
+                    if self._timings is not None:
+                        # Each article is taken to have had an equal share
+                        elapsed = time.perf_counter() - start_time
+                        for conversion in batch:
+                            self._timings.add(
+                                conversion.source_path, "pandoc", elapsed / len(batch)
+                            )
+
+                for conversion, output in zip(batch, outputs):
+                    try:
+                        if output is None:
+                            # Failed documents are converted on their own so
+                            # that their errors are reported as usual
+                            output = self._convert(conversion, pandoc_info)
+                        self._complete_conversion(conversion, output)
+                    except Exception as conversion_error:  # noqa: BLE001
+                        conversion.error = conversion_error
+
+    def _finalize_metadata(self, entry):
+        """Return HTML output and Pelican metadata for a converted article."""
+        with self._timed("metadata"):
+            # Parse Pandoc metadata and add it to Pelican
+            metadata = self._process_metadata(entry["metadata"])
+
+            if entry["toc"] is not None:
+                # Add table of contents to metadata
+                metadata["toc"] = self.process_metadata("toc", entry["toc"])
+
+            if entry["reading_time"] is not None:
+                # Add reading time to metadata
+                metadata["reading_time"] = self.process_metadata(
+                    "reading_time", entry["reading_time"]
+                )
+
+        # Transforms are applied here rather than before caching the entry
+        # as they are not part of what the cache key covers
+        with self._timed("transform"):
+            output = self._transform_html(entry["output"])
 
         return output, metadata
 
+    def _transform_html(self, output):
+        """Apply the built-in and PANDOC_HTML_TRANSFORMS transforms to output."""
+        transforms = self.settings.get("PANDOC_HTML_TRANSFORMS", [])
+
+        # Replace %7Bstatic%7D with {static}, %7Battach%7D with {attach} and
+        # %7Bfilename%7D with {filename} in links so that they are resolvable
+        # by pelican, skipping the pass when there is nothing to change
+        if not transforms and "%7B" not in output:
+            return output
+        return HtmlPipeline([RawLinksTransform(), *transforms]).run(output)
+
+    def _should_convert_bibs(self, pandoc_info):
+        """Check if BibTeX bibliographies should be converted to CSL JSON."""
+        return (
+            self._cache_path is not None
+            and self.settings.get("PANDOC_CONVERT_BIBTEX", True)
+            and pandoc_info.lua
+            and pandoc_info.version_info >= CSL_JSON_WRITER_MINIMUM_VERSION
+        )
+
+    def _compute_cache_key(self, source, pandoc_cmd, dependencies, pandoc_version):
+        """Compute the cache key for the source bytes converted with pandoc_cmd."""
+        hasher = hashlib.sha256()
+        inputs = self._get_cache_inputs(pandoc_cmd, dependencies, pandoc_version)
+        hasher.update(json.dumps(inputs, sort_keys=True).encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(source)
+        return hasher.hexdigest()
+
+    def _get_cache_inputs(self, pandoc_cmd, dependencies, pandoc_version):
+        """Return everything other than the source that has a bearing on output."""
+        return {
+            "cache_version": CACHE_VERSION,
+            "pandoc_version": pandoc_version,
+            "pandoc_cmd": pandoc_cmd,
+            # Defaults files, bibliographies, filters, templates and
+            # includes, among them the plugin's own template and filter
+            "dependencies": {path: file_digest(path) for path in dependencies},
+            "calculate_reading_time": bool(
+                self.settings.get("CALCULATE_READING_TIME", [])
+            ),
+            "reading_speed": str(
+                self.settings.get("READING_SPEED", DEFAULT_READING_SPEED)
+            ),
+        }
+
     def _validate_fields(self, defaults_files, arguments, extensions):
         """Validate fields and return citations and ToC request values."""
         # If defaults_files is empty then validate the argument and extensions
@@ -156,26 +991,21 @@ class PandocReader(BaseReader):
 
     def _check_defaults(self, defaults_files):
         """Check if the given Pandoc defaults file has valid values."""
+        # Defaults files are only parsed and validated again after they change
+        resolved = resolve_defaults(defaults_files)
+        with _CHECKED_DEFAULTS_LOCK:
+            checked = _CHECKED_DEFAULTS.get(resolved.stamps)
+        if checked is None:
+            checked = self._check_defaults_values(resolved.defaults)
+            with _CHECKED_DEFAULTS_LOCK:
+                _CHECKED_DEFAULTS[resolved.stamps] = checked
+        return checked
+
+    def _check_defaults_values(self, defaults):
+        """Check if merged Pandoc defaults have valid values."""
         citations = False
         table_of_contents = False
 
-        # Get the data in all defaults files as a string
-        defaults_data = ""
-        for defaults_file in defaults_files:
-            with open(defaults_file) as file_handle:
-                for line in file_handle.readlines():
-                    defaults_data += line
-
-        # Convert YAML data to a Python dictionary
-        defaults = {}
-        try:
-            yaml = YAML()
-            defaults = yaml.load(defaults_data)
-        except constructor.DuplicateKeyError as duplicate_key_error:
-            raise ValueError(
-                "Duplicate keys defined in multiple defaults files."
-            ) from duplicate_key_error
-
         self._check_if_unsupported_settings(defaults)
         reader = self._check_input_format(defaults)
         self._check_output_format(defaults)
@@ -200,29 +1030,10 @@ class PandocReader(BaseReader):
 
         return citations, table_of_contents
 
-    def _calculate_reading_time(self, pandoc_executable, source_path):
-        """Calculate time taken to read content."""
+    def _calculate_reading_time(self, wordcount):
+        """Calculate time taken to read content of wordcount words."""
         reading_speed = self.settings.get("READING_SPEED", DEFAULT_READING_SPEED)
 
-        # Use the workcount.lua filter to calulcate the reading time
-        output = subprocess.run(
-            [
-                pandoc_executable,
-                "--lua-filter",
-                os.path.join(FILTERS_PATH, "wordcount.lua"),
-                source_path,
-            ],
-            capture_output=True,
-            encoding="utf-8",
-            check=True,
-        )
-
-        # We have to extract the word count from stdout which looks like
-        # 102 words in body
-        # 536 characters in body
-        # 636 characters in body (including spaces)
-        wordcount = output.stdout.split()[0]
-
         time_unit = "minutes"
         try:
             reading_time = math.ceil(float(wordcount) / float(reading_speed))
@@ -249,58 +1060,14 @@ class PandocReader(BaseReader):
             metadata[key] = self.process_metadata(key, value)
         return metadata
 
-    @staticmethod
-    def _check_pandoc_version(pandoc_executable):
-        """Check that the specified version of Pandoc is 2.11 or higher."""
-        output = subprocess.run(
-            [pandoc_executable, "--version"],
-            capture_output=True,
-            encoding="utf-8",
-            check=True,
-        )
-
-        # Returns a string of the form pandoc <version>
-        pandoc_version = output.stdout.split("\n")[0]
-
-        # Get the major and minor version from the above version string
-        major_version = pandoc_version.split()[1].split(".")[0]
-        minor_version = pandoc_version.split()[1].split(".")[1]
-
-        # Pandoc major version less than 2 are not supported
-        if int(major_version) < PANDOC_SUPPORTED_MAJOR_VERSION:
-            raise Exception("Pandoc version must be 2.11 or higher.")
-
-        # Pandoc major version 2 minor version less than 11 are not supported
-        if (
-            int(major_version) == PANDOC_SUPPORTED_MAJOR_VERSION
-            and int(minor_version) < PANDOC_SUPPORTED_MINOR_VERSION
-        ):
-            raise Exception("Pandoc version must be 2.11 or higher.")
-
     @staticmethod
     def _check_yaml_metadata_block(content):
-        """Check if the source content has a YAML metadata block."""
-        # Check that the given content is not empty
-        if not content:
-            raise Exception("Could not find metadata. File is empty.")
+        """Check if the source content has a YAML metadata block.
 
-        # Split content into a list of lines
-        content_lines = content.splitlines()
-
-        # Check that the first line of the file starts with a YAML block
-        if content_lines[0].rstrip() not in ["---"]:
-            raise Exception("Could not find metadata header '---'.")
-
-        # Find the end of the YAML block
-        yaml_block_end = ""
-        for line_num, line in enumerate(content_lines[1:]):
-            if line.rstrip() in ["---", "..."]:
-                yaml_block_end = line_num
-                break
-
-        # Check if the end of the YAML block was found
-        if not yaml_block_end:
-            raise Exception("Could not find end of metadata block.")
+        Returns the FrontMatter giving where the block is in content. Lines
+        are only looked at up to the end of the block.
+        """
+        return find_front_matter(content)
 
     @staticmethod
     def _construct_pandoc_command(
@@ -322,15 +1089,39 @@ class PandocReader(BaseReader):
 
     @staticmethod
     def _run_pandoc(pandoc_cmd, content):
-        """Execute the given pandoc command and return output."""
-        output = subprocess.run(
+        """Execute the given pandoc command and return output.
+
+        Pandoc reads from a file named in pandoc_cmd if content is None. Its
+        output is read as bytes and decoded once.
+        """
+        count_process_started()
+        with MeasuredPopen(
             pandoc_cmd,
-            input=content,
-            capture_output=True,
-            encoding="utf-8",
-            check=True,
-        )
-        return output.stdout
+            stdin=subprocess.DEVNULL if content is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        ) as process:
+            record_subprocess(process.pid)
+            try:
+                stdout, stderr = process.communicate(
+                    None if content is None else content.encode("utf-8")
+                )
+            except BaseException:
+                # Do not leave Pandoc running if interrupted, as
+                # subprocess.run() does
+                process.kill()
+                raise
+        record_usage(process.usage)
+
+        output = decode_output(stdout)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode,
+                pandoc_cmd,
+                output=output,
+                stderr=decode_output(stderr),
+            )
+        return output
 
     @staticmethod
     def _extract_contents(html_output, table_of_contents):
@@ -341,30 +1132,24 @@ class PandocReader(BaseReader):
         # Convert JSON string to dict
         pandoc_metadata = json.loads(pandoc_json_metadata)
 
-        # Parse HTML output
-        soup = bs4.BeautifulSoup(html_output, "html.parser")
-
-        # Extract the table of contents if one was requested
-        toc = ""
-        if table_of_contents:
-            # Find the table of contents
-            toc = soup.body.find("nav", id="TOC")
-
-            if toc:
-                # Convert it to a string
-                toc = str(toc)
-
-                # Replace id=TOC with class="toc"
-                toc = toc.replace('id="TOC"', 'class="toc"')
-
-                # Remove the table of contents from the HTML output
-                soup.body.find("nav", id="TOC").decompose()
-
-        # Remove body tag around html output
-        soup.body.unwrap()
+        # The table of contents, if any, comes before the sentinel and the
+        # body after it, with nothing inside either of them parsed
+        toc, sentinel, html_output = html_output.partition(BODY_SENTINEL)
+        if not sentinel:
+            # Output of a template given in PANDOC_ARGS is taken as a whole
+            toc, html_output = "", toc
+            if table_of_contents:
+                logger.warning(
+                    "No table of contents could be extracted, as the Pandoc"
+                    " template used does not write %s between it and the body",
+                    BODY_SENTINEL,
+                )
+
+        # Only keep the table of contents if one was requested
+        toc = toc.strip() if table_of_contents else ""
 
         # Strip leading and trailing spaces
-        html_output = str(soup).strip()
+        html_output = html_output.strip()
 
         return html_output, toc, pandoc_metadata
 
@@ -390,18 +1175,9 @@ class PandocReader(BaseReader):
                 table_of_contents = True
         return table_of_contents
 
-    @staticmethod
-    def _find_bibs(source_path):
+    def _find_bibs(self, source_path):
         """Find bibliographies recursively in the sourcepath given."""
-        bib_files = []
-        filename = os.path.splitext(os.path.basename(source_path))[0]
-        directory_path = os.path.dirname(os.path.abspath(source_path))
-        for root, _, files in os.walk(directory_path):
-            for extension in VALID_BIB_EXTENSIONS:
-                bib_name = ".".join([filename, extension])
-                if bib_name in files:
-                    bib_files.append(os.path.join(root, bib_name))
-        return bib_files
+        return self._bibliography_index.find(source_path)
 
     @staticmethod
     def _check_arguments(arguments):
@@ -410,6 +1186,15 @@ class PandocReader(BaseReader):
             if arg in UNSUPPORTED_ARGUMENTS:
                 raise ValueError(f"Argument {arg} is not supported.")
 
+    @staticmethod
+    def _check_profile_settings(options):
+        """Check that a profile only gives settings profiles may give."""
+        unknown = sorted(set(options) - set(PROFILE_SETTINGS))
+        if unknown:
+            raise ValueError(
+                f"Settings {', '.join(unknown)} cannot be given in a profile."
+            )
+
     @staticmethod
     def _check_if_unsupported_settings(defaults):
         """Check if unsupported settings are specified in the defaults."""
@@ -477,6 +1262,156 @@ def add_reader(readers):
         readers.reader_classes[ext] = PandocReader
 
 
+def fingerprint_cached_content(readers):
+    """Make Pelican's content cache check the fingerprint of Pandoc files.
+
+    Pelican only compares the stamp of the source file before serving what
+    it cached for it. The stamp of files read by the PandocReader is paired
+    with their fingerprint, so that cached content is read again once
+    anything else it depends on changes.
+    """
+    settings = readers.settings
+    if settings.get("CONTENT_CACHING_LAYER") != "reader" or not (
+        settings.get("CACHE_CONTENT") or settings.get("LOAD_CONTENT_CACHE")
+    ):
+        return
+
+    get_file_stamp = readers._get_file_stamp
+
+    def get_fingerprinted_stamp(filename):
+        stamp = get_file_stamp(filename)
+        reader = readers.readers.get(file_suffix(filename))
+        if isinstance(reader, PandocReader):
+            # Files depending on files that cannot be found get a stamp
+            # matching no other, so that what was cached for them is never
+            # served
+            return stamp, reader.fingerprint(filename) or uuid.uuid4().hex
+        return stamp
+
+    readers._get_file_stamp = get_fingerprinted_stamp
+
+
+def attach_deferred_content(content_object):
+    """Have content objects render the bodies read with deferral when needed."""
+    deferred = getattr(content_object, "_content", None)
+    if isinstance(deferred, DeferredContent):
+        deferred.attach(content_object)
+
+
+def start_prefetch(readers):
+    """Start converting all Pandoc Markdown files if prefetching is enabled."""
+    settings = readers.settings
+    if not settings.get("PANDOC_PREFETCH", False):
+        return
+
+    reader = PandocReader(settings)
+    start_prefetcher(
+        settings,
+        reader._prefetch,
+        [
+            ext
+            for ext, reader_class in readers.reader_classes.items()
+            if reader_class and issubclass(reader_class, PandocReader)
+        ],
+        settings.get("PANDOC_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+        _find_cached_content(settings, reader),
+    )
+
+
+def _find_cached_content(settings, reader):
+    """Return a function telling if Pelican takes a file from its content cache.
+
+    Returns None if Pelican does not load its content cache. The caches of
+    the article and page generators are loaded the first time the function
+    is called. Their entries are valid if they were stored for the current
+    stamp of the file, which at the reader layer is paired with the
+    fingerprint of the file, as in fingerprint_cached_content().
+    """
+    if not settings.get("LOAD_CONTENT_CACHE"):
+        return None
+
+    reader_layer = settings.get("CONTENT_CACHING_LAYER") == "reader"
+    content_path = os.path.abspath(settings.get("PATH", os.curdir))
+
+    @functools.cache
+    def load_caches():
+        return [
+            FileStampDataCacher(
+                settings,
+                f"{generator_name}-Readers" if reader_layer else generator_name,
+                False,
+                True,
+            )
+            for generator_name in ("ArticlesGenerator", "PagesGenerator")
+        ]
+
+    def is_cached(source_path):
+        # Reader caches are keyed on absolute paths, generator caches on
+        # paths relative to the content
+        key = (
+            source_path if reader_layer else os.path.relpath(source_path, content_path)
+        )
+        entries = [cache._cache[key] for cache in load_caches() if key in cache._cache]
+        if not entries:
+            return False
+
+        try:
+            stamp = load_caches()[0]._get_file_stamp(source_path)
+            if reader_layer:
+                stamp = stamp, reader.fingerprint(source_path)
+        except Exception:  # noqa: BLE001
+            # Left for the conversion to report
+            return False
+        if reader_layer and stamp[1] is None:
+            return False
+        return any(entry_stamp == stamp for entry_stamp, _ in entries)
+
+    return is_cached
+
+
+def stop_prefetch(pelican):
+    """Discard whatever was prefetched once the build is over."""
+    stop_prefetcher(pelican.settings)
+
+
+def stop_pandoc_workers(pelican):
+    """Stop the Pandoc workers of the lua backend once the build is over."""
+    stop_workers()
+
+
+def save_dependencies(pelican):
+    """Store the files each article depended on for the next build."""
+    save_dependency_graphs()
+
+
+def report_timings(pelican):
+    """Report where the time reading articles went once the build is over.
+
+    Also writes the metrics of the build, which include the time spent in
+    each stage.
+    """
+    timings = finish_timings(pelican.settings)
+    metrics = finish_metrics(pelican.settings)
+    if metrics is not None:
+        metrics.add_timings(timings.articles())
+        write_metrics(metrics)
+    if timings is None:
+        return
+    if reports_timings(pelican.settings):
+        write_report(timings)
+    if pelican.settings.get("PANDOC_RESOURCE_SUMMARY"):
+        log_resource_summary(timings)
+    if pelican.settings.get("PANDOC_TRACE_FILE"):
+        write_trace(timings)
+
+
 def register():
     """Register the PandocReader."""
     signals.readers_init.connect(add_reader)
+    signals.readers_init.connect(fingerprint_cached_content)
+    signals.readers_init.connect(start_prefetch)
+    signals.content_object_init.connect(attach_deferred_content)
+    signals.finalized.connect(stop_prefetch)
+    signals.finalized.connect(stop_pandoc_workers)
+    signals.finalized.connect(save_dependencies)
+    signals.finalized.connect(report_timings)
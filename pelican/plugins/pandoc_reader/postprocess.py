@@ -0,0 +1,197 @@
+"""Rewrite the HTML output of Pandoc in a single streaming pass."""
+
+import html.parser
+
+ENCODED_LINKS_TO_RAW_LINKS_MAP = {
+    "%7Bstatic%7D": "{static}",
+    "%7Battach%7D": "{attach}",
+    "%7Bfilename%7D": "{filename}",
+}
+
+# Attributes holding the links Pandoc percent-encodes
+LINK_ATTRIBUTES = ("href", "src")
+
+
+class HtmlTransform:
+    """A change made to the HTML output of Pandoc as it is streamed through.
+
+    Subclasses override start_tag, text or both. All transforms of a
+    pipeline see each start tag and run of text in turn, each one getting
+    what the one before it returned.
+    """
+
+    def start_tag(self, tag, attrs):
+        """Return the attributes to give a start tag.
+
+        tag is the lowercased tag name and attrs a list of (name, value)
+        pairs, with a value of None for attributes given without one. Start
+        tags whose attributes are returned unchanged are left as written.
+        """
+        return attrs
+
+    def text(self, text):
+        """Return the text to write in place of a run of text.
+
+        text is as it appears in the HTML, with character references left
+        as they are. The contents of script and style elements and comments
+        are not passed.
+        """
+        return text
+
+
+class RawLinksTransform(HtmlTransform):
+    """Restore the {static}, {attach} and {filename} links Pandoc encodes.
+
+    Pelican only resolves these links when they are written raw, and only
+    the links in href and src attributes are restored.
+    """
+
+    def start_tag(self, tag, attrs):
+        """Restore the raw links in the link attributes of a start tag."""
+        return [
+            (name, _restore_raw_links(value))
+            if name in LINK_ATTRIBUTES and value and "%7B" in value
+            else (name, value)
+            for name, value in attrs
+        ]
+
+
+class HtmlPipeline:
+    """Transforms applied together in one pass over a document."""
+
+    def __init__(self, transforms):
+        """Apply transforms in the order given."""
+        self.transforms = list(transforms)
+
+    def run(self, html_output):
+        """Return html_output with all the transforms applied."""
+        rewriter = _Rewriter(self.transforms)
+        rewriter.feed(html_output)
+        rewriter.close()
+        return "".join(rewriter.parts)
+
+
+class _Rewriter(html.parser.HTMLParser):
+    """Write back what it parses, with changes made by transforms."""
+
+    def __init__(self, transforms):
+        """Rewrite with the start tag and text handlers of transforms."""
+        super().__init__(convert_charrefs=False)
+        self.parts = []
+        self._text = []
+        self._end_tag_handled = False
+        self._start_tag_handlers = [
+            transform.start_tag
+            for transform in transforms
+            if type(transform).start_tag is not HtmlTransform.start_tag
+        ]
+        self._text_handlers = [
+            transform.text
+            for transform in transforms
+            if type(transform).text is not HtmlTransform.text
+        ]
+
+    def close(self):
+        """Write out any text left at the end of the document."""
+        super().close()
+        self._flush_text()
+
+    def handle_starttag(self, tag, attrs):
+        """Write a start tag, rewritten if its attributes change."""
+        self._write_start_tag(tag, attrs, self.get_starttag_text(), "")
+
+    def handle_startendtag(self, tag, attrs):
+        """Write a self-closing start tag, rewritten if its attributes change."""
+        self._write_start_tag(tag, attrs, self.get_starttag_text(), " /")
+
+    def parse_endtag(self, i):
+        """Parse an end tag, writing it as written if it is handled."""
+        self._end_tag_handled = False
+        j = super().parse_endtag(i)
+        if self._end_tag_handled and j >= 0:
+            self._write(self.rawdata[i:j])
+        return j
+
+    def handle_endtag(self, tag):
+        """Note that an end tag is to be written, once its text is known."""
+        self._end_tag_handled = True
+
+    def handle_data(self, data):
+        """Collect text, except that of script and style elements."""
+        if self.cdata_elem is not None:
+            self._write(data)
+        else:
+            self._text.append(data)
+
+    def handle_entityref(self, name):
+        """Collect a named character reference as part of the text."""
+        self._text.append(f"&{name};")
+
+    def handle_charref(self, name):
+        """Collect a numeric character reference as part of the text."""
+        self._text.append(f"&#{name};")
+
+    def handle_comment(self, data):
+        """Write a comment."""
+        self._write(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        """Write a declaration such as a doctype."""
+        self._write(f"<!{decl}>")
+
+    def handle_pi(self, data):
+        """Write a processing instruction."""
+        self._write(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        """Write a CDATA section or other marked section."""
+        if data.startswith("CDATA["):
+            self._write(f"<![{data}]]>")
+        else:
+            self._write(f"<![{data}]>")
+
+    def _write_start_tag(self, tag, attrs, start_tag_text, closing):
+        """Write a start tag as written unless transforms change its attributes."""
+        new_attrs = attrs
+        for handler in self._start_tag_handlers:
+            new_attrs = handler(tag, new_attrs)
+
+        if new_attrs == attrs:
+            self._write(start_tag_text)
+        else:
+            self._write(f"<{tag}{_format_attrs(new_attrs)}{closing}>")
+
+    def _write(self, markup):
+        """Write markup after the text collected before it."""
+        self._flush_text()
+        self.parts.append(markup)
+
+    def _flush_text(self):
+        """Write the text collected so far, passed through the transforms."""
+        if not self._text:
+            return
+        text = "".join(self._text)
+        self._text = []
+        for handler in self._text_handlers:
+            text = handler(text)
+        self.parts.append(text)
+
+
+def _format_attrs(attrs):
+    """Format attributes as Pandoc writes them."""
+    return "".join(
+        f" {name}" if value is None else f' {name}="{_escape_attr(value)}"'
+        for name, value in attrs
+    )
+
+
+def _escape_attr(value):
+    """Escape an attribute value to be quoted with double quotes."""
+    return value.replace("&", "&amp;").replace('"', "&quot;")
+
+
+def _restore_raw_links(value):
+    """Replace the encoded forms of Pelican links with the raw ones."""
+    for encoded_str, raw_str in ENCODED_LINKS_TO_RAW_LINKS_MAP.items():
+        value = value.replace(encoded_str, raw_str)
+    return value
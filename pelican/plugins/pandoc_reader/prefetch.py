@@ -0,0 +1,266 @@
+"""Convert Pandoc sources in parallel before Pelican asks for them."""
+
+import concurrent.futures
+import fnmatch
+import functools
+import math
+import os
+import threading
+
+# Each worker is handed several chunks so that workers finishing early can
+# take over the remaining files
+CHUNKS_PER_WORKER = 4
+
+# Running prefetchers keyed on the id of the settings of the build they serve
+_PREFETCHERS = {}
+_PREFETCHERS_LOCK = threading.Lock()
+
+
+def start_prefetcher(
+    settings, convert_files, file_extensions, batch_size=1, is_cached=None
+):
+    """Start converting all source files of a build unless already started.
+
+    convert_files is called from worker threads with a list of paths and
+    returns the result of converting each of them, or the exception raised.
+    is_cached, if given, is called from worker threads with a path and tells
+    if Pelican will take that file from its content cache instead of reading
+    it, in which case it is not converted.
+    """
+    with _PREFETCHERS_LOCK:
+        prefetcher = _PREFETCHERS.get(id(settings))
+        if prefetcher is not None and prefetcher.settings is settings:
+            return prefetcher
+
+        max_workers = settings.get("PANDOC_PREFETCH_WORKERS") or available_cpus()
+        if is_cached is not None:
+            convert_files = functools.partial(
+                _convert_uncached, convert_files, is_cached
+            )
+        prefetcher = Prefetcher(
+            settings,
+            convert_files,
+            find_source_files(settings, file_extensions),
+            max_workers,
+            batch_size,
+        )
+        _PREFETCHERS[id(settings)] = prefetcher
+        return prefetcher
+
+
+def stop_prefetcher(settings):
+    """Stop the prefetcher of a build and discard anything not yet read."""
+    with _PREFETCHERS_LOCK:
+        prefetcher = _PREFETCHERS.get(id(settings))
+        if prefetcher is None or prefetcher.settings is not settings:
+            return
+        del _PREFETCHERS[id(settings)]
+    prefetcher.shutdown()
+
+
+def take_prefetched(settings, source_path):
+    """Return the prefetched result for source_path or None if there is none."""
+    with _PREFETCHERS_LOCK:
+        prefetcher = _PREFETCHERS.get(id(settings))
+    if prefetcher is None or prefetcher.settings is not settings:
+        return None
+    return prefetcher.take(source_path)
+
+
+def available_cpus():
+    """Return the number of CPUs this process may use, honouring cgroup limits."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not available on macOS and Windows
+        cpus = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(cpus, 1)
+
+
+def find_source_files(settings, file_extensions):
+    """Find the articles and pages Pelican will read, like its generators do."""
+    content_path = os.path.abspath(settings.get("PATH", os.curdir))
+    ignore_patterns = settings.get("IGNORE_FILES", [])
+    extensions = tuple(f".{extension}" for extension in file_extensions)
+
+    source_files = set()
+    for paths_setting, excludes_setting in (
+        ("ARTICLE_PATHS", "ARTICLE_EXCLUDES"),
+        ("PAGE_PATHS", "PAGE_EXCLUDES"),
+    ):
+        excluded = {
+            os.path.normpath(os.path.join(content_path, exclude))
+            for exclude in settings.get(excludes_setting, [])
+        }
+        for path in settings.get(paths_setting, [""]):
+            root = os.path.join(content_path, path) if path else content_path
+            for directory_path, directory_names, file_names in os.walk(
+                root, followlinks=True
+            ):
+                directory_names[:] = [
+                    directory_name
+                    for directory_name in directory_names
+                    if os.path.join(directory_path, directory_name) not in excluded
+                    and not _is_ignored(directory_name, ignore_patterns)
+                ]
+                source_files.update(
+                    os.path.join(directory_path, file_name)
+                    for file_name in file_names
+                    if file_name.endswith(extensions)
+                    and not _is_ignored(file_name, ignore_patterns)
+                )
+    return sorted(source_files)
+
+
+class Prefetcher:
+    """A pool of threads converting source files, largest first."""
+
+    def __init__(self, settings, convert_files, source_paths, max_workers, batch_size):
+        """Start converting source_paths in max_workers threads."""
+        self.settings = settings
+        self._convert_files = convert_files
+        self._lock = threading.Lock()
+        self._futures = {}
+
+        sizes = {}
+        for source_path in source_paths:
+            try:
+                stat_result = os.stat(source_path)
+            except OSError:
+                continue
+            sizes[source_path] = stat_result.st_size
+            self._futures[source_path] = (
+                _stamp(stat_result),
+                concurrent.futures.Future(),
+            )
+
+        # Converting the largest files first keeps a large file started last
+        # from holding up the end of the build
+        ordered_paths = sorted(sizes, key=sizes.get, reverse=True)
+        chunk_size = max(
+            1,
+            min(
+                batch_size,
+                math.ceil(len(ordered_paths) / (max_workers * CHUNKS_PER_WORKER)),
+            ),
+        )
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pandoc-reader"
+        )
+        for start in range(0, len(ordered_paths), chunk_size):
+            self._executor.submit(
+                self._convert_chunk,
+                [
+                    (source_path, self._futures[source_path][1])
+                    for source_path in ordered_paths[start : start + chunk_size]
+                ],
+            )
+
+    def take(self, source_path):
+        """Wait for and return the result of converting source_path.
+
+        Returns None if source_path was not prefetched or has changed since,
+        and raises the exception converting it raised, if any. Each result
+        can only be taken once.
+        """
+        with self._lock:
+            stamp_future = self._futures.pop(os.path.abspath(source_path), None)
+        if stamp_future is None:
+            return None
+
+        stamp, future = stamp_future
+        try:
+            if _stamp(os.stat(source_path)) != stamp:
+                return None
+        except OSError:
+            return None
+
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            return None
+
+    def shutdown(self):
+        """Cancel conversions that have not started yet."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            futures, self._futures = self._futures, {}
+        for _, future in futures.values():
+            future.cancel()
+
+    def _convert_chunk(self, chunk):
+        """Convert a chunk of (path, future) pairs and set their futures."""
+        # Files whose conversion was cancelled while waiting are skipped
+        chunk = [
+            (source_path, future)
+            for source_path, future in chunk
+            if future.set_running_or_notify_cancel()
+        ]
+        if not chunk:
+            return
+        source_paths = [source_path for source_path, _ in chunk]
+
+        try:
+            results = self._convert_files(source_paths)
+        except Exception as convert_error:  # noqa: BLE001
+            # Raised again when one of the files is read
+            results = [convert_error] * len(source_paths)
+
+        for (_, future), result in zip(chunk, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def _convert_uncached(convert_files, is_cached, source_paths):
+    """Convert the files in source_paths that are not in Pelican's content cache.
+
+    The files in the cache get None as their result, so that they are read
+    as usual should Pelican not take them from its cache after all.
+    """
+    results = dict.fromkeys(source_paths)
+    uncached_paths = [
+        source_path for source_path in source_paths if not is_cached(source_path)
+    ]
+    if uncached_paths:
+        results.update(zip(uncached_paths, convert_files(uncached_paths)))
+    return list(results.values())
+
+
+def _is_ignored(name, ignore_patterns):
+    """Check if name matches one of the IGNORE_FILES patterns."""
+    return any(fnmatch.fnmatch(name, pattern) for pattern in ignore_patterns)
+
+
+def _stamp(stat_result):
+    """Return what identifies a version of a file."""
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def _cgroup_cpu_quota():
+    """Return the CPU quota of the cgroup of this process, or None if unlimited."""
+    # cgroup v2 gives the quota and period on one line, e.g. "200000 100000"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as file_handle:
+            quota, period = file_handle.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    # cgroup v1 gives them in separate files, with a quota of -1 for no limit
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as file_handle:
+            quota = int(file_handle.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as file_handle:
+            period = int(file_handle.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 else None
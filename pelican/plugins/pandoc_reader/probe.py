@@ -0,0 +1,182 @@
+"""Detect the version and capabilities of the Pandoc executable."""
+
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+
+from .cache import atomic_write
+from .metrics import count_process_started
+
+PANDOC_SUPPORTED_MAJOR_VERSION = 2
+PANDOC_SUPPORTED_MINOR_VERSION = 11
+
+# Bump whenever fields are added to or removed from PandocInfo
+PROBE_VERSION = 2
+
+# Results of probing each executable, keyed on (path, size, mtime) of the binary
+_PROBES = {}
+_PROBES_LOCK = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class PandocInfo:
+    """Version and capabilities of a Pandoc executable."""
+
+    executable: str
+    version: str
+    input_formats: tuple = ()
+    markdown_extensions: tuple = ()
+    default_markdown_extensions: tuple = ()
+    lua: bool = False
+    server: bool = False
+
+    @property
+    def version_info(self):
+        """Return the version as a tuple of integers."""
+        return _parse_version(self.version)
+
+
+def probe_pandoc(pandoc_executable, cache_path=None):
+    """Return a PandocInfo for the given executable, probing it only once.
+
+    Results are kept for the lifetime of the process and, if cache_path is
+    given, persisted there so that later builds do not need to run Pandoc
+    at all until the binary is replaced.
+    """
+    # Check if pandoc is installed and is executable
+    resolved_executable = shutil.which(pandoc_executable)
+    if not resolved_executable:
+        raise Exception("Could not find Pandoc. Please install.")
+
+    resolved_executable = os.path.realpath(resolved_executable)
+    stat_result = os.stat(resolved_executable)
+    stamp = (resolved_executable, stat_result.st_size, stat_result.st_mtime_ns)
+
+    with _PROBES_LOCK:
+        pandoc_info = _PROBES.get(stamp)
+        if pandoc_info is None:
+            probe_path = None
+            if cache_path:
+                probe_digest = hashlib.sha256(repr(stamp).encode("utf-8")).hexdigest()
+                probe_path = os.path.join(cache_path, "probes", f"{probe_digest}.json")
+                pandoc_info = _load_probe(probe_path)
+
+            if pandoc_info is None:
+                pandoc_info = _run_probe(resolved_executable)
+                if probe_path:
+                    _store_probe(probe_path, pandoc_info)
+
+            _PROBES[stamp] = pandoc_info
+    return pandoc_info
+
+
+def check_pandoc_version(version):
+    """Check that the given version of Pandoc is 2.11 or higher."""
+    # Get the major and minor version from the version string
+    major_version = version.split(".")[0]
+    minor_version = version.split(".")[1]
+
+    # Pandoc major version less than 2 are not supported
+    if int(major_version) < PANDOC_SUPPORTED_MAJOR_VERSION:
+        raise Exception("Pandoc version must be 2.11 or higher.")
+
+    # Pandoc major version 2 minor version less than 11 are not supported
+    if (
+        int(major_version) == PANDOC_SUPPORTED_MAJOR_VERSION
+        and int(minor_version) < PANDOC_SUPPORTED_MINOR_VERSION
+    ):
+        raise Exception("Pandoc version must be 2.11 or higher.")
+
+
+def _run_probe(pandoc_executable):
+    """Run the given Pandoc executable to find its version and capabilities."""
+    count_process_started()
+    output = subprocess.run(
+        [pandoc_executable, "--version"],
+        capture_output=True,
+        encoding="utf-8",
+        check=True,
+    )
+    version_lines = output.stdout.split("\n")
+
+    # The first line is a string of the form pandoc <version>
+    version = version_lines[0].split()[1]
+    check_pandoc_version(version)
+
+    input_formats = _list(pandoc_executable, "--list-input-formats")
+    # Extensions are listed with a + or - showing whether they are on by default
+    listed_extensions = _list(pandoc_executable, "--list-extensions=markdown")
+    markdown_extensions = tuple(
+        extension.lstrip("+-") for extension in listed_extensions
+    )
+    default_markdown_extensions = tuple(
+        extension[1:] for extension in listed_extensions if extension[0] == "+"
+    )
+
+    # Pandoc 3.1.2 and later list optional features as e.g. Features: +server +lua
+    features = None
+    for line in version_lines:
+        if line.startswith("Features:"):
+            features = line.split()[1:]
+
+    if features is None:
+        # Older versions always have Lua support and ship the server from 3.0
+        lua = True
+        server = _parse_version(version) >= (3, 0)
+    else:
+        lua = "+lua" in features
+        server = "+server" in features
+
+    return PandocInfo(
+        executable=pandoc_executable,
+        version=version,
+        input_formats=input_formats,
+        markdown_extensions=markdown_extensions,
+        default_markdown_extensions=default_markdown_extensions,
+        lua=lua,
+        server=server,
+    )
+
+
+def _parse_version(version):
+    """Convert a version string such as 3.1.11.1 into a tuple of integers."""
+    return tuple(int(part) for part in version.split(".") if part.isdigit())
+
+
+def _list(pandoc_executable, list_option):
+    """Return the output of one of Pandoc's --list-* options."""
+    count_process_started()
+    output = subprocess.run(
+        [pandoc_executable, list_option],
+        capture_output=True,
+        encoding="utf-8",
+        check=False,
+    )
+    return tuple(output.stdout.split())
+
+
+def _load_probe(probe_path):
+    """Load a PandocInfo previously persisted to probe_path."""
+    try:
+        with open(probe_path, encoding="utf-8") as file_handle:
+            data = json.load(file_handle)
+        if data.pop("probe_version", None) != PROBE_VERSION:
+            return None
+        data["input_formats"] = tuple(data["input_formats"])
+        data["markdown_extensions"] = tuple(data["markdown_extensions"])
+        data["default_markdown_extensions"] = tuple(data["default_markdown_extensions"])
+        return PandocInfo(**data)
+    except (OSError, ValueError, KeyError, TypeError):
+        # Unreadable or outdated probes are simply discarded
+        return None
+
+
+def _store_probe(probe_path, pandoc_info):
+    """Persist the given PandocInfo to probe_path."""
+    data = dataclasses.asdict(pandoc_info)
+    data["probe_version"] = PROBE_VERSION
+    atomic_write(probe_path, json.dumps(data))
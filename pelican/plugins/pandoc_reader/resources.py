@@ -0,0 +1,72 @@
+"""Measure the resources used by the Pandoc processes the plugin runs."""
+
+import dataclasses
+import os
+import subprocess
+import sys
+
+
+@dataclasses.dataclass(frozen=True)
+class ResourceUsage:
+    """CPU time, peak memory and major page faults of one or more processes.
+
+    Adding usages sums their times, faults and processes and keeps the
+    larger of their peak resident set sizes, which are in bytes.
+    """
+
+    user_time: float = 0.0
+    system_time: float = 0.0
+    max_rss: int = 0
+    major_faults: int = 0
+    processes: int = 0
+
+    @classmethod
+    def from_rusage(cls, rusage):
+        """Return the usage of a process given by os.wait4() or getrusage()."""
+        return cls(
+            user_time=rusage.ru_utime,
+            system_time=rusage.ru_stime,
+            max_rss=max_rss_bytes(rusage.ru_maxrss),
+            major_faults=rusage.ru_majflt,
+            processes=1,
+        )
+
+    def __add__(self, other):
+        """Return the combined usage of two sets of processes."""
+        return ResourceUsage(
+            user_time=self.user_time + other.user_time,
+            system_time=self.system_time + other.system_time,
+            max_rss=max(self.max_rss, other.max_rss),
+            major_faults=self.major_faults + other.major_faults,
+            processes=self.processes + other.processes,
+        )
+
+
+class MeasuredPopen(subprocess.Popen):
+    """A Popen that records the resources its process used once waited for.
+
+    The process is reaped with os.wait4(), which gives its resource usage,
+    instead of os.waitpid(). usage stays None where os.wait4() is not
+    available, as on Windows, or if the process was reaped elsewhere.
+    """
+
+    usage = None
+
+    def _try_wait(self, wait_flags):
+        """Wait for the process as Popen does, keeping its resource usage."""
+        if not hasattr(os, "wait4"):
+            return super()._try_wait(wait_flags)
+        try:
+            pid, status, rusage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            # Waiting for children is disabled, so the status is lost too
+            return self.pid, 0
+        if pid == self.pid:
+            self.usage = ResourceUsage.from_rusage(rusage)
+        return pid, status
+
+
+def max_rss_bytes(max_rss):
+    """Convert a peak resident set size given by the OS to bytes."""
+    # Given in kilobytes, except on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
@@ -0,0 +1,337 @@
+"""Convert content through a long-running pandoc server process."""
+
+import atexit
+import base64
+import http.client
+import json
+import logging
+import socket
+import subprocess
+import threading
+import time
+
+from .metrics import count_process_started
+from .timing import record_subprocess
+
+logger = logging.getLogger(__name__)
+
+SERVER_HOST = "127.0.0.1"
+
+# Seconds to wait for a newly started server to answer
+SERVER_START_TIMEOUT = 10
+
+# Seconds the server may spend on a single conversion
+SERVER_TIMEOUT = 120
+
+# The server accepts the same options as defaults files, so command line
+# options are translated to the names used in defaults files
+OPTION_NAMES = {
+    "read": "from",
+    "reader": "from",
+    "write": "to",
+    "writer": "to",
+    "toc": "table-of-contents",
+    "id-prefix": "identifier-prefix",
+    "variable": "variables",
+}
+STRING_OPTIONS = (
+    "from",
+    "to",
+    "wrap",
+    "identifier-prefix",
+    "title-prefix",
+    "email-obfuscation",
+    "top-level-division",
+    "reference-location",
+    "eol",
+)
+INTEGER_OPTIONS = ("toc-depth", "columns", "tab-stop", "shift-heading-level-by")
+BOOLEAN_OPTIONS = (
+    "standalone",
+    "table-of-contents",
+    "number-sections",
+    "section-divs",
+    "html-q-tags",
+    "ascii",
+    "reference-links",
+    "strip-comments",
+)
+MATH_METHODS = ("mathjax", "katex", "mathml", "webtex", "gladtex")
+SHORT_OPTIONS = {
+    "-f": "from",
+    "-r": "read",
+    "-t": "to",
+    "-w": "write",
+    "-s": "standalone",
+    "-N": "number-sections",
+    "-T": "title-prefix",
+    "-V": "variable",
+}
+
+# Raised while the server is starting up and not yet accepting or answering
+# connections
+CONNECTION_ERRORS = (ConnectionError, http.client.RemoteDisconnected)
+
+# Running servers keyed on the Pandoc executable, or None if one failed to start
+_SERVERS = {}
+_SERVERS_LOCK = threading.Lock()
+
+
+class PandocServerError(Exception):
+    """Raised when the server fails to start or to convert a document."""
+
+
+def convert_with_server(pandoc_executable, pandoc_cmd, content, defaults=None):
+    """Convert content with the options in pandoc_cmd through a pandoc server.
+
+    defaults holds the merged defaults files passed in pandoc_cmd, if any.
+    Returns None if the options are not supported by the server API or the
+    server cannot convert the content, so that the caller may run Pandoc
+    itself instead.
+    """
+    params = get_server_params(pandoc_cmd, defaults)
+    if params is None:
+        return None
+
+    server = get_server(pandoc_executable)
+    if server is None:
+        return None
+
+    record_subprocess(server.pid)
+    try:
+        return server.convert({**params, "text": content})
+    except PandocServerError:
+        return None
+
+
+def get_server(pandoc_executable):
+    """Return the running server for pandoc_executable, starting it if needed."""
+    with _SERVERS_LOCK:
+        if pandoc_executable not in _SERVERS:
+            try:
+                _SERVERS[pandoc_executable] = PandocServer(pandoc_executable)
+            except PandocServerError as server_error:
+                logger.warning(
+                    "Could not start pandoc server, running Pandoc for each file: %s",
+                    server_error,
+                )
+                _SERVERS[pandoc_executable] = None
+        return _SERVERS[pandoc_executable]
+
+
+def get_server_params(pandoc_cmd, defaults=None):
+    """Translate pandoc_cmd into parameters of the server API.
+
+    Returns None if pandoc_cmd includes options the server does not support.
+    """
+    params = {}
+    arguments = iter(pandoc_cmd[1:])
+    for argument in arguments:
+        option_value = _parse_option(argument, arguments)
+        if option_value is None:
+            return None
+
+        option, value = option_value
+        if option == "defaults":
+            # The contents of defaults files are added below
+            if defaults is None:
+                return None
+        elif not _add_param(params, option, value):
+            return None
+
+    for option, value in (defaults or {}).items():
+        if not _add_param(params, OPTION_NAMES.get(option, option), value):
+            return None
+    return params
+
+
+def _parse_option(argument, arguments):
+    """Return the name and value of the option given in argument.
+
+    The value is taken from the remaining arguments if it is not part of
+    argument itself. Returns None if argument is not an option.
+    """
+    if argument in SHORT_OPTIONS:
+        option, has_value, value = SHORT_OPTIONS[argument], False, ""
+    elif argument.startswith("--"):
+        option, has_value, value = argument[2:].partition("=")
+    else:
+        return None
+    option = OPTION_NAMES.get(option, option)
+
+    if option in MATH_METHODS:
+        # Math methods take an optional URL on the command line
+        math_method = {"method": option}
+        if has_value:
+            math_method["url"] = value
+        return "html-math-method", math_method
+
+    if not has_value:
+        if option in (*STRING_OPTIONS, *INTEGER_OPTIONS, "template", "variables"):
+            value = next(arguments, "")
+        else:
+            value = True
+
+    if option == "variables":
+        key, _, variable = value.partition("=")
+        value = {key: variable or "true"}
+    return option, value
+
+
+def _add_param(params, option, value):
+    """Add an option given on the command line or in a defaults file to params.
+
+    Returns False if the option is not supported by the server.
+    """
+    if option in STRING_OPTIONS:
+        params[option] = str(value)
+    elif option in INTEGER_OPTIONS:
+        try:
+            params[option] = int(value)
+        except ValueError:
+            return False
+    elif option in BOOLEAN_OPTIONS:
+        params[option] = value in (True, "true")
+    elif option == "html-math-method" and isinstance(value, dict):
+        params[option] = {key: str(item) for key, item in value.items()}
+    elif option == "variables" and isinstance(value, dict):
+        params.setdefault(option, {}).update(
+            {key: str(variable) for key, variable in value.items()}
+        )
+    elif option == "template":
+        # The server cannot read files so the template itself is sent along
+        try:
+            with open(value, encoding="utf-8") as file_handle:
+                params[option] = file_handle.read()
+        except OSError:
+            return False
+    else:
+        return False
+    return True
+
+
+class PandocServer:
+    """A pandoc server process and a pool of connections to it."""
+
+    def __init__(self, pandoc_executable):
+        """Start a pandoc server and wait until it answers."""
+        self.port = _find_free_port()
+        count_process_started()
+        self._process = subprocess.Popen(
+            [
+                pandoc_executable,
+                "server",
+                f"--port={self.port}",
+                f"--timeout={SERVER_TIMEOUT}",
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        atexit.register(self.stop)
+
+        try:
+            self._wait_until_ready()
+        except PandocServerError:
+            self.stop()
+            raise
+
+    def convert(self, params):
+        """Convert a document and return the output."""
+        try:
+            body = self._request(
+                "POST",
+                "/",
+                json.dumps(params).encode("utf-8"),
+                {"Content-Type": "application/json", "Accept": "application/json"},
+            )
+        except CONNECTION_ERRORS as connection_error:
+            raise PandocServerError(str(connection_error)) from connection_error
+        try:
+            result = json.loads(body)
+        except ValueError as value_error:
+            raise PandocServerError(body.decode("utf-8", "replace")) from value_error
+
+        if not isinstance(result, dict) or "output" not in result:
+            raise PandocServerError(str(result))
+        if result.get("base64"):
+            return base64.b64decode(result["output"]).decode("utf-8")
+        return result["output"]
+
+    @property
+    def pid(self):
+        """Return the process ID of the server."""
+        return self._process.pid
+
+    def stop(self):
+        """Close all connections and stop the server."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+        if self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+
+    def _wait_until_ready(self):
+        """Wait until the server answers requests for its version."""
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            if self._process.poll() is not None:
+                raise PandocServerError(
+                    f"Server exited with status {self._process.returncode}."
+                )
+            try:
+                self._request("GET", "/version")
+            except CONNECTION_ERRORS:
+                # Not listening or not answering yet
+                if time.monotonic() > deadline:
+                    raise PandocServerError("Server did not start in time.") from None
+                time.sleep(0.05)
+            else:
+                return
+
+    def _request(self, method, url, body=None, headers=None):
+        """Send a request over a pooled connection and return the response body."""
+        with self._connections_lock:
+            connection = self._connections.pop() if self._connections else None
+        if connection is None:
+            connection = http.client.HTTPConnection(
+                SERVER_HOST, self.port, timeout=SERVER_TIMEOUT
+            )
+
+        try:
+            connection.request(method, url, body=body, headers=headers or {})
+            response = connection.getresponse()
+            response_body = response.read()
+        except CONNECTION_ERRORS:
+            connection.close()
+            raise
+        except (OSError, http.client.HTTPException) as request_error:
+            connection.close()
+            raise PandocServerError(str(request_error)) from request_error
+
+        if response.will_close:
+            connection.close()
+        else:
+            # Keep the connection alive for the next request
+            with self._connections_lock:
+                self._connections.append(connection)
+
+        if response.status != http.client.OK:
+            raise PandocServerError(response_body.decode("utf-8", "replace"))
+        return response_body
+
+
+def _find_free_port():
+    """Return a port on the loopback interface that nothing is listening on."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as free_socket:
+        free_socket.bind((SERVER_HOST, 0))
+        return free_socket.getsockname()[1]
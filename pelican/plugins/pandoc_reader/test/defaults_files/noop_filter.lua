@@ -0,0 +1,5 @@
+-- noop_filter.lua
+--
+-- A Lua filter that leaves documents as they are.
+--
+return {}
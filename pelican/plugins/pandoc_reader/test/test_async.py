@@ -0,0 +1,127 @@
+"""Test converting content from asyncio code."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, aio
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none", "--toc"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+
+class TestAsyncRead(unittest.TestCase):
+    """Test cases for reading files with aread."""
+
+    def test_aread_matches_read(self):
+        """Check if files read with aread are the same as those read with read."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            CALCULATE_READING_TIME=True,
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_toc.md")
+        expected_output, expected_metadata = PandocReader(settings).read(source_path)
+
+        with mock.patch.object(PandocReader, "_run_pandoc", side_effect=AssertionError):
+            output, metadata = asyncio.run(PandocReader(settings).aread(source_path))
+
+        self.assertEqual(expected_output, output)
+        self.assertEqual(
+            {key: str(value) for key, value in expected_metadata.items()},
+            {key: str(value) for key, value in metadata.items()},
+        )
+
+    def test_files_read_concurrently(self):
+        """Check if several files can be read at once in the same event loop."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_ASYNC_CONCURRENCY=2,
+        )
+        source_paths = [
+            os.path.join(TEST_CONTENT_PATH, file_name)
+            for file_name in (
+                "valid_content.md",
+                "valid_content_with_toc.md",
+                "mathjax_content.md",
+            )
+        ]
+        expected = [PandocReader(settings).read(path)[0] for path in source_paths]
+
+        async def read_all():
+            reader = PandocReader(settings)
+            return await asyncio.gather(*map(reader.aread, source_paths))
+
+        self.assertEqual(expected, [output for output, _ in asyncio.run(read_all())])
+
+    def test_errors_are_raised(self):
+        """Check if aread raises the same errors as read."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=PANDOC_ARGS
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "no_metadata.md")
+
+        with self.assertRaises(Exception) as context_manager:
+            asyncio.run(PandocReader(settings).aread(source_path))
+
+        message = str(context_manager.exception)
+        self.assertEqual("Could not find metadata header '---'.", message)
+
+
+class TestRunPandoc(unittest.TestCase):
+    """Test cases for running Pandoc from asyncio code."""
+
+    def test_failed_process(self):
+        """Check if a failing process raises CalledProcessError."""
+        with self.assertRaises(subprocess.CalledProcessError) as context_manager:
+            asyncio.run(
+                aio.run_pandoc(
+                    [sys.executable, "-c", "import sys; sys.exit('Failed')"], ""
+                )
+            )
+
+        self.assertEqual(1, context_manager.exception.returncode)
+        self.assertEqual("Failed\n", context_manager.exception.stderr)
+
+    def test_cancelled_process_is_killed(self):
+        """Check if the process is killed when its task is cancelled."""
+        processes = []
+        create_subprocess_exec = asyncio.create_subprocess_exec
+
+        async def record_process(*args, **kwargs):
+            process = await create_subprocess_exec(*args, **kwargs)
+            processes.append(process)
+            return process
+
+        async def cancel_sleep():
+            task = asyncio.ensure_future(
+                aio.run_pandoc([sys.executable, "-c", "import time; time.sleep(60)"])
+            )
+            while not processes:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(
+            aio.asyncio, "create_subprocess_exec", side_effect=record_process
+        ):
+            asyncio.run(cancel_sleep())
+
+        self.assertIsNotNone(processes[0].returncode)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+"""Test converting several articles in a single run of Pandoc."""
+
+import os
+import shutil
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, pandoc_reader, probe
+from pelican.plugins.pandoc_reader.batch import (
+    BATCH_MINIMUM_VERSION,
+    convert_batch,
+    get_batch_plan,
+)
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+TEST_DEFAULTS_FILES_PATH = os.path.abspath(os.path.join(DIR_PATH, "defaults_files"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none", "--toc"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+SOURCE_PATHS = [
+    os.path.join(TEST_CONTENT_PATH, file_name)
+    for file_name in (
+        "valid_content.md",
+        "valid_content_with_toc.md",
+        "valid_content_with_raw_paths.md",
+        "mathjax_content.md",
+    )
+]
+
+
+def batch_supported():
+    """Check if the installed Pandoc can run the batch driver."""
+    if not shutil.which("pandoc"):
+        return False
+    pandoc_info = probe.probe_pandoc("pandoc")
+    return pandoc_info.lua and pandoc_info.version_info >= BATCH_MINIMUM_VERSION
+
+
+class TestBatchPlan(unittest.TestCase):
+    """Test cases for deciding which command lines can be batched."""
+
+    def test_filters_are_replayed_in_order(self):
+        """Check if Lua filters and citeproc are applied in command line order."""
+        wordcount_filter = os.path.join(pandoc_reader.FILTERS_PATH, "wordcount.lua")
+        batch_plan = get_batch_plan(
+            [
+                "pandoc",
+                "--from",
+                "markdown+smart",
+                "-C",
+                f"--lua-filter={wordcount_filter}",
+            ]
+        )
+
+        self.assertEqual("markdown+smart", batch_plan.input_format)
+        self.assertEqual(
+            (("citeproc", None), ("lua", wordcount_filter)), batch_plan.steps
+        )
+
+    def test_json_filters_are_not_batched(self):
+        """Check if command lines with JSON filters are not batched."""
+        self.assertIsNone(
+            get_batch_plan(["pandoc", "--from", "markdown", "--filter", "my-filter"])
+        )
+
+    def test_input_format_from_defaults(self):
+        """Check if the input format is taken from the defaults files."""
+        batch_plan = get_batch_plan(
+            ["pandoc", "--defaults=my-defaults.yaml"],
+            {"reader": "markdown+smart", "writer": "html5", "citeproc": True},
+        )
+
+        self.assertEqual("markdown+smart", batch_plan.input_format)
+        self.assertEqual((("citeproc", None),), batch_plan.steps)
+
+
+@unittest.skipUnless(batch_supported(), "Pandoc 3.2.1 or higher needed")
+class TestBatchConversion(unittest.TestCase):
+    """Test cases for converting several articles in one run."""
+
+    def test_read_many_matches_read(self):
+        """Check if articles converted in a batch match those read one by one."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            CALCULATE_READING_TIME=True,
+        )
+        expected = [PandocReader(settings).read(path) for path in SOURCE_PATHS]
+
+        with mock.patch.object(PandocReader, "_run_pandoc", side_effect=AssertionError):
+            results = PandocReader(settings).read_many(SOURCE_PATHS)
+
+        # Setting this so that assert is able to execute the difference
+        self.maxDiff = None  # pylint: disable=invalid-name
+
+        self.assertEqual(len(expected), len(results))
+        for (expected_output, expected_metadata), (output, metadata) in zip(
+            expected, results
+        ):
+            self.assertEqual(expected_output, output)
+            self.assertEqual(
+                {key: str(value) for key, value in expected_metadata.items()},
+                {key: str(value) for key, value in metadata.items()},
+            )
+
+    def test_batch_size(self):
+        """Check if articles are converted PANDOC_BATCH_SIZE at a time."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_BATCH_SIZE=3,
+        )
+
+        with mock.patch.object(
+            pandoc_reader, "convert_batch", wraps=convert_batch
+        ) as batch:
+            PandocReader(settings).read_many(SOURCE_PATHS)
+
+        self.assertEqual([3, 1], [len(call.args[2]) for call in batch.call_args_list])
+
+    def test_failed_document_is_converted_alone(self):
+        """Check if a document that fails in a batch is converted on its own."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+        )
+
+        def fail_first(pandoc_cmd, batch_plan, contents):
+            return [None, *convert_batch(pandoc_cmd, batch_plan, contents)[1:]]
+
+        with (
+            mock.patch.object(pandoc_reader, "convert_batch", side_effect=fail_first),
+            mock.patch.object(
+                PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+            ) as run_pandoc,
+        ):
+            results = PandocReader(settings).read_many(SOURCE_PATHS)
+
+        run_pandoc.assert_called_once()
+        self.assertEqual(PandocReader(settings).read(SOURCE_PATHS[0])[0], results[0][0])
+
+    def test_read_many_with_defaults_files(self):
+        """Check if articles converted with defaults files can be batched."""
+        settings = get_settings(
+            PANDOC_DEFAULTS_FILES=[
+                os.path.join(TEST_DEFAULTS_FILES_PATH, "valid_defaults_with_toc.yaml")
+            ],
+        )
+        expected = [PandocReader(settings).read(path)[0] for path in SOURCE_PATHS]
+
+        with mock.patch.object(PandocReader, "_run_pandoc", side_effect=AssertionError):
+            results = PandocReader(settings).read_many(SOURCE_PATHS)
+
+        self.assertEqual(expected, [output for output, _ in results])
+
+
+if __name__ == "__main__":
+    unittest.main()
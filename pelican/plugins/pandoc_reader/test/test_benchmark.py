@@ -0,0 +1,80 @@
+"""Test the benchmark harness and the corpora it generates."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pelican.plugins.pandoc_reader import benchmark
+
+
+class TestGenerateCorpus(unittest.TestCase):
+    """Test cases for generating corpora of articles."""
+
+    def setUp(self):
+        """Create a temporary directory for the corpora generated."""
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_path)
+
+    def generate(self, name, spec):
+        """Generate a corpus in a directory of the temporary directory."""
+        return benchmark.generate_corpus(spec, os.path.join(self.temp_path, name))
+
+    def test_articles_have_what_was_asked_for(self):
+        """Check if articles have the code, math and citations asked for."""
+        spec = benchmark.CorpusSpec(
+            articles=3, paragraphs=4, code_blocks=2, math=1, citations=2
+        )
+
+        source_paths = self.generate("corpus", spec)
+
+        self.assertEqual(3, len(source_paths))
+        for source_path in source_paths:
+            with open(source_path, encoding="utf-8") as file_handle:
+                content = file_handle.read()
+            stem = os.path.splitext(source_path)[0]
+            self.assertTrue(content.startswith("---\ntitle: "))
+            self.assertEqual(4, content.count("```"))
+            self.assertEqual(2, content.count("$$"))
+            self.assertEqual(2, content.count("[@"))
+            self.assertTrue(os.path.isfile(f"{stem}.bib"))
+
+    def test_same_spec_same_corpus(self):
+        """Check if corpora generated from the same spec are identical."""
+        spec = benchmark.CorpusSpec(articles=2)
+
+        first, second = (self.generate(name, spec) for name in ("first", "second"))
+
+        for first_path, second_path in zip(first, second):
+            with (
+                open(first_path, encoding="utf-8") as first_file,
+                open(second_path, encoding="utf-8") as second_file,
+            ):
+                self.assertEqual(first_file.read(), second_file.read())
+
+
+class TestRunBenchmark(unittest.TestCase):
+    """Test cases for measuring what reading a corpus costs."""
+
+    def test_results(self):
+        """Check if throughput, stages and memory are measured."""
+        spec = benchmark.CorpusSpec(
+            articles=2, paragraphs=3, citations=1, table_of_contents=True
+        )
+
+        results = benchmark.run_benchmark(spec, trace_memory=True)
+
+        self.assertEqual(2, results["documents"])
+        self.assertEqual(2, results["spec"]["articles"])
+        self.assertGreater(results["output_bytes"], 0)
+        self.assertGreater(results["documents_per_second"], 0)
+        self.assertEqual(2, results["stages"]["pandoc"]["count"])
+        self.assertIn("bibliography", results["stages"])
+        self.assertGreater(results["memory"]["python_peak"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
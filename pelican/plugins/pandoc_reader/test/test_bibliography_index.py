@@ -0,0 +1,83 @@
+"""Test finding bibliographies with the pandoc-reader plugin."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pelican.plugins.pandoc_reader import BibliographyIndex
+
+
+def touch(*path_parts):
+    """Create an empty file, creating parent directories as needed."""
+    path = os.path.join(*path_parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w"):
+        pass
+    return path
+
+
+def bump_mtime(directory_path):
+    """Make sure a directory looks modified even on coarse-grained filesystems."""
+    mtime = os.stat(directory_path).st_mtime_ns + 1_000_000_000
+    os.utime(directory_path, ns=(mtime, mtime))
+
+
+class TestBibliographyIndex(unittest.TestCase):
+    """Test cases for the bibliography index."""
+
+    def setUp(self):
+        """Create a temporary content directory."""
+        self.content_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary content directory."""
+        shutil.rmtree(self.content_path)
+
+    def test_find_bibs_in_and_below_article_directory(self):
+        """Check if bibliographies are found in the same order os.walk finds them."""
+        source_path = touch(self.content_path, "posts", "my-post.md")
+        touch(self.content_path, "my-post.bib")
+        touch(self.content_path, "posts", "my-post.bib")
+        touch(self.content_path, "posts", "my-post.json")
+        touch(self.content_path, "posts", "refs", "my-post.yaml")
+        touch(self.content_path, "posts", "refs", "other-post.yaml")
+        touch(self.content_path, "posts", "refs", "deeper", "my-post.bibtex")
+
+        expected = []
+        for root, _, files in os.walk(os.path.dirname(source_path)):
+            for extension in ("json", "yaml", "bibtex", "bib"):
+                if f"my-post.{extension}" in files:
+                    expected.append(os.path.join(root, f"my-post.{extension}"))
+
+        bib_index = BibliographyIndex(self.content_path)
+        self.assertEqual(expected, bib_index.find(source_path))
+        self.assertEqual(4, len(expected))
+
+    def test_find_bibs_after_directories_change(self):
+        """Check if the index picks up bibliographies added or removed later."""
+        source_path = touch(self.content_path, "posts", "my-post.md")
+        self.assertEqual([], BibliographyIndex(self.content_path).find(source_path))
+
+        posts_path = os.path.join(self.content_path, "posts")
+        bib_path = touch(posts_path, "refs", "my-post.bib")
+        bump_mtime(posts_path)
+        self.assertEqual(
+            [bib_path], BibliographyIndex(self.content_path).find(source_path)
+        )
+
+        shutil.rmtree(os.path.join(posts_path, "refs"))
+        bump_mtime(posts_path)
+        self.assertEqual([], BibliographyIndex(self.content_path).find(source_path))
+
+    def test_find_bibs_outside_content_path(self):
+        """Check if bibliographies are found for files outside the content path."""
+        source_path = touch(self.content_path, "outside", "my-post.md")
+        bib_path = touch(self.content_path, "outside", "my-post.json")
+
+        bib_index = BibliographyIndex(os.path.join(self.content_path, "content"))
+        self.assertEqual([bib_path], bib_index.find(source_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
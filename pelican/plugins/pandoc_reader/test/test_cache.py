@@ -0,0 +1,180 @@
+"""Test the on-disk cache of the pandoc-reader plugin."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, fingerprint_cached_content
+from pelican.plugins.pandoc_reader.test.html.expected_html import (
+    HTML_TOC,
+    HTML_WITH_HEADINGS,
+)
+from pelican.readers import Readers
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+TEST_DEFAULTS_FILES_PATH = os.path.abspath(os.path.join(DIR_PATH, "defaults_files"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+
+class TestPandocCache(unittest.TestCase):
+    """Test cases for caching converted content on disk."""
+
+    def setUp(self):
+        """Create a temporary cache directory."""
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary cache directory."""
+        shutil.rmtree(self.cache_path)
+
+    def test_cache_hit_does_not_run_pandoc(self):
+        """Check if a cached article is returned without running Pandoc."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=[*PANDOC_ARGS, "--toc"],
+            PANDOC_CACHE=True,
+            PANDOC_CACHE_PATH=self.cache_path,
+            CALCULATE_READING_TIME=True,
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_toc.md")
+
+        PandocReader(settings).read(source_path)
+
+        with (
+            mock.patch.object(PandocReader, "_run_pandoc", side_effect=AssertionError),
+            mock.patch.object(
+                PandocReader, "_calculate_reading_time", side_effect=AssertionError
+            ),
+        ):
+            output, metadata = PandocReader(settings).read(source_path)
+
+        # Setting this so that assert is able to execute the difference
+        self.maxDiff = None  # pylint: disable=invalid-name
+
+        self.assertEqual(HTML_WITH_HEADINGS, output)
+        self.assertEqual("Valid Content with Table of Contents", str(metadata["title"]))
+        self.assertEqual("My Author", str(metadata["author"]))
+        self.assertEqual("2020-10-16 00:00:00", str(metadata["date"]))
+        self.assertEqual(HTML_TOC, str(metadata["toc"]))
+        self.assertEqual("1 minute", str(metadata["reading_time"]))
+
+    def test_changed_defaults_file_invalidates_cache(self):
+        """Check if editing a defaults file causes the article to be converted."""
+        defaults_file = os.path.join(self.cache_path, "defaults.yaml")
+        shutil.copy(
+            os.path.join(TEST_DEFAULTS_FILES_PATH, "valid_defaults.yaml"),
+            defaults_file,
+        )
+        settings = get_settings(
+            PANDOC_DEFAULTS_FILES=[defaults_file],
+            PANDOC_CACHE=True,
+            PANDOC_CACHE_PATH=os.path.join(self.cache_path, "cache"),
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+
+        PandocReader(settings).read(source_path)
+
+        with open(defaults_file, "a") as file_handle:
+            file_handle.write("\nsection-divs: true\n")
+
+        with mock.patch.object(
+            PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+        ) as run_pandoc:
+            PandocReader(settings).read(source_path)
+
+        run_pandoc.assert_called_once()
+
+    def test_cache_entries_are_written_atomically(self):
+        """Check if no temporary files are left behind in the cache."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_CACHE=True,
+            PANDOC_CACHE_PATH=self.cache_path,
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+
+        PandocReader(settings).read(source_path)
+
+        cached_files = [
+            file_name
+            for _, _, file_names in os.walk(self.cache_path)
+            for file_name in file_names
+        ]
+        self.assertTrue(cached_files)
+        for file_name in cached_files:
+            self.assertTrue(file_name.endswith(".json"))
+
+
+class TestPelicanContentCache(unittest.TestCase):
+    """Test cases for Pelican's own cache of content read."""
+
+    def setUp(self):
+        """Create a temporary cache directory."""
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary cache directory."""
+        shutil.rmtree(self.cache_path)
+
+    def read_file(self, arguments):
+        """Read an article through Pelican's readers, saving their cache."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=arguments,
+            CACHE_PATH=self.cache_path,
+            CACHE_CONTENT=True,
+            LOAD_CONTENT_CACHE=True,
+            CONTENT_CACHING_LAYER="reader",
+        )
+        readers = Readers(settings, "pandoc_readers")
+        readers.readers["md"] = PandocReader(settings)
+        fingerprint_cached_content(readers)
+
+        page = readers.read_file(TEST_CONTENT_PATH, "valid_content_with_toc.md")
+        readers.save_cache()
+        return page
+
+    def test_unchanged_settings_served_from_cache(self):
+        """Check if Pelican serves cached content while nothing changes."""
+        expected = self.read_file(PANDOC_ARGS).content
+
+        with mock.patch.object(PandocReader, "_run_pandoc", side_effect=AssertionError):
+            page = self.read_file(PANDOC_ARGS)
+
+        self.assertEqual(expected, page.content)
+
+    def test_changed_arguments_read_again(self):
+        """Check if Pelican reads content again once PANDOC_ARGS change."""
+        self.read_file(PANDOC_ARGS)
+
+        page = self.read_file([*PANDOC_ARGS, "--toc"])
+
+        self.assertEqual(HTML_TOC, str(page.metadata["toc"]))
+
+    def test_fingerprint(self):
+        """Check if the fingerprint changes with the command line only."""
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+
+        def fingerprint(arguments):
+            settings = get_settings(
+                PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=arguments
+            )
+            return PandocReader(settings).fingerprint(source_path)
+
+        self.assertEqual(fingerprint(PANDOC_ARGS), fingerprint(PANDOC_ARGS))
+        self.assertNotEqual(fingerprint(PANDOC_ARGS), fingerprint(["--wrap=none"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+"""Test converting BibTeX bibliographies to CSL JSON."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, probe
+from pelican.plugins.pandoc_reader.bibliography import (
+    CSL_JSON_WRITER_MINIMUM_VERSION,
+    convert_to_csl_json,
+)
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# Entries with text citeproc escapes itself and rich text markup
+RICH_TEXT_BIBLIOGRAPHY = r"""
+@book{publisher,
+  title = {Less than < more and \textit{italic} \textbf{bold} words},
+  author = {Doe, Jane and {Big & Small Ltd.}},
+  publisher = {Pub \& Co},
+  year = {2020},
+}
+@article{quoted,
+  title = {A “quoted” title with \textsc{small caps} and H\textsubscript{2}O},
+  author = {Roe, Richard},
+  journal = {Journal of Things \& Stuff},
+  year = {2021},
+}
+"""
+
+MATH_BIBLIOGRAPHY = r"""
+@article{math,
+  title = {Bounds on $x^2 + y$ for all $y$},
+  author = {Doe, Jane},
+  journal = {Annals},
+  year = {2019},
+}
+"""
+
+
+def csl_json_writer_supported():
+    """Check if the installed Pandoc can run the CSL JSON writer."""
+    if not shutil.which("pandoc"):
+        return False
+    pandoc_info = probe.probe_pandoc("pandoc")
+    return (
+        pandoc_info.lua and pandoc_info.version_info >= CSL_JSON_WRITER_MINIMUM_VERSION
+    )
+
+
+@unittest.skipUnless(csl_json_writer_supported(), "Pandoc 3.1.1 or higher needed")
+class TestCslJsonConversion(unittest.TestCase):
+    """Test cases for converting BibTeX bibliographies to CSL JSON."""
+
+    def setUp(self):
+        """Create a temporary cache directory."""
+        self.cache_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary cache directory."""
+        shutil.rmtree(self.cache_path)
+
+    def test_convert_to_csl_json(self):
+        """Check if a bibliography is converted once and keeps case protection."""
+        bib_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_citation.bib")
+
+        csl_json_path = convert_to_csl_json("pandoc", bib_path, self.cache_path)
+        with open(csl_json_path) as file_handle:
+            references = {
+                reference["id"]: reference for reference in json.load(file_handle)
+            }
+
+        self.assertEqual(7, len(references))
+        self.assertEqual(
+            '<span class="nocase">Is String theory falsifiable?</span>.'
+            " Can a theory that isn’t completely testable still be useful"
+            " to physics?",
+            references["alves2017"]["title"],
+        )
+
+        with mock.patch("subprocess.run", side_effect=AssertionError):
+            self.assertEqual(
+                csl_json_path,
+                convert_to_csl_json("pandoc", bib_path, self.cache_path),
+            )
+
+    def test_csl_json_passed_to_pandoc(self):
+        """Check if Pandoc is given the CSL JSON copy of the bibliography."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=["+smart"],
+            PANDOC_ARGS=["--citeproc", "--wrap=none"],
+            PANDOC_CACHE=True,
+            PANDOC_CACHE_PATH=self.cache_path,
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_citation.md")
+
+        with mock.patch.object(
+            PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+        ) as run_pandoc:
+            output, _ = PandocReader(settings).read(source_path)
+
+        bibliography_args = [
+            arg
+            for arg in run_pandoc.call_args[0][0]
+            if arg.startswith("--bibliography")
+        ]
+        self.assertEqual(1, len(bibliography_args))
+        self.assertTrue(bibliography_args[0].endswith(".json"))
+        self.assertTrue(
+            bibliography_args[0].startswith(f"--bibliography={self.cache_path}")
+        )
+        self.assertIn('id="ref-alves2017"', output)
+
+
+@unittest.skipUnless(csl_json_writer_supported(), "Pandoc 3.1.1 or higher needed")
+class TestCslJsonOutput(unittest.TestCase):
+    """Test cases for citations rendered from converted bibliographies."""
+
+    def setUp(self):
+        """Create a temporary content and cache directory."""
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_path)
+
+    def render(self, bibliography, keys, convert_bibtex):
+        """Return the HTML of an article citing keys of a BibTeX bibliography."""
+        content_path = os.path.join(self.temp_path, "content")
+        os.makedirs(content_path, exist_ok=True)
+        source_path = os.path.join(content_path, "article.md")
+        with open(source_path, "w", encoding="utf-8") as file_handle:
+            file_handle.write("---\ntitle: Article\n---\n\n")
+            file_handle.write(" ".join(f"[@{key}]" for key in keys) + "\n")
+        with open(
+            os.path.join(content_path, "article.bib"), "w", encoding="utf-8"
+        ) as file_handle:
+            file_handle.write(bibliography)
+
+        settings = get_settings(
+            PATH=content_path,
+            PANDOC_EXTENSIONS=["+smart"],
+            PANDOC_ARGS=["--citeproc", "--mathjax", "--wrap=none"],
+            PANDOC_CACHE=True,
+            PANDOC_CACHE_PATH=os.path.join(self.temp_path, f"cache-{convert_bibtex}"),
+            PANDOC_CONVERT_BIBTEX=convert_bibtex,
+        )
+        output, _ = PandocReader(settings).read(source_path)
+        return output
+
+    def test_same_output_as_bibtex(self):
+        """Check if citations render the same from BibTeX and from CSL JSON."""
+        keys = ["publisher", "quoted"]
+
+        output = self.render(RICH_TEXT_BIBLIOGRAPHY, keys, convert_bibtex=True)
+
+        self.assertEqual(
+            self.render(RICH_TEXT_BIBLIOGRAPHY, keys, convert_bibtex=False), output
+        )
+        self.assertIn("Pub &amp; Co", output)
+        self.assertNotIn("&amp;amp;", output)
+        self.assertTrue(
+            os.listdir(os.path.join(self.temp_path, "cache-True", "csl-json"))
+        )
+
+    def test_math_keeps_bibtex(self):
+        """Check if bibliographies with math are passed to Pandoc unconverted."""
+        output = self.render(MATH_BIBLIOGRAPHY, ["math"], convert_bibtex=True)
+
+        self.assertEqual(
+            self.render(MATH_BIBLIOGRAPHY, ["math"], convert_bibtex=False), output
+        )
+        self.assertIn('<span class="math inline">\\(x^2 + y\\)</span>', output)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.temp_path, "cache-True", "csl-json"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,268 @@
+"""Test reading metadata first and converting bodies when they are needed."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican import Pelican, signals
+from pelican.contents import Article
+from pelican.plugins.pandoc_reader import (
+    PandocReader,
+    add_reader,
+    attach_deferred_content,
+)
+from pelican.plugins.pandoc_reader.deferred import DeferredContent
+from pelican.plugins.pandoc_reader.frontmatter import parse_plain_metadata
+from pelican.readers import Readers
+from pelican.settings import read_settings
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+
+def read(source_path, pandoc_args=PANDOC_ARGS, **kwargs):
+    """Read a file with PANDOC_DEFER_CONTENT set as given in kwargs."""
+    settings = get_settings(
+        PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=pandoc_args, **kwargs
+    )
+    return PandocReader(settings).read(source_path)
+
+
+def as_strings(metadata):
+    """Return metadata with its values as strings for comparison."""
+    return {key: str(value) for key, value in metadata.items()}
+
+
+class TestDeferredRead(unittest.TestCase):
+    """Test cases for reading files with their bodies deferred."""
+
+    def setUp(self):
+        """Create a temporary directory for the files read."""
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_path)
+
+    def test_body_converted_when_needed(self):
+        """Check if Pandoc only runs once the body is asked for."""
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+        expected_output, expected_metadata = read(source_path)
+
+        with mock.patch.object(
+            PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+        ) as run_pandoc:
+            output, metadata = read(source_path, PANDOC_DEFER_CONTENT=True)
+
+            self.assertIsInstance(output, DeferredContent)
+            self.assertEqual(as_strings(expected_metadata), as_strings(metadata))
+            run_pandoc.assert_not_called()
+
+            self.assertEqual(expected_output, str(output))
+            self.assertEqual(expected_output, str(output))
+            run_pandoc.assert_called_once()
+
+    def test_metadata_rendered_by_pandoc(self):
+        """Check if metadata Pandoc would change is converted on its own."""
+        source_path = os.path.join(self.temp_path, "article.md")
+        with open(source_path, "w", encoding="utf-8") as file_handle:
+            file_handle.write("---\ntitle: It's *here*\n---\n\nBody\n")
+        expected_output, expected_metadata = read(source_path)
+
+        with mock.patch.object(
+            PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+        ) as run_pandoc:
+            output, metadata = read(source_path, PANDOC_DEFER_CONTENT=True)
+
+        run_pandoc.assert_called_once_with(mock.ANY, "---\ntitle: It's *here*\n---\n")
+        self.assertEqual("It’s <em>here</em>", str(metadata["title"]))
+        self.assertEqual(as_strings(expected_metadata), as_strings(metadata))
+        self.assertEqual(expected_output, str(output))
+
+    def test_metadata_with_extensions_rendered_by_pandoc(self):
+        """Check if metadata is rendered by Pandoc with extensions not on by default."""
+        source_path = os.path.join(self.temp_path, "article.md")
+        with open(source_path, "w", encoding="utf-8") as file_handle:
+            file_handle.write(
+                '---\ntitle: "Hi :smile:"\nsummary: See http://example/com\n---\n\nBody\n'
+            )
+        settings = {
+            "PANDOC_EXTENSIONS": [*PANDOC_EXTENSIONS, "+emoji", "+autolink_bare_uris"]
+        }
+        _, expected_metadata = PandocReader(get_settings(**settings)).read(source_path)
+
+        _, metadata = PandocReader(
+            get_settings(**settings, PANDOC_DEFER_CONTENT=True)
+        ).read(source_path)
+
+        self.assertIn('class="emoji"', str(metadata["title"]))
+        self.assertIn('class="uri"', str(metadata["summary"]))
+        self.assertEqual(as_strings(expected_metadata), as_strings(metadata))
+
+    def test_not_deferred_with_table_of_contents(self):
+        """Check if bodies are converted at once when metadata depends on them."""
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_toc.md")
+
+        output, metadata = read(
+            source_path, [*PANDOC_ARGS, "--toc"], PANDOC_DEFER_CONTENT=True
+        )
+
+        self.assertIsInstance(output, str)
+        self.assertIn("toc", metadata)
+
+
+class TestDeferredContentObjects(unittest.TestCase):
+    """Test cases for Pelican content objects holding deferred bodies."""
+
+    def setUp(self):
+        """Render deferred bodies of the content objects created."""
+        signals.content_object_init.connect(attach_deferred_content)
+
+    def tearDown(self):
+        """Stop handling content objects."""
+        signals.content_object_init.disconnect(attach_deferred_content)
+
+    def read_article(self, file_name, defer=True):
+        """Read an article through Pelican's readers."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_DEFER_CONTENT=defer,
+        )
+        readers = Readers(settings)
+        readers.readers["md"] = PandocReader(settings)
+        return readers.read_file(TEST_CONTENT_PATH, file_name, content_class=Article)
+
+    def test_article_without_static_links(self):
+        """Check if articles only run Pandoc once their content is used."""
+        with mock.patch.object(
+            PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+        ) as run_pandoc:
+            article = self.read_article("valid_content.md")
+
+            self.assertEqual("Valid Content", article.title)
+            self.assertEqual(set(), article.get_static_links())
+            run_pandoc.assert_not_called()
+
+            content = article.content
+            run_pandoc.assert_called_once()
+
+        self.assertEqual(
+            read(os.path.join(TEST_CONTENT_PATH, "valid_content.md"))[0], content
+        )
+        self.assertIsInstance(article._content, str)
+
+    def test_article_with_static_links(self):
+        """Check if bodies that may link static files are converted for them."""
+        expected = self.read_article("valid_content_with_raw_paths.md", defer=False)
+        article = self.read_article("valid_content_with_raw_paths.md")
+
+        self.assertTrue(expected.get_static_links())
+        self.assertEqual(expected.get_static_links(), article.get_static_links())
+        self.assertIsInstance(article._content, str)
+
+
+class TestDeferredBuild(unittest.TestCase):
+    """Test cases for Pelican builds with bodies read deferred."""
+
+    def setUp(self):
+        """Create a site whose files are not all written and use the plugin."""
+        self.temp_path = tempfile.mkdtemp()
+        self.content_path = os.path.join(self.temp_path, "content")
+        os.makedirs(os.path.join(self.content_path, "pages"))
+        for name, title, metadata in (
+            ("published.md", "Published", ""),
+            ("skipped.md", "Skipped", "status: skip\n"),
+            ("draft.md", "Draft", "status: draft\n"),
+            (
+                os.path.join("pages", "unwritten.md"),
+                "Unwritten",
+                'status: hidden\nsave_as: ""\n',
+            ),
+        ):
+            with open(
+                os.path.join(self.content_path, name), "w", encoding="utf-8"
+            ) as file_handle:
+                file_handle.write(
+                    f"---\ntitle: {title}\ndate: 2024-01-01\n{metadata}---\n\n"
+                    "Body with *emphasis*.\n"
+                )
+
+        signals.readers_init.connect(add_reader)
+        signals.content_object_init.connect(attach_deferred_content)
+
+    def tearDown(self):
+        """Stop using the plugin and remove the site."""
+        signals.readers_init.disconnect(add_reader)
+        signals.content_object_init.disconnect(attach_deferred_content)
+        shutil.rmtree(self.temp_path)
+
+    def build(self, defer):
+        """Build the site, returning how many times Pandoc ran and the output."""
+        output_path = os.path.join(self.temp_path, f"output-{defer}")
+        settings = read_settings(
+            override={
+                "PATH": self.content_path,
+                "OUTPUT_PATH": output_path,
+                "PLUGINS": [],
+                "CACHE_CONTENT": False,
+                "TIMEZONE": "UTC",
+                "DRAFT_SAVE_AS": "",
+                "PANDOC_ARGS": PANDOC_ARGS,
+                "PANDOC_EXTENSIONS": PANDOC_EXTENSIONS,
+                "PANDOC_DEFER_CONTENT": defer,
+            }
+        )
+        with mock.patch.object(
+            PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+        ) as run_pandoc:
+            Pelican(settings).run()
+
+        with open(
+            os.path.join(output_path, "published.html"), encoding="utf-8"
+        ) as file_handle:
+            return run_pandoc.call_count, file_handle.read()
+
+    def test_files_not_written_are_not_converted(self):
+        """Check if files read but never written cost no Pandoc runs."""
+        expected_runs, expected_output = self.build(defer=False)
+
+        runs, output = self.build(defer=True)
+
+        self.assertEqual(4, expected_runs)
+        self.assertEqual(1, runs)
+        self.assertEqual(expected_output, output)
+        self.assertIn("<em>emphasis</em>", output)
+
+
+class TestParsePlainMetadata(unittest.TestCase):
+    """Test cases for reading metadata without Pandoc."""
+
+    def test_plain_values(self):
+        """Check if values Pandoc leaves as they are are read."""
+        self.assertEqual(
+            {"title": "Café", "date": "2020-10-16", "tags": ["a", "b c"], "n": "3"},
+            parse_plain_metadata(
+                "---\ntitle: Café\ndate: 2020-10-16\ntags: [a, b c]\nn: 3\n---\n"
+            ),
+        )
+
+    def test_values_pandoc_changes(self):
+        """Check if values Pandoc renders differently are left to it."""
+        for value in ("It's", "*a*", "a -- b", "Mr. Smith", "1.50", "true", "&a b"):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_plain_metadata(f"---\nx: {value}\n---\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
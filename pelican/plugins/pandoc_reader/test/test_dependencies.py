@@ -0,0 +1,268 @@
+"""Test tracking the files articles depend on."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, defaults, dependencies
+from pelican.tests.support import get_settings
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+ARTICLE = "---\ntitle: Article\n---\n\nText\n"
+FILTER = """
+local function replace(element)
+  if element.text == "Text" then
+    return pandoc.Str("{text}")
+  end
+end
+
+return {{ {{ Str = replace }} }}
+"""
+
+
+class DependencyTestCase(unittest.TestCase):
+    """Base class for tests writing files to a temporary directory."""
+
+    def setUp(self):
+        """Create a temporary directory for the files written."""
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_path)
+
+    def write(self, name, text):
+        """Write text to a file in the temporary directory and return its path."""
+        path = os.path.join(self.temp_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file_handle:
+            file_handle.write(text)
+        return path
+
+
+class TestFindDependencies(DependencyTestCase):
+    """Test cases for finding the files named on a Pandoc command line."""
+
+    def test_options_on_command_line(self):
+        """Check if files are found in all the forms options are given in."""
+        paths = [
+            self.write(name, "")
+            for name in ("filter.lua", "header.html", "before.html", "page.html")
+        ]
+
+        found = dependencies.find_dependencies(
+            [
+                "pandoc",
+                f"--lua-filter={paths[0]}",
+                "-H",
+                paths[1],
+                f"-B{paths[2]}",
+                "--template",
+                paths[3],
+                "--toc",
+                "--csl=https://example.com/style.csl",
+            ]
+        )
+
+        self.assertEqual(sorted(paths), found)
+
+    def test_missing_file(self):
+        """Check if no dependencies are given when a file named is missing."""
+        filter_path = self.write("filter.lua", "")
+
+        found = dependencies.find_dependencies(
+            [
+                "pandoc",
+                f"--lua-filter={filter_path}",
+                f"--include-after-body={self.temp_path}/missing.html",
+            ]
+        )
+
+        self.assertIsNone(found)
+
+    def test_resource_path(self):
+        """Check if bibliographies are looked up in the resource path."""
+        bib_path = self.write(os.path.join("refs", "refs.bib"), "")
+
+        found = dependencies.find_dependencies(
+            [
+                "pandoc",
+                f"--resource-path={os.path.dirname(bib_path)}",
+                "--bibliography=refs.bib",
+            ]
+        )
+
+        self.assertEqual([bib_path], found)
+
+    def test_defaults_files(self):
+        """Check if defaults files and the files they name are found."""
+        filter_path = self.write("filter.lua", "")
+        header_path = self.write("header.html", "")
+        included_path = self.write(
+            "included.yaml", f"include-in-header:\n  - {header_path}\n"
+        )
+        defaults_path = self.write(
+            "defaults.yaml",
+            f"defaults: {included_path}\n"
+            "reader: markdown\n"
+            "writer: html5\n"
+            f"filters:\n  - type: lua\n    path: {filter_path}\n",
+        )
+
+        found = dependencies.find_dependencies(
+            ["pandoc", f"--defaults={defaults_path}"]
+        )
+
+        self.assertEqual(
+            sorted([filter_path, header_path, included_path, defaults_path]), found
+        )
+
+    def test_paths_relative_to_defaults_files(self):
+        """Check if ${.} and ${USERDATA} in defaults files are expanded."""
+        filter_path = self.write(os.path.join("defaults", "filter.lua"), "")
+        header_path = self.write(os.path.join("data", "header.html"), "")
+        defaults_path = self.write(
+            os.path.join("defaults", "defaults.yaml"),
+            "filters:\n  - citeproc\n  - ${.}/filter.lua\n"
+            "include-in-header: ${USERDATA}/header.html\n",
+        )
+
+        with mock.patch.object(
+            defaults,
+            "user_data_directory",
+            return_value=os.path.join(self.temp_path, "data"),
+        ):
+            found = dependencies.find_dependencies(
+                ["pandoc", f"--defaults={defaults_path}"]
+            )
+
+        self.assertEqual(sorted([filter_path, header_path, defaults_path]), found)
+
+
+class TestDependencyGraph(DependencyTestCase):
+    """Test cases for the reverse index of dependencies."""
+
+    def test_dependents_after_reload(self):
+        """Check if the articles depending on a file are found once stored."""
+        graph_path = os.path.join(self.temp_path, "cache", "dependencies.json")
+        shared_path = self.write("shared.bib", "")
+        own_path = self.write("own.bib", "")
+        graph = dependencies.DependencyGraph(graph_path)
+        graph.record("first.md", [shared_path, own_path])
+        graph.record("second.md", [shared_path])
+        graph.save()
+
+        graph = dependencies.DependencyGraph(graph_path)
+
+        self.assertEqual(
+            [os.path.abspath("first.md"), os.path.abspath("second.md")],
+            graph.dependents(shared_path),
+        )
+        self.assertEqual([os.path.abspath("first.md")], graph.dependents(own_path))
+        self.assertEqual([], graph.changed())
+
+    def test_changed_dependencies(self):
+        """Check if changed and removed dependencies are reported."""
+        changed_path = self.write("changed.lua", "")
+        removed_path = self.write("removed.lua", "")
+        graph = dependencies.DependencyGraph(
+            os.path.join(self.temp_path, "dependencies.json")
+        )
+        graph.record("article.md", [changed_path, removed_path])
+
+        self.write("changed.lua", "-- changed\n")
+        os.remove(removed_path)
+
+        self.assertEqual(sorted([changed_path, removed_path]), graph.changed())
+
+
+class TestReaderDependencies(DependencyTestCase):
+    """Test cases for converting articles again when dependencies change."""
+
+    def test_only_affected_articles_converted_again(self):
+        """Check if a changed filter only converts the articles using it again."""
+        filter_path = self.write("filter.lua", FILTER.format(text="First"))
+        filtered_path = self.write(os.path.join("filtered", "a.md"), ARTICLE)
+        plain_path = self.write(os.path.join("plain", "b.md"), ARTICLE)
+        cache_path = os.path.join(self.temp_path, "cache")
+
+        def read(source_path, arguments):
+            settings = get_settings(
+                PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+                PANDOC_ARGS=[*PANDOC_ARGS, *arguments],
+                PANDOC_CACHE=True,
+                PANDOC_CACHE_PATH=cache_path,
+            )
+            return PandocReader(settings).read(source_path)[0]
+
+        self.assertEqual(
+            "<p>First</p>", read(filtered_path, [f"--lua-filter={filter_path}"])
+        )
+        read(plain_path, [])
+        self.write("filter.lua", FILTER.format(text="Second"))
+
+        with mock.patch.object(
+            PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+        ) as run_pandoc:
+            self.assertEqual(
+                "<p>Second</p>", read(filtered_path, [f"--lua-filter={filter_path}"])
+            )
+            read(plain_path, [])
+
+        self.assertEqual(1, run_pandoc.call_count)
+        graph = dependencies.get_dependency_graph(cache_path)
+        self.assertEqual([filtered_path], graph.dependents(filter_path))
+
+    def test_filter_relative_to_defaults_file_changed(self):
+        """Check if a changed ${.} filter of a defaults file converts again."""
+        self.write("filter.lua", FILTER.format(text="First"))
+        defaults_path = self.write(
+            "defaults.yaml",
+            "reader: markdown\nwriter: html5\nfilters:\n  - ${.}/filter.lua\n",
+        )
+        source_path = self.write("article.md", ARTICLE)
+        settings = get_settings(
+            PANDOC_DEFAULTS_FILES=[defaults_path],
+            PANDOC_CACHE=True,
+            PANDOC_CACHE_PATH=os.path.join(self.temp_path, "cache"),
+        )
+
+        self.assertEqual("<p>First</p>", PandocReader(settings).read(source_path)[0])
+        fingerprint = PandocReader(settings).fingerprint(source_path)
+        self.write("filter.lua", FILTER.format(text="Second"))
+
+        self.assertEqual("<p>Second</p>", PandocReader(settings).read(source_path)[0])
+        self.assertNotEqual(
+            fingerprint, PandocReader(settings).fingerprint(source_path)
+        )
+
+    def test_missing_file_not_cached(self):
+        """Check if articles depending on a file that cannot be found are not cached."""
+        source_path = self.write("article.md", ARTICLE)
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=[*PANDOC_ARGS, "--lua-filter=not-on-disk.lua"],
+            PANDOC_CACHE=True,
+            PANDOC_CACHE_PATH=os.path.join(self.temp_path, "cache"),
+        )
+        pandoc_reader = PandocReader(settings)
+        pandoc_executable, pandoc_info = pandoc_reader._get_pandoc()
+
+        conversion = pandoc_reader._prepare_conversion(
+            source_path, ARTICLE, pandoc_executable, pandoc_info
+        )
+
+        self.assertIsNone(conversion.cache_key)
+        self.assertIsNone(pandoc_reader.fingerprint(source_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
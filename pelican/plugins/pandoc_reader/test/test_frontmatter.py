@@ -0,0 +1,114 @@
+"""Test finding the YAML metadata block of sources."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from pelican.plugins.pandoc_reader import PandocReader, frontmatter
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+
+class TestFindFrontMatter(unittest.TestCase):
+    """Test cases for finding the metadata block in text."""
+
+    def test_range_of_metadata_block(self):
+        """Check if the range given covers the metadata block and delimiters."""
+        content = "---\ntitle: Title\n...\nBody\n"
+
+        front_matter = frontmatter.find_front_matter(content)
+
+        self.assertEqual("---\ntitle: Title\n...\n", content[: front_matter.end])
+        self.assertEqual(0, front_matter.start)
+
+    def test_same_errors_as_reader(self):
+        """Check if missing metadata blocks are reported as by the reader."""
+        for content, message in (
+            ("", "Could not find metadata. File is empty."),
+            ("Body\n", "Could not find metadata header '---'."),
+            ("---\ntitle: Title\nBody\n", "Could not find end of metadata block."),
+            ("---\n---\nBody\n", "Could not find end of metadata block."),
+        ):
+            with (
+                self.subTest(content=content),
+                self.assertRaises(Exception) as context_manager,
+            ):
+                frontmatter.find_front_matter(content)
+
+            self.assertEqual(message, str(context_manager.exception))
+
+    def test_reader_returns_range(self):
+        """Check if the reader keeps the range for later stages."""
+        # pylint: disable=protected-access
+        front_matter = PandocReader._check_yaml_metadata_block(
+            "---\ntitle: Title\n---\n"
+        )
+
+        self.assertEqual(frontmatter.FrontMatter(0, 21), front_matter)
+
+
+class TestScanFrontMatter(unittest.TestCase):
+    """Test cases for finding the metadata block in files."""
+
+    def setUp(self):
+        """Create a temporary directory for the files scanned."""
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_path)
+
+    def write(self, data):
+        """Write data to a file and return its path."""
+        source_path = os.path.join(self.temp_path, "source.md")
+        with open(source_path, "wb") as file_handle:
+            file_handle.write(data)
+        return source_path
+
+    def test_range_in_bytes(self):
+        """Check if the range is given in bytes past a byte order mark."""
+        data = "\ufeff---\r\ntitle: Café\r\n---\r\nBody".encode()
+
+        front_matter = frontmatter.scan_front_matter(self.write(data))
+
+        self.assertEqual(
+            "---\r\ntitle: Café\r\n---\r\n".encode(),
+            data[front_matter.start : front_matter.end],
+        )
+
+    def test_empty_file(self):
+        """Check if an empty file is reported as such."""
+        with self.assertRaises(Exception) as context_manager:
+            frontmatter.scan_front_matter(self.write(b""))
+
+        self.assertEqual(
+            "Could not find metadata. File is empty.", str(context_manager.exception)
+        )
+
+    def test_same_result_as_text(self):
+        """Check if files give the same result as their decoded text."""
+        for file_name in sorted(os.listdir(TEST_CONTENT_PATH)):
+            source_path = os.path.join(TEST_CONTENT_PATH, file_name)
+            with open(source_path, encoding="utf-8") as file_handle:
+                content = file_handle.read()
+
+            with self.subTest(file_name=file_name):
+                try:
+                    expected = frontmatter.find_front_matter(content).end
+                except Exception as scan_error:  # noqa: BLE001
+                    expected = str(scan_error)
+                try:
+                    front_matter = frontmatter.scan_front_matter(source_path)
+                    result = len(
+                        content.encode("utf-8")[: front_matter.end].decode("utf-8")
+                    )
+                except Exception as scan_error:  # noqa: BLE001
+                    result = str(scan_error)
+
+                self.assertEqual(expected, result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""Test exporting metrics of the articles read in a build."""
+
+import contextlib
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, cache, report_timings
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for the metrics written at the end of a build."""
+
+    def setUp(self):
+        """Create a temporary directory for the metrics and cache."""
+        self.temp_path = tempfile.mkdtemp()
+        self.metrics_path = os.path.join(self.temp_path, "pandoc_reader.prom")
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_path)
+
+    def build(self, file_names):
+        """Read files in a build and return the samples of the metrics written."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            CALCULATE_READING_TIME=True,
+            PANDOC_CACHE=True,
+            PANDOC_CACHE_PATH=os.path.join(self.temp_path, "cache"),
+            PANDOC_METRICS_FILE=self.metrics_path,
+        )
+        reader = PandocReader(settings)
+        for file_name in file_names:
+            # Files that fail to be read are counted as failures
+            with contextlib.suppress(Exception):
+                reader.read(os.path.join(TEST_CONTENT_PATH, file_name))
+        report_timings(mock.Mock(settings=settings))
+
+        samples = {}
+        with open(self.metrics_path, encoding="utf-8") as file_handle:
+            for line in file_handle:
+                if not line.startswith("#"):
+                    name, value = line.rsplit(" ", 1)
+                    samples[name] = float(value)
+        return samples
+
+    def test_documents_read(self):
+        """Check if documents converted, failed and their bytes are counted."""
+        samples = self.build(["valid_content.md", "no_metadata.md", "empty.md"])
+
+        self.assertEqual(1, samples["pandoc_reader_documents_read_total"])
+        self.assertEqual(2, samples["pandoc_reader_document_failures_total"])
+        self.assertEqual(1, samples["pandoc_reader_documents_converted_total"])
+        self.assertEqual(1, samples["pandoc_reader_reading_times_total"])
+        self.assertEqual(0, samples["pandoc_reader_citation_documents_total"])
+        self.assertEqual(
+            os.path.getsize(os.path.join(TEST_CONTENT_PATH, "valid_content.md")),
+            samples["pandoc_reader_input_bytes_total"],
+        )
+        self.assertGreater(samples["pandoc_reader_output_bytes_total"], 0)
+        self.assertGreaterEqual(samples["pandoc_reader_pandoc_processes_total"], 1)
+
+    def test_stage_histograms(self):
+        """Check if the time spent in each stage is given as histograms."""
+        samples = self.build(["valid_content.md", "valid_content_with_toc.md"])
+
+        self.assertEqual(
+            2, samples['pandoc_reader_stage_seconds_count{stage="pandoc"}']
+        )
+        self.assertEqual(
+            2, samples['pandoc_reader_stage_seconds_bucket{stage="pandoc",le="+Inf"}']
+        )
+        self.assertIn('pandoc_reader_stage_seconds_sum{stage="extraction"}', samples)
+
+    def test_cache_hits(self):
+        """Check if documents served from the cache are not counted as converted."""
+        self.build(["valid_content.md"])
+
+        samples = self.build(["valid_content.md"])
+
+        self.assertEqual(1, samples["pandoc_reader_cache_hits_total"])
+        self.assertEqual(0, samples["pandoc_reader_documents_converted_total"])
+        self.assertEqual(0, samples["pandoc_reader_pandoc_processes_total"])
+
+    @unittest.skipUnless(hasattr(os, "fchmod"), "File modes not supported")
+    def test_file_readable_by_others(self):
+        """Check if the metrics file gets the mode the umask gives new files."""
+        umask = os.umask(0o027)
+        cache._umask.cache_clear()
+        try:
+            self.build(["valid_content.md"])
+        finally:
+            os.umask(umask)
+            cache._umask.cache_clear()
+
+        self.assertEqual(0o640, stat.S_IMODE(os.stat(self.metrics_path).st_mode))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,12 @@
 
 import os
 import shutil
+import subprocess
+import tempfile
 import unittest
+from unittest import mock
 
-from pelican.plugins.pandoc_reader import PandocReader
+from pelican.plugins.pandoc_reader import PandocReader, probe
 from pelican.tests.support import get_settings
 
 DIR_PATH = os.path.dirname(__file__)
@@ -93,5 +96,46 @@ class TestPandocAvailability(unittest.TestCase):
         self.assertEqual("Pandoc version must be 2.11 or higher.", message)
 
 
+@unittest.skipUnless(shutil.which("pandoc"), "Pandoc is not installed")
+class TestPandocProbe(unittest.TestCase):
+    """Test that the pandoc executable is probed only once."""
+
+    def setUp(self):
+        """Forget executables probed by earlier tests."""
+        probe._PROBES.clear()
+
+    def test_probe_runs_once_per_process(self):
+        """Check if pandoc --version is not run again for every file."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+
+        with mock.patch.object(
+            subprocess, "run", wraps=subprocess.run
+        ) as subprocess_run:
+            PandocReader(settings).read(source_path)
+            PandocReader(settings).read(source_path)
+
+        version_calls = [
+            call for call in subprocess_run.call_args_list if "--version" in call[0][0]
+        ]
+        self.assertEqual(1, len(version_calls))
+
+    def test_probe_is_persisted(self):
+        """Check if the probe is loaded from disk by a new process."""
+        with tempfile.TemporaryDirectory() as cache_path:
+            pandoc_info = probe.probe_pandoc("pandoc", cache_path)
+            probe._PROBES.clear()
+
+            with mock.patch.object(probe, "_run_probe", side_effect=AssertionError):
+                self.assertEqual(pandoc_info, probe.probe_pandoc("pandoc", cache_path))
+
+        self.assertIn("markdown", pandoc_info.input_formats)
+        self.assertIn("smart", pandoc_info.markdown_extensions)
+        self.assertGreaterEqual(pandoc_info.version_info, (2, 11))
+
+
 if __name__ == "__main__":
     unittest.main()
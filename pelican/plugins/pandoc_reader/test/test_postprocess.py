@@ -0,0 +1,144 @@
+"""Test transforming the HTML output of Pandoc."""
+
+import os
+import unittest
+
+from pelican.plugins.pandoc_reader import HtmlTransform, PandocReader
+from pelican.plugins.pandoc_reader.postprocess import HtmlPipeline, RawLinksTransform
+from pelican.plugins.pandoc_reader.test.html.expected_html import HTML_RAW_CONVERSION
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+HTML = (
+    "<!-- a comment -->\n"
+    '<p>Text &amp; “quotes” &#169;<br />\nline <img src="a.png" alt="A" /></p>\n'
+    '<p><a href="https://example.com" class="external">link</a> <input disabled></p>\n'
+    "<script>if (a<b && c>d) { x = '</div>'; }</script>\n"
+    "<pre><code>&lt;x&gt; &amp; y</code></pre>\n"
+    "<![CDATA[data]]>"
+)
+
+
+class MarkExternalLinks(HtmlTransform):
+    """Add rel="external" to links to other sites."""
+
+    def start_tag(self, tag, attrs):
+        """Add rel="external" to links starting with https://."""
+        if tag == "a" and dict(attrs).get("href", "").startswith("https://"):
+            return [*attrs, ("rel", "external")]
+        return attrs
+
+
+class UpperCaseText(HtmlTransform):
+    """Upper-case all text."""
+
+    def text(self, text):
+        """Return the text upper-cased."""
+        return text.upper()
+
+
+class RecordText(HtmlTransform):
+    """Record the text passed to transforms."""
+
+    def __init__(self):
+        """Start with no text recorded."""
+        self.texts = []
+
+    def text(self, text):
+        """Record text and leave it as it is."""
+        self.texts.append(text)
+        return text
+
+
+class TestHtmlPipeline(unittest.TestCase):
+    """Test cases for rewriting HTML in a single pass."""
+
+    def test_unchanged_markup_is_kept_as_written(self):
+        """Check if markup no transform changes is written back unchanged."""
+        pipeline = HtmlPipeline([HtmlTransform(), RecordText()])
+
+        self.assertEqual(HTML, pipeline.run(HTML))
+
+    def test_end_tags_are_kept_as_written(self):
+        """Check if end tags keep their case and whitespace."""
+        html = (
+            "<DIV CLASS=a>raw</DIV ><Span>text</sPan\n><p>x</P>"
+            "<SCRIPT>if (a </b) {}</SCRIPT >"
+        )
+        pipeline = HtmlPipeline([RecordText()])
+
+        self.assertEqual(html, pipeline.run(html))
+
+    def test_changed_start_tags_are_rewritten(self):
+        """Check if start tags whose attributes change are rewritten."""
+        output = HtmlPipeline([MarkExternalLinks()]).run(HTML)
+
+        self.assertIn(
+            '<a href="https://example.com" class="external" rel="external">link</a>',
+            output,
+        )
+        self.assertIn('<img src="a.png" alt="A" />', output)
+
+    def test_text_is_passed_in_runs(self):
+        """Check if text is passed whole, without script contents or comments."""
+        record_text = RecordText()
+
+        HtmlPipeline([record_text]).run(HTML)
+
+        self.assertIn("Text &amp; “quotes” &#169;", record_text.texts)
+        self.assertIn("&lt;x&gt; &amp; y", record_text.texts)
+        self.assertFalse(
+            any("</div>" in text or "comment" in text for text in record_text.texts)
+        )
+
+    def test_transforms_are_chained(self):
+        """Check if each transform gets what the one before it returned."""
+        output = HtmlPipeline([UpperCaseText(), RecordText()]).run("<p>text</p>")
+
+        self.assertEqual("<p>TEXT</p>", output)
+
+    def test_raw_links_only_in_link_attributes(self):
+        """Check if encoded links are only restored in href and src attributes."""
+        output = HtmlPipeline([RawLinksTransform()]).run(
+            '<p><a href="%7Bstatic%7D/a.pdf" title="%7Bstatic%7D">%7Bstatic%7D</a>'
+            ' <img src="%7Battach%7Db.png" alt="B" /></p>'
+        )
+
+        self.assertEqual(
+            '<p><a href="{static}/a.pdf" title="%7Bstatic%7D">%7Bstatic%7D</a>'
+            ' <img src="{attach}b.png" alt="B" /></p>',
+            output,
+        )
+
+
+class TestHtmlTransformsSetting(unittest.TestCase):
+    """Test cases for applying the transforms given in the settings."""
+
+    def test_transforms_are_applied(self):
+        """Check if PANDOC_HTML_TRANSFORMS run after the raw links are restored."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_HTML_TRANSFORMS=[UpperCaseText()],
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_raw_paths.md")
+
+        output, _ = PandocReader(settings).read(source_path)
+
+        self.assertEqual(
+            HtmlPipeline([UpperCaseText()]).run(HTML_RAW_CONVERSION), output
+        )
+        self.assertIn('<a href="{static}/path/to/file">AT</a>', output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""Test converting files in parallel before Pelican reads them."""
+
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+from pelican import signals
+from pelican.plugins.pandoc_reader import PandocReader, pandoc_reader, prefetch
+from pelican.readers import Readers
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+
+def start_prefetch(settings):
+    """Send the readers_init signal as Pelican does for the given settings."""
+    readers = types.SimpleNamespace(
+        settings=settings,
+        reader_classes=dict.fromkeys(PandocReader.file_extensions, PandocReader),
+    )
+    pandoc_reader.start_prefetch(readers)
+
+
+class TestPrefetch(unittest.TestCase):
+    """Test cases for prefetching converted files."""
+
+    def setUp(self):
+        """Copy the test content to a temporary directory."""
+        self.temp_path = tempfile.mkdtemp()
+        self.content_path = os.path.join(self.temp_path, "content")
+        shutil.copytree(TEST_CONTENT_PATH, self.content_path)
+        self.settings = get_settings(
+            PATH=self.content_path,
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_PREFETCH=True,
+            PANDOC_PREFETCH_WORKERS=2,
+            CALCULATE_READING_TIME=True,
+        )
+
+    def tearDown(self):
+        """Stop prefetching and remove the temporary directory."""
+        pandoc_reader.stop_prefetch(types.SimpleNamespace(settings=self.settings))
+        shutil.rmtree(self.temp_path)
+
+    def test_prefetched_files_match_read_files(self):
+        """Check if prefetched files are the same as those read directly."""
+        source_path = os.path.join(self.content_path, "valid_content_with_toc.md")
+        expected_output, expected_metadata = PandocReader(
+            get_settings(**{**self.settings, "PANDOC_PREFETCH": False})
+        ).read(source_path)
+
+        start_prefetch(self.settings)
+        conversion = prefetch.take_prefetched(self.settings, source_path)
+        output, metadata = PandocReader(self.settings)._finalize_metadata(
+            conversion.entry
+        )
+
+        self.assertEqual(expected_output, output)
+        self.assertEqual(
+            {key: str(value) for key, value in expected_metadata.items()},
+            {key: str(value) for key, value in metadata.items()},
+        )
+
+    def test_errors_are_raised_on_read(self):
+        """Check if errors converting a file are raised when it is read."""
+        start_prefetch(self.settings)
+
+        with self.assertRaises(Exception) as context_manager:
+            PandocReader(self.settings).read(
+                os.path.join(self.content_path, "no_metadata.md")
+            )
+
+        message = str(context_manager.exception)
+        self.assertEqual("Could not find metadata header '---'.", message)
+
+    def test_changed_file_is_converted_again(self):
+        """Check if a file changed after it was prefetched is read again."""
+        source_path = os.path.join(self.content_path, "valid_content.md")
+        start_prefetch(self.settings)
+
+        with open(source_path, "a") as file_handle:
+            file_handle.write("\nA new paragraph.\n")
+        output, _ = PandocReader(self.settings).read(source_path)
+
+        self.assertTrue(output.endswith("<p>A new paragraph.</p>"))
+
+    def test_files_in_content_cache_are_not_converted(self):
+        """Check if files Pelican takes from its content cache are skipped."""
+        settings = get_settings(
+            **{
+                **self.settings,
+                "CACHE_CONTENT": True,
+                "LOAD_CONTENT_CACHE": True,
+                "CACHE_PATH": os.path.join(self.temp_path, "cache"),
+            }
+        )
+        cached_path = os.path.join(self.content_path, "valid_content.md")
+        uncached_path = os.path.join(self.content_path, "mathjax_content.md")
+
+        # Have Pelican cache a file as it does in a build
+        signals.readers_init.connect(pandoc_reader.add_reader)
+        signals.readers_init.connect(pandoc_reader.fingerprint_cached_content)
+        try:
+            readers = Readers(settings, "ArticlesGenerator-Readers")
+            readers.read_file(self.content_path, cached_path)
+            readers.save_cache()
+        finally:
+            signals.readers_init.disconnect(pandoc_reader.add_reader)
+            signals.readers_init.disconnect(pandoc_reader.fingerprint_cached_content)
+
+        start_prefetch(settings)
+
+        self.assertIsNone(prefetch.take_prefetched(settings, cached_path))
+        self.assertIsNotNone(prefetch.take_prefetched(settings, uncached_path))
+
+        # Cache entries for other settings are not used
+        changed_settings = {**settings, "PANDOC_ARGS": [*PANDOC_ARGS, "--toc"]}
+        start_prefetch(changed_settings)
+        try:
+            self.assertIsNotNone(
+                prefetch.take_prefetched(changed_settings, cached_path)
+            )
+        finally:
+            pandoc_reader.stop_prefetch(
+                types.SimpleNamespace(settings=changed_settings)
+            )
+            pandoc_reader.stop_prefetch(types.SimpleNamespace(settings=settings))
+
+    def test_ignored_and_excluded_files(self):
+        """Check if the same files are found as Pelican's generators find."""
+        os.mkdir(os.path.join(self.content_path, "drafts"))
+        os.mkdir(os.path.join(self.content_path, ".hidden"))
+        for directory_name in ("drafts", ".hidden"):
+            with open(
+                os.path.join(self.content_path, directory_name, "post.md"), "w"
+            ) as file_handle:
+                file_handle.write("---\ntitle: Post\n---\n")
+        settings = {
+            **self.settings,
+            "ARTICLE_EXCLUDES": ["drafts"],
+            "IGNORE_FILES": [".*"],
+        }
+
+        source_files = prefetch.find_source_files(
+            settings, PandocReader.file_extensions
+        )
+
+        self.assertIn(os.path.join(self.content_path, "valid_content.md"), source_files)
+        self.assertNotIn(
+            os.path.join(self.content_path, "valid_content_with_citation.bib"),
+            source_files,
+        )
+        self.assertNotIn(
+            os.path.join(self.content_path, "drafts", "post.md"), source_files
+        )
+        self.assertNotIn(
+            os.path.join(self.content_path, ".hidden", "post.md"), source_files
+        )
+
+
+class TestAvailableCpus(unittest.TestCase):
+    """Test cases for sizing the prefetch thread pool."""
+
+    def test_cgroup_quota_limits_cpus(self):
+        """Check if a cgroup CPU quota caps the number of workers."""
+        with mock.patch.object(prefetch, "_cgroup_cpu_quota", return_value=0.5):
+            self.assertEqual(1, prefetch.available_cpus())
+
+    def test_no_cgroup_quota(self):
+        """Check if all CPUs are used without a cgroup CPU quota."""
+        with mock.patch.object(prefetch, "_cgroup_cpu_quota", return_value=None):
+            self.assertGreaterEqual(prefetch.available_cpus(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
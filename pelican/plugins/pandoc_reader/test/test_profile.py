@@ -0,0 +1,154 @@
+"""Test compiling the settings into a conversion profile."""
+
+import os
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+
+class TestConversionProfile(unittest.TestCase):
+    """Test cases for the profile the files read are converted with."""
+
+    def test_compiled_when_reader_is_set_up(self):
+        """Check if the options requested are found before any file is read."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=[*PANDOC_ARGS, "--toc"],
+            CALCULATE_READING_TIME=True,
+        )
+
+        profile = PandocReader(settings)._get_profile(
+            os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+        )
+
+        self.assertTrue(profile.table_of_contents)
+        self.assertFalse(profile.citations)
+        self.assertTrue(profile.reading_time)
+        self.assertEqual(
+            ("--from", "markdown+smart", "--to", "html5"),
+            profile.pandoc_cmd[4:8],
+        )
+        self.assertTrue(profile.pandoc_cmd[1].endswith("wordcount.lua"))
+
+    def test_settings_not_validated_for_each_file(self):
+        """Check if reading files uses the profile without validating again."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=[*PANDOC_ARGS, "--toc"]
+        )
+        pandoc_reader = PandocReader(settings)
+
+        with mock.patch.object(pandoc_reader, "_validate_fields") as validate:
+            for file_name in ("valid_content.md", "valid_content_with_toc.md"):
+                _, metadata = pandoc_reader.read(
+                    os.path.join(TEST_CONTENT_PATH, file_name)
+                )
+                self.assertIn("toc", metadata)
+
+        validate.assert_not_called()
+
+    def test_invalid_settings_raised_for_each_file(self):
+        """Check if settings found invalid are reported for every file read."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=["--standalone"]
+        )
+        pandoc_reader = PandocReader(settings)
+
+        for file_name in ("valid_content.md", "valid_content_with_toc.md"):
+            with self.assertRaises(ValueError) as context_manager:
+                pandoc_reader.read(os.path.join(TEST_CONTENT_PATH, file_name))
+
+            message = str(context_manager.exception)
+            self.assertEqual("Argument --standalone is not supported.", message)
+
+
+class TestProfilesForPaths(unittest.TestCase):
+    """Test cases for converting files with the profiles matching their paths."""
+
+    def read(self, profiles, file_name):
+        """Read a file of the test content with the given PANDOC_PROFILES."""
+        settings = get_settings(
+            PATH=TEST_CONTENT_PATH,
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_PROFILES=profiles,
+        )
+        return PandocReader(settings).read(os.path.join(TEST_CONTENT_PATH, file_name))
+
+    def test_profile_of_matching_files(self):
+        """Check if files are converted with the first profile matching them."""
+        profiles = {
+            "*_with_toc.md": {"PANDOC_ARGS": [*PANDOC_ARGS, "--toc"]},
+            "*.md": {"PANDOC_EXTENSIONS": ["-smart"]},
+        }
+
+        _, metadata = self.read(profiles, "valid_content_with_toc.md")
+        self.assertIn("toc", metadata)
+
+        _, metadata = self.read(profiles, "valid_content.md")
+        self.assertNotIn("toc", metadata)
+
+    def test_settings_not_in_profile_taken_from_settings_file(self):
+        """Check if a profile keeps the settings it does not give."""
+        settings = get_settings(
+            PATH=TEST_CONTENT_PATH,
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_PROFILES={
+                "*_with_toc.md": {"PANDOC_ARGS": ["--toc"]},
+                "valid_*.md": {"PANDOC_ARGS": ["--toc"]},
+            },
+        )
+        pandoc_reader = PandocReader(settings)
+
+        profile = pandoc_reader._get_profile(
+            os.path.join(TEST_CONTENT_PATH, "valid_content_with_toc.md")
+        )
+
+        self.assertIn("markdown+smart", profile.pandoc_cmd)
+        self.assertNotIn("--mathjax", profile.pandoc_cmd)
+        # Profiles with the same settings are compiled once
+        self.assertIs(
+            profile,
+            pandoc_reader._get_profile(
+                os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+            ),
+        )
+
+    def test_invalid_profile_raised_for_matching_files(self):
+        """Check if an invalid profile is only reported for the files it matches."""
+        profiles = {"*_with_toc.md": {"PANDOC_ARGS": ["--standalone"]}}
+
+        self.read(profiles, "valid_content.md")
+        with self.assertRaises(ValueError) as context_manager:
+            self.read(profiles, "valid_content_with_toc.md")
+
+        message = str(context_manager.exception)
+        self.assertEqual("Argument --standalone is not supported.", message)
+
+    def test_unknown_profile_setting(self):
+        """Check if a profile giving settings other than Pandoc's is reported."""
+        profiles = {"*.md": {"PANDOC_ARGS": [], "READING_SPEED": 100}}
+
+        with self.assertRaises(ValueError) as context_manager:
+            self.read(profiles, "valid_content.md")
+
+        message = str(context_manager.exception)
+        self.assertEqual(
+            "Settings READING_SPEED cannot be given in a profile.", message
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
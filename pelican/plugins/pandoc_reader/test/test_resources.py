@@ -0,0 +1,36 @@
+"""Test measuring the resources used by processes."""
+
+import subprocess
+import sys
+import unittest
+
+from pelican.plugins.pandoc_reader.resources import MeasuredPopen, ResourceUsage
+
+
+class TestMeasuredPopen(unittest.TestCase):
+    """Test cases for recording the resource usage of processes."""
+
+    @unittest.skipIf(sys.platform == "win32", "os.wait4() is not available")
+    def test_usage_recorded_when_waited_for(self):
+        """Check if the usage of a process is known once it has exited."""
+        with MeasuredPopen(
+            [sys.executable, "-c", "bytearray(32 * 2**20)"],
+            stdout=subprocess.DEVNULL,
+        ) as process:
+            self.assertIsNone(process.usage)
+            process.wait()
+
+        self.assertEqual(0, process.returncode)
+        self.assertEqual(1, process.usage.processes)
+        self.assertGreater(process.usage.max_rss, 32 * 2**20)
+        self.assertGreater(process.usage.user_time + process.usage.system_time, 0)
+
+    def test_usages_added(self):
+        """Check if times and faults are summed and the peak memory kept."""
+        usage = ResourceUsage(1.0, 0.5, 100, 2, 1) + ResourceUsage(2.0, 0.25, 50, 3, 1)
+
+        self.assertEqual(ResourceUsage(3.0, 0.75, 100, 5, 2), usage)
+
+
+if __name__ == "__main__":
+    unittest.main()
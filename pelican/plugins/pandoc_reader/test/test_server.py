@@ -0,0 +1,272 @@
+"""Test converting content through a pandoc server."""
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, pandoc_reader, server
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+# Stands in for pandoc server, answering conversions with the upper-cased
+# text followed by the client port to show which connection was used. The
+# first request for the version is dropped without an answer, as a server
+# still starting up may do.
+FAKE_SERVER = f"""\
+#!{sys.executable}
+import http.server
+import json
+import sys
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    version_requested = False
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if not Handler.version_requested:
+            Handler.version_requested = True
+            self.close_connection = True
+            return
+        self.reply(200, b"3.0")
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        text = json.loads(self.rfile.read(length))["text"]
+        if text == "fail":
+            self.reply(500, b"Conversion failed")
+        else:
+            output = f"{{text.upper()}} {{self.client_address[1]}}"
+            self.reply(200, json.dumps({{"output": output}}).encode())
+
+    def log_message(self, *args):
+        pass
+
+port = int(sys.argv[2].partition("=")[2])
+http.server.HTTPServer(("127.0.0.1", port), Handler).serve_forever()
+"""
+
+
+class TestServerParams(unittest.TestCase):
+    """Test cases for translating Pandoc options into server parameters."""
+
+    def test_arguments_are_translated(self):
+        """Check if command line options become server parameters."""
+        pandoc_cmd = pandoc_reader.PandocReader._construct_pandoc_command(
+            "pandoc", [], [*PANDOC_ARGS, "--toc", "-V", "lang=en"], "+smart"
+        )
+
+        params = server.get_server_params(pandoc_cmd)
+
+        with open(
+            os.path.join(
+                pandoc_reader.TEMPLATES_PATH, pandoc_reader.PANDOC_READER_HTML_TEMPLATE
+            )
+        ) as file_handle:
+            template = file_handle.read()
+        self.assertEqual(
+            {
+                "standalone": True,
+                "template": template,
+                "from": "markdown+smart",
+                "to": "html5",
+                "html-math-method": {"method": "mathjax"},
+                "wrap": "none",
+                "table-of-contents": True,
+                "variables": {"lang": "en"},
+            },
+            params,
+        )
+
+    def test_defaults_are_translated(self):
+        """Check if the contents of defaults files become server parameters."""
+        params = server.get_server_params(
+            ["pandoc", "--defaults=my-defaults.yaml"],
+            {
+                "reader": "markdown+smart",
+                "writer": "html5",
+                "table-of-contents": True,
+                "html-math-method": {"method": "mathjax", "url": "mathjax.js"},
+            },
+        )
+
+        self.assertEqual(
+            {
+                "from": "markdown+smart",
+                "to": "html5",
+                "table-of-contents": True,
+                "html-math-method": {"method": "mathjax", "url": "mathjax.js"},
+            },
+            params,
+        )
+
+    def test_unsupported_options(self):
+        """Check if options the server does not support are rejected."""
+        for arguments in (
+            ["--citeproc"],
+            ["--lua-filter=my-filter.lua"],
+            ["--bibliography=my-bibliography.bib"],
+            ["--defaults=my-defaults.yaml"],
+        ):
+            with self.subTest(arguments=arguments):
+                self.assertIsNone(
+                    server.get_server_params(["pandoc", "--from=markdown", *arguments])
+                )
+
+
+class TestPandocServer(unittest.TestCase):
+    """Test cases for running and talking to a pandoc server."""
+
+    def setUp(self):
+        """Create an executable that runs a fake pandoc server."""
+        self.temp_path = tempfile.mkdtemp()
+        self.pandoc_executable = os.path.join(self.temp_path, "pandoc")
+        with open(self.pandoc_executable, "w") as file_handle:
+            file_handle.write(FAKE_SERVER)
+        os.chmod(self.pandoc_executable, stat.S_IRWXU)
+
+    def tearDown(self):
+        """Remove the fake pandoc server."""
+        server._SERVERS.pop(self.pandoc_executable, None)
+        shutil.rmtree(self.temp_path)
+
+    def test_connection_is_reused(self):
+        """Check if conversions are sent over the same connection."""
+        pandoc_server = server.PandocServer(self.pandoc_executable)
+        try:
+            first_output = pandoc_server.convert({"text": "one"})
+            second_output = pandoc_server.convert({"text": "two"})
+        finally:
+            pandoc_server.stop()
+
+        first_text, first_port = first_output.split()
+        second_text, second_port = second_output.split()
+        self.assertEqual(("ONE", "TWO"), (first_text, second_text))
+        self.assertEqual(first_port, second_port)
+
+    def test_dropped_connection_while_starting(self):
+        """Check if the server is asked again when it drops a connection."""
+        pandoc_server = server.PandocServer(self.pandoc_executable)
+        try:
+            output = pandoc_server.convert({"text": "one"})
+        finally:
+            pandoc_server.stop()
+
+        self.assertEqual("ONE", output.split()[0])
+
+    def test_server_is_shared(self):
+        """Check if a single server is started for each executable."""
+        first_server = server.get_server(self.pandoc_executable)
+        try:
+            self.assertIs(first_server, server.get_server(self.pandoc_executable))
+        finally:
+            first_server.stop()
+
+    def test_failed_conversion(self):
+        """Check if failed conversions are left to the caller."""
+        try:
+            self.assertIsNone(
+                server.convert_with_server(
+                    self.pandoc_executable,
+                    ["pandoc", "--from=markdown", "--to=html5"],
+                    "fail",
+                )
+            )
+        finally:
+            server.get_server(self.pandoc_executable).stop()
+
+
+class TestServerBackend(unittest.TestCase):
+    """Test cases for selecting the server backend in the settings."""
+
+    def test_same_output_as_subprocess(self):
+        """Check if a real pandoc server converts files as Pandoc run for each."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=[*PANDOC_ARGS, "--toc"]
+        )
+        pandoc_executable, pandoc_info = PandocReader(settings)._get_pandoc()
+        self.addCleanup(server._SERVERS.pop, pandoc_executable, None)
+        pandoc_server = pandoc_info.server and server.get_server(pandoc_executable)
+        if not pandoc_server:
+            self.skipTest("pandoc server is not available")
+        self.addCleanup(pandoc_server.stop)
+
+        for file_name in ("valid_content_with_toc.md", "mathjax_content.md"):
+            with self.subTest(file_name=file_name):
+                source_path = os.path.join(TEST_CONTENT_PATH, file_name)
+                expected_output, expected_metadata = PandocReader(settings).read(
+                    source_path
+                )
+
+                with mock.patch.object(
+                    PandocReader, "_run_pandoc", side_effect=AssertionError
+                ):
+                    output, metadata = PandocReader(
+                        {**settings, "PANDOC_BACKEND": "server"}
+                    ).read(source_path)
+
+                self.assertEqual(expected_output, output)
+                self.assertEqual(
+                    {key: str(value) for key, value in expected_metadata.items()},
+                    {key: str(value) for key, value in metadata.items()},
+                )
+
+    def test_falls_back_to_subprocess(self):
+        """Check if Pandoc is run when the server cannot convert a file."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_BACKEND="server",
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+        expected_output, _ = PandocReader(
+            get_settings(PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=PANDOC_ARGS)
+        ).read(source_path)
+
+        with mock.patch.object(
+            pandoc_reader, "convert_with_server", return_value=None
+        ) as convert_with_server:
+            output, _ = PandocReader(settings).read(source_path)
+
+        self.assertEqual(expected_output, output)
+        self.assertEqual(
+            PandocReader(settings)._get_pandoc()[1].server,
+            convert_with_server.called,
+        )
+
+    def test_invalid_backend(self):
+        """Check if an unknown backend raises an exception."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_BACKEND="carrier-pigeon",
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+
+        with self.assertRaises(ValueError) as context_manager:
+            PandocReader(settings).read(source_path)
+
+        message = str(context_manager.exception)
+        self.assertEqual("Backend must be either subprocess, server or lua.", message)
+
+
+if __name__ == "__main__":
+    unittest.main()
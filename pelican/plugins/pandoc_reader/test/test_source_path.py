@@ -0,0 +1,153 @@
+"""Test passing the path of source files to Pandoc."""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none", "--toc"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+
+class TestPassSourcePath(unittest.TestCase):
+    """Test cases for letting Pandoc read source files itself."""
+
+    def setUp(self):
+        """Create a temporary directory for sources and the cache."""
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_path)
+
+    def get_settings(self, **kwargs):
+        """Return settings passing source paths to Pandoc."""
+        return get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_PASS_SOURCE_PATH=True,
+            CALCULATE_READING_TIME=True,
+            **kwargs,
+        )
+
+    def test_same_output_as_content(self):
+        """Check if files Pandoc reads give the same output as their content."""
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_toc.md")
+        expected_output, expected_metadata = PandocReader(
+            get_settings(
+                PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+                PANDOC_ARGS=PANDOC_ARGS,
+                CALCULATE_READING_TIME=True,
+            )
+        ).read(source_path)
+
+        with mock.patch.object(
+            PandocReader, "_read_content", side_effect=AssertionError
+        ):
+            output, metadata = PandocReader(self.get_settings()).read(source_path)
+
+        self.assertEqual(expected_output, output)
+        self.assertEqual(
+            {key: str(value) for key, value in expected_metadata.items()},
+            {key: str(value) for key, value in metadata.items()},
+        )
+
+    def test_byte_order_mark_and_line_endings(self):
+        """Check if byte order marks and CRLF line endings are read as usual."""
+        source_path = os.path.join(self.temp_path, "windows.md")
+        with open(source_path, "wb") as file_handle:
+            file_handle.write(
+                "\ufeff---\r\ntitle: Café\r\n---\r\n\r\n"
+                "# Heading\r\n\r\nText\r\n".encode()
+            )
+
+        expected = PandocReader(
+            get_settings(PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=PANDOC_ARGS)
+        ).read(source_path)
+        output, metadata = PandocReader(self.get_settings()).read(source_path)
+
+        self.assertEqual(expected[0], output)
+        self.assertEqual("Café", str(metadata["title"]))
+
+    def test_missing_metadata_block(self):
+        """Check if a missing metadata block is reported before running Pandoc."""
+        source_path = os.path.join(TEST_CONTENT_PATH, "no_metadata.md")
+
+        with (
+            mock.patch.object(PandocReader, "_run_pandoc", side_effect=AssertionError),
+            self.assertRaises(Exception) as context_manager,
+        ):
+            PandocReader(self.get_settings()).read(source_path)
+
+        message = str(context_manager.exception)
+        self.assertEqual("Could not find metadata header '---'.", message)
+
+    def test_cache_keyed_on_file(self):
+        """Check if cached files are converted again once they change."""
+        source_path = os.path.join(self.temp_path, "article.md")
+        settings = self.get_settings(
+            PANDOC_CACHE=True, PANDOC_CACHE_PATH=os.path.join(self.temp_path, "cache")
+        )
+        for title in ("First", "Second"):
+            with open(source_path, "w", encoding="utf-8") as file_handle:
+                file_handle.write(f"---\ntitle: {title}\n---\n\n{title} text\n")
+
+            _, metadata = PandocReader(settings).read(source_path)
+
+            self.assertEqual(title, str(metadata["title"]))
+
+    def test_other_backends_read_content(self):
+        """Check if backends that need the content are still given it."""
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+        settings = self.get_settings(PANDOC_BACKEND="server")
+
+        with mock.patch.object(
+            PandocReader, "_read_content", wraps=PandocReader._read_content
+        ) as read_content:
+            PandocReader(settings).read(source_path)
+
+        read_content.assert_called_once_with(source_path)
+
+
+class TestRunPandoc(unittest.TestCase):
+    """Test cases for running Pandoc and decoding its output."""
+
+    def test_failed_process(self):
+        """Check if a failing process raises CalledProcessError with text."""
+        with self.assertRaises(subprocess.CalledProcessError) as context_manager:
+            PandocReader._run_pandoc(
+                [sys.executable, "-c", "import sys; sys.exit('Failed')"], ""
+            )
+
+        self.assertEqual(1, context_manager.exception.returncode)
+        self.assertEqual("Failed\n", context_manager.exception.stderr)
+
+    def test_output_newlines_translated(self):
+        """Check if output is decoded with its newlines translated."""
+        output = PandocReader._run_pandoc(
+            [
+                sys.executable,
+                "-c",
+                "import sys; sys.stdout.buffer.write('é\\r\\nà\\r'.encode())",
+            ],
+            None,
+        )
+
+        self.assertEqual("é\nà\n", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,8 +2,10 @@
 
 import os
 import unittest
+from unittest import mock
 
-from pelican.plugins.pandoc_reader import PandocReader
+from pelican.plugins.pandoc_reader import PandocReader, pandoc_reader as reader_module
+from pelican.plugins.pandoc_reader.resources import MeasuredPopen
 from pelican.tests.support import get_settings
 
 DIR_PATH = os.path.dirname(__file__)
@@ -51,6 +53,26 @@ class TestReadingTimeAndSummary(unittest.TestCase):
 
         self.assertEqual("2 minutes", str(metadata["reading_time"]))
 
+    def test_reading_time_in_single_pandoc_run(self):
+        """Check if reading time is calculated without running Pandoc again."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            CALCULATE_READING_TIME=CALCULATE_READING_TIME,
+        )
+
+        pandoc_reader = PandocReader(settings)
+        source_path = os.path.join(TEST_CONTENT_PATH, "reading_time_content.md")
+        pandoc_reader._get_pandoc()
+        with mock.patch.object(
+            reader_module, "MeasuredPopen", wraps=MeasuredPopen
+        ) as popen:
+            _, metadata = pandoc_reader.read(source_path)
+
+        popen.assert_called_once()
+        self.assertEqual("1 minute", str(metadata["reading_time"]))
+        self.assertNotIn("pandoc-reader-words", metadata)
+
     def test_invalid_user_defined_wpm(self):
         """Check if an exception is raised if words per minute is not a number."""
         settings = get_settings(
@@ -0,0 +1,229 @@
+"""Test timing the stages articles are read in."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, report_timings, timing
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+
+class TimingTestCase(unittest.TestCase):
+    """Base class for tests reading articles with timings and traces on."""
+
+    def setUp(self):
+        """Create a temporary directory for the reports written."""
+        self.temp_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_path)
+
+    def read(self, file_names, **kwargs):
+        """Read files with the settings given in kwargs and return the settings."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            CALCULATE_READING_TIME=True,
+            **kwargs,
+        )
+        reader = PandocReader(settings)
+        for file_name in file_names:
+            reader.read(os.path.join(TEST_CONTENT_PATH, file_name))
+        return settings
+
+
+class TestReaderTimings(TimingTestCase):
+    """Test cases for timing the reading of articles."""
+
+    def test_stages_of_each_article(self):
+        """Check if each article has the stages it went through timed."""
+        settings = self.read(
+            ["valid_content.md", "valid_content_with_toc.md"], PANDOC_TIMINGS=True
+        )
+
+        articles = timing.finish_timings(settings).articles()
+
+        self.assertEqual(
+            {
+                os.path.join(TEST_CONTENT_PATH, "valid_content.md"),
+                os.path.join(TEST_CONTENT_PATH, "valid_content_with_toc.md"),
+            },
+            set(articles),
+        )
+        for stages in articles.values():
+            self.assertEqual(
+                {
+                    "probe",
+                    "read",
+                    "front_matter",
+                    "pandoc",
+                    "extraction",
+                    "reading_time",
+                    "metadata",
+                    "transform",
+                },
+                set(stages),
+            )
+
+    def test_report_written_at_end_of_build(self):
+        """Check if the report is written to PANDOC_TIMINGS_FILE."""
+        report_path = os.path.join(self.temp_path, "timings.json")
+        settings = self.read(
+            ["valid_content.md", "valid_content_with_toc.md"],
+            PANDOC_TIMINGS_FILE=report_path,
+            PANDOC_TIMINGS_SLOWEST=1,
+        )
+
+        report_timings(mock.Mock(settings=settings))
+
+        with open(report_path, encoding="utf-8") as file_handle:
+            report = json.load(file_handle)
+        self.assertEqual(2, report["articles"])
+        self.assertEqual(2, report["stages"]["pandoc"]["count"])
+        self.assertEqual(1, len(report["slowest"]))
+        self.assertEqual(report["per_article"]["max"], report["slowest"][0]["total"])
+        self.assertIsNone(timing.finish_timings(settings))
+
+    def test_articles_over_budget(self):
+        """Check if articles taking longer than PANDOC_TIME_BUDGET are warned of."""
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+        with self.assertLogs(timing.logger, "WARNING") as logs:
+            settings = self.read(["valid_content.md"], PANDOC_TIME_BUDGET=1e-9)
+
+        self.assertEqual(1, len(logs.output))
+        self.assertIn(source_path, logs.output[0])
+        report = timing.finish_timings(settings).report()
+        self.assertEqual([source_path], report["over_budget"])
+
+    def test_not_timed_by_default(self):
+        """Check if nothing is timed unless asked for."""
+        settings = self.read(["valid_content.md"])
+
+        self.assertIsNone(timing.finish_timings(settings))
+
+
+class TestTrace(TimingTestCase):
+    """Test cases for tracing the reading of articles."""
+
+    def test_stages_nested_in_articles(self):
+        """Check if each article is traced as a span with its stages in it."""
+        trace_path = os.path.join(self.temp_path, "trace.json")
+        settings = self.read(
+            ["valid_content.md", "valid_content_with_toc.md"],
+            PANDOC_TRACE_FILE=trace_path,
+        )
+
+        report_timings(mock.Mock(settings=settings))
+
+        with open(trace_path, encoding="utf-8") as file_handle:
+            events = json.load(file_handle)["traceEvents"]
+        spans = [event for event in events if event["ph"] == "X"]
+        articles = [span for span in spans if span["cat"] == "article"]
+        self.assertEqual(
+            ["valid_content.md", "valid_content_with_toc.md"],
+            [article["name"] for article in articles],
+        )
+        for article in articles:
+            stages = [
+                span
+                for span in spans
+                if span["cat"] == "stage"
+                # Settings are validated for no article in particular
+                and span["args"].get("source_path") == article["args"]["source_path"]
+            ]
+            self.assertIn("pandoc", [stage["name"] for stage in stages])
+            for stage in stages:
+                self.assertEqual(article["tid"], stage["tid"])
+                self.assertGreaterEqual(stage["ts"], article["ts"])
+                self.assertLessEqual(
+                    stage["ts"] + stage["dur"], article["ts"] + article["dur"]
+                )
+                if stage["name"] == "pandoc":
+                    self.assertEqual(1, len(stage["args"]["pandoc_pids"]))
+        self.assertIn(
+            articles[0]["tid"],
+            [event["tid"] for event in events if event["name"] == "thread_name"],
+        )
+
+
+class TestResources(TimingTestCase):
+    """Test cases for the resources used by the Pandoc processes of articles."""
+
+    def test_usage_of_each_article(self):
+        """Check if each article has the resources of its Pandoc process."""
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+        settings = self.read(["valid_content.md"], PANDOC_TIMINGS=True)
+
+        report = timing.finish_timings(settings).report()
+
+        usage = report["slowest"][0]["resources"]
+        self.assertEqual(1, usage["processes"])
+        self.assertGreater(usage["max_rss"], 0)
+        self.assertGreater(usage["user_time"] + usage["system_time"], 0)
+        self.assertEqual(1, report["resources"]["processes"])
+        self.assertEqual(source_path, report["resources"]["largest"][0]["source_path"])
+
+    def test_summary_logged_at_end_of_build(self):
+        """Check if PANDOC_RESOURCE_SUMMARY logs the resources used by Pandoc."""
+        settings = self.read(
+            ["valid_content.md", "valid_content_with_toc.md"],
+            PANDOC_RESOURCE_SUMMARY=True,
+        )
+
+        with self.assertLogs(timing.logger, "INFO") as logs:
+            report_timings(mock.Mock(settings=settings))
+
+        self.assertIn("Pandoc ran 2 processes", logs.output[0])
+        self.assertEqual(3, len(logs.output))
+
+
+class TestTimingsReport(unittest.TestCase):
+    """Test cases for summarizing timings."""
+
+    def test_percentiles_and_slowest(self):
+        """Check if stages and articles are summarized by nearest rank."""
+        timings = timing.Timings({})
+        for number in range(1, 101):
+            timings.add(f"{number}.md", "pandoc", float(number))
+            timings.add(f"{number}.md", "read", 1.0)
+        timings.add(None, "probe", 5.0)
+
+        report = timings.report(slowest=2)
+
+        self.assertEqual(100, report["articles"])
+        self.assertEqual(["read", "pandoc"], list(report["stages"]))
+        self.assertEqual(
+            {
+                "total": 5050.0,
+                "count": 100,
+                "mean": 50.5,
+                "p50": 50.0,
+                "p90": 90.0,
+                "p99": 99.0,
+                "max": 100.0,
+            },
+            report["stages"]["pandoc"],
+        )
+        self.assertEqual(
+            ["100.md", "99.md"],
+            [article["source_path"] for article in report["slowest"]],
+        )
+        self.assertEqual(101.0, report["slowest"][0]["total"])
+
+
+if __name__ == "__main__":
+    unittest.main()
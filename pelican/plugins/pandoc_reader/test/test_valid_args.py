@@ -117,6 +117,54 @@ class TestValidCasesWithArguments(unittest.TestCase):
         self.assertEqual("2020-10-16 00:00:00", str(metadata["date"]))
         self.assertEqual(HTML_TOC, str(metadata["toc"]))
 
+    def test_markup_is_kept_as_pandoc_writes_it(self):
+        """Check if the body and table of contents are sliced out unchanged."""
+        html_output = (
+            '{"title":"Title"}\n'
+            '<nav class="toc" role="doc-toc">\n<ul>\n<li><a href="#a">A</a></li>\n'
+            "</ul>\n</nav>\n"
+            "<!-- pandoc-reader:body -->\n"
+            '<h1 id="a">A</h1>\n<p>One<br />\ntwo <img src="b.png" alt="B" /></p>\n'
+        )
+
+        output, toc, metadata = PandocReader._extract_contents(html_output, True)
+
+        self.assertEqual(
+            '<h1 id="a">A</h1>\n<p>One<br />\ntwo <img src="b.png" alt="B" /></p>',
+            output,
+        )
+        self.assertEqual(
+            '<nav class="toc" role="doc-toc">\n<ul>\n<li><a href="#a">A</a></li>\n'
+            "</ul>\n</nav>",
+            toc,
+        )
+        self.assertEqual({"title": "Title"}, metadata)
+
+    def test_toc_without_sentinel_warns(self):
+        """Check if a warning is logged when a template has no body sentinel."""
+        html_output = (
+            '{"title":"Title"}\n'
+            '<nav id="TOC" role="doc-toc">\n<ul>\n<li><a href="#a">A</a></li>\n'
+            "</ul>\n</nav>\n"
+            '<h1 id="a">A</h1>\n'
+        )
+
+        with self.assertLogs("pelican.plugins.pandoc_reader", "WARNING") as logs:
+            output, toc, _ = PandocReader._extract_contents(html_output, True)
+
+        self.assertEqual(html_output.partition("\n")[2].strip(), output)
+        self.assertEqual("", toc)
+        self.assertIn("No table of contents could be extracted", logs.output[0])
+
+    def test_no_toc_without_sentinel_is_quiet(self):
+        """Check if nothing is logged for templates without ToC or sentinel."""
+        with self.assertNoLogs("pelican.plugins.pandoc_reader", "WARNING"):
+            output, _, _ = PandocReader._extract_contents(
+                '{"title":"Title"}\n<p>Text</p>\n', False
+            )
+
+        self.assertEqual("<p>Text</p>", output)
+
 
 if __name__ == "__main__":
     unittest.main()
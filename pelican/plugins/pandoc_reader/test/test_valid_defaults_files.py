@@ -2,8 +2,9 @@
 
 import os
 import unittest
+from unittest import mock
 
-from pelican.plugins.pandoc_reader import PandocReader
+from pelican.plugins.pandoc_reader import PandocReader, defaults
 from pelican.plugins.pandoc_reader.test.html.expected_html import (
     HTML_MATHJAX,
     HTML_TOC,
@@ -75,6 +76,86 @@ class TestValidCasesWithDefaultsFiles(unittest.TestCase):
         self.assertEqual("2020-10-16 00:00:00", str(metadata["date"]))
         self.assertEqual(HTML_TOC, str(metadata["toc"]))
 
+    def test_toc_with_nested_valid_defaults(self):
+        """Check if defaults included with the defaults key are taken into account."""
+        pandoc_defaults_files = [
+            os.path.join(
+                TEST_DEFAULTS_FILES_PATH, "valid_defaults_with_nested_toc.yaml"
+            )
+        ]
+
+        settings = get_settings(PANDOC_DEFAULTS_FILES=pandoc_defaults_files)
+        pandoc_reader = PandocReader(settings)
+
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_toc.md")
+        output, metadata = pandoc_reader.read(source_path)
+        self.maxDiff = None  # pylint: disable=invalid-name
+
+        self.assertEqual(HTML_WITH_HEADINGS, output)
+        self.assertEqual(HTML_TOC, str(metadata["toc"]))
+
+        resolved = defaults.resolve_defaults(pandoc_defaults_files)
+        self.assertEqual(
+            (
+                os.path.join(
+                    TEST_DEFAULTS_FILES_PATH, "valid_defaults_with_nested_toc.yaml"
+                ),
+                os.path.join(TEST_DEFAULTS_FILES_PATH, "valid_defaults.yaml"),
+            ),
+            resolved.files,
+        )
+
+    def test_citeproc_with_nested_valid_defaults(self):
+        """Check if filters of included defaults files are added to, as in Pandoc."""
+        pandoc_defaults_files = [
+            os.path.join(
+                TEST_DEFAULTS_FILES_PATH, "valid_defaults_with_nested_citeproc.yaml"
+            )
+        ]
+
+        resolved = defaults.resolve_defaults(pandoc_defaults_files)
+        self.assertEqual(
+            ["citeproc", os.path.join(TEST_DEFAULTS_FILES_PATH, "noop_filter.lua")],
+            resolved.defaults["filters"],
+        )
+
+        settings = get_settings(PANDOC_DEFAULTS_FILES=pandoc_defaults_files)
+        pandoc_reader = PandocReader(settings)
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_citation.md")
+        pandoc_cmd, profile, _ = pandoc_reader._prepare_command(
+            source_path, pandoc_reader._get_pandoc()[1], False
+        )
+
+        self.assertTrue(profile.citations)
+        self.assertIn(
+            os.path.join(TEST_DEFAULTS_FILES_PATH, "noop_filter.lua"),
+            profile.dependencies,
+        )
+        self.assertIn(
+            "--bibliography="
+            + os.path.join(TEST_CONTENT_PATH, "valid_content_with_citation.bib"),
+            pandoc_cmd,
+        )
+
+    def test_defaults_files_are_parsed_once(self):
+        """Check if defaults files are not parsed again for every file."""
+        pandoc_defaults_files = [
+            os.path.join(TEST_DEFAULTS_FILES_PATH, "valid_defaults_file_1.yaml"),
+            os.path.join(TEST_DEFAULTS_FILES_PATH, "valid_defaults_file_2.yaml"),
+        ]
+
+        settings = get_settings(PANDOC_DEFAULTS_FILES=pandoc_defaults_files)
+        pandoc_reader = PandocReader(settings)
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+        pandoc_reader.read(source_path)
+
+        with mock.patch.object(
+            defaults, "_load_defaults_file", side_effect=AssertionError
+        ):
+            output, _ = pandoc_reader.read(source_path)
+
+        self.assertEqual(HTML_VALID_TEXT, output)
+
 
 if __name__ == "__main__":
     unittest.main()
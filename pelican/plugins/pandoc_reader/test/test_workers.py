@@ -0,0 +1,232 @@
+"""Test converting content in long-running Pandoc workers."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from pelican.plugins.pandoc_reader import PandocReader, pandoc_reader, workers
+from pelican.plugins.pandoc_reader.batch import BatchPlan
+from pelican.plugins.pandoc_reader.test.test_batch import batch_supported
+from pelican.tests.support import get_settings
+
+DIR_PATH = os.path.dirname(__file__)
+TEST_CONTENT_PATH = os.path.abspath(os.path.join(DIR_PATH, "markdown"))
+
+# These settings will be set in pelicanconf.py by plugin users.
+# Appending --wrap=None so that rendered HTML5 does not have new lines (\n)
+# which causes tests to fail.
+# See https://pandoc.org/MANUAL.html#general-writer-options
+PANDOC_ARGS = ["--mathjax", "--wrap=none", "--toc"]
+PANDOC_EXTENSIONS = ["+smart"]
+
+PANDOC_CMD = ["pandoc", "--from=markdown", "--to=html5"]
+
+# Prints while filtering, which must not end up in the responses
+PRINTING_FILTER = """\
+function Str(element)
+  print("filtering " .. element.text)
+  io.write("filtered " .. element.text .. "\\n")
+  return pandoc.Str(element.text:upper())
+end
+"""
+
+
+@unittest.skipUnless(batch_supported(), "Pandoc 3.2.1 or higher needed")
+class TestPandocWorker(unittest.TestCase):
+    """Test cases for running and talking to a Pandoc worker."""
+
+    def tearDown(self):
+        """Stop the workers left waiting by a test."""
+        workers.stop_workers()
+
+    def test_documents_are_converted_in_one_process(self):
+        """Check if a worker converts several documents."""
+        worker = workers.PandocWorker(PANDOC_CMD, BatchPlan("markdown"))
+        try:
+            first_output = worker.convert("*one*")
+            second_output = worker.convert("**two**")
+        finally:
+            worker.stop()
+
+        self.assertEqual("<p><em>one</em></p>", first_output)
+        self.assertEqual("<p><strong>two</strong></p>", second_output)
+        self.assertEqual(2, worker.documents)
+
+    def test_printing_filters(self):
+        """Check if output printed by filters does not corrupt responses."""
+        temp_path = tempfile.mkdtemp()
+        filter_path = os.path.join(temp_path, "printing.lua")
+        with open(filter_path, "w") as file_handle:
+            file_handle.write(PRINTING_FILTER)
+
+        worker = workers.PandocWorker(
+            [*PANDOC_CMD, f"--lua-filter={filter_path}"],
+            BatchPlan("markdown", (("lua", filter_path),)),
+        )
+        try:
+            output = worker.convert("one")
+        finally:
+            worker.stop()
+            shutil.rmtree(temp_path)
+
+        self.assertEqual("<p>ONE</p>", output)
+
+    def test_failed_conversion(self):
+        """Check if a worker reports a failed conversion and keeps running."""
+        worker = workers.PandocWorker(PANDOC_CMD, BatchPlan("not-a-format"))
+        try:
+            with self.assertRaises(workers.PandocWorkerError):
+                worker.convert("one")
+            self.assertTrue(worker.is_running())
+        finally:
+            worker.stop()
+
+    def test_worker_is_reused(self):
+        """Check if a worker is kept for the next document with the same options."""
+        workers.convert_with_worker(PANDOC_CMD, BatchPlan("markdown"), "one")
+        (worker,) = workers._IDLE_WORKERS
+
+        workers.convert_with_worker(PANDOC_CMD, BatchPlan("markdown"), "two")
+
+        self.assertEqual([worker], workers._IDLE_WORKERS)
+        self.assertEqual(2, worker.documents)
+
+    def test_worker_is_recycled_after_max_documents(self):
+        """Check if a worker is stopped once it has converted enough documents."""
+        for content in ("one", "two"):
+            workers.convert_with_worker(
+                PANDOC_CMD, BatchPlan("markdown"), content, max_documents=2
+            )
+
+        self.assertEqual([], workers._IDLE_WORKERS)
+
+    def test_worker_is_recycled_over_max_memory(self):
+        """Check if a worker is stopped once it uses too much memory."""
+        with mock.patch.object(workers.PandocWorker, "memory_usage", return_value=2048):
+            workers.convert_with_worker(
+                PANDOC_CMD, BatchPlan("markdown"), "one", max_memory=1024
+            )
+
+        self.assertEqual([], workers._IDLE_WORKERS)
+
+
+class TestDocumentOptions(unittest.TestCase):
+    """Test cases for the options sent to workers with each document."""
+
+    def test_document_options_are_split_out(self):
+        """Check if options differing between documents are taken out of commands."""
+        worker_cmd, document_options = workers.split_document_options(
+            [
+                *PANDOC_CMD,
+                "--citeproc",
+                "--bibliography=first.bib",
+                "--csl",
+                "style.csl",
+                "--bibliography=second.bib",
+            ]
+        )
+
+        self.assertEqual((*PANDOC_CMD, "--citeproc"), worker_cmd)
+        self.assertEqual(
+            (
+                ("bibliography", "first.bib"),
+                ("csl", "style.csl"),
+                ("bibliography", "second.bib"),
+            ),
+            document_options,
+        )
+
+
+@unittest.skipUnless(batch_supported(), "Pandoc 3.2.1 or higher needed")
+class TestLuaBackend(unittest.TestCase):
+    """Test cases for selecting the lua backend in the settings."""
+
+    def tearDown(self):
+        """Stop the workers left waiting by a test."""
+        workers.stop_workers()
+
+    def test_output_matches_subprocess(self):
+        """Check if articles converted by workers match those run through Pandoc."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_BACKEND="lua",
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content_with_toc.md")
+        expected_output, expected_metadata = PandocReader(
+            get_settings(PANDOC_EXTENSIONS=PANDOC_EXTENSIONS, PANDOC_ARGS=PANDOC_ARGS)
+        ).read(source_path)
+
+        with mock.patch.object(PandocReader, "_run_pandoc", side_effect=AssertionError):
+            output, metadata = PandocReader(settings).read(source_path)
+
+        self.assertEqual(expected_output, output)
+        self.assertEqual(
+            {key: str(value) for key, value in expected_metadata.items()},
+            {key: str(value) for key, value in metadata.items()},
+        )
+
+    def test_bibliographies_share_worker(self):
+        """Check if articles with their own bibliographies are sent to one worker."""
+        temp_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_path)
+        for name in ("first", "second"):
+            with open(os.path.join(temp_path, f"{name}.md"), "w") as file_handle:
+                file_handle.write(f"---\ntitle: {name}\n---\n\nCiting [@{name}].\n")
+            with open(os.path.join(temp_path, f"{name}.bib"), "w") as file_handle:
+                file_handle.write(
+                    f"@book{{{name},\n  author = {{Author, {name}}},\n"
+                    f"  title = {{The {name} book}},\n  year = {{2020}}\n}}\n"
+                )
+        settings = get_settings(
+            PATH=temp_path,
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=["--citeproc", "--wrap=none"],
+        )
+
+        with (
+            mock.patch.object(PandocReader, "_run_pandoc", side_effect=AssertionError),
+            mock.patch.object(
+                workers, "PandocWorker", wraps=workers.PandocWorker
+            ) as pandoc_worker,
+        ):
+            outputs = [
+                PandocReader({**settings, "PANDOC_BACKEND": "lua"}).read(
+                    os.path.join(temp_path, f"{name}.md")
+                )[0]
+                for name in ("first", "second")
+            ]
+
+        pandoc_worker.assert_called_once()
+        for name, output in zip(("first", "second"), outputs):
+            with self.subTest(name=name):
+                expected_output, _ = PandocReader(settings).read(
+                    os.path.join(temp_path, f"{name}.md")
+                )
+                self.assertEqual(expected_output, output)
+                self.assertIn(f"The {name.capitalize()} Book", output)
+
+    def test_falls_back_to_subprocess(self):
+        """Check if Pandoc is run when a worker cannot convert a file."""
+        settings = get_settings(
+            PANDOC_EXTENSIONS=PANDOC_EXTENSIONS,
+            PANDOC_ARGS=PANDOC_ARGS,
+            PANDOC_BACKEND="lua",
+        )
+        source_path = os.path.join(TEST_CONTENT_PATH, "valid_content.md")
+
+        with (
+            mock.patch.object(pandoc_reader, "convert_with_worker", return_value=None),
+            mock.patch.object(
+                PandocReader, "_run_pandoc", wraps=PandocReader._run_pandoc
+            ) as run_pandoc,
+        ):
+            PandocReader(settings).read(source_path)
+
+        run_pandoc.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,418 @@
+"""Time the stages each article goes through while it is read.
+
+The stages can also be traced as spans in the Trace Event Format read by
+chrome://tracing and Perfetto, each on the thread it ran in and naming the
+Pandoc processes it ran. The CPU time, peak memory and page faults of the
+Pandoc processes are added up for each article too.
+"""
+
+import contextlib
+import contextvars
+import dataclasses
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from .cache import atomic_write
+from .resources import ResourceUsage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOWEST = 10
+
+# Settings asking for a report of the time spent in each stage
+REPORT_SETTINGS = ("PANDOC_TIMINGS", "PANDOC_TIMINGS_FILE", "PANDOC_TIME_BUDGET")
+
+# Stages in the order articles go through them, the order they are reported in
+STAGES = (
+    "probe",
+    "read",
+    "front_matter",
+    "validation",
+    "bibliography",
+    "cache",
+    "pandoc",
+    "extraction",
+    "reading_time",
+    "metadata",
+    "transform",
+)
+PERCENTILES = (50, 90, 99)
+
+# Timings of running builds keyed on the id of their settings
+_TIMINGS = {}
+_TIMINGS_LOCK = threading.Lock()
+
+# Source path of the article being read in the current thread or task
+_CURRENT_ARTICLE = contextvars.ContextVar("current_article", default=None)
+
+# Arguments of the span being traced in the current thread or task
+_CURRENT_SPAN = contextvars.ContextVar("current_span", default=None)
+
+# Timings and source path of the stage being timed in the current thread or task
+_CURRENT_STAGE = contextvars.ContextVar("current_stage", default=None)
+
+
+def timings_enabled(settings):
+    """Check if the settings of a build ask for the reading of articles timed."""
+    return (
+        reports_timings(settings)
+        or bool(settings.get("PANDOC_TRACE_FILE"))
+        or bool(settings.get("PANDOC_RESOURCE_SUMMARY"))
+        # Metrics include histograms of the time spent in each stage
+        or bool(settings.get("PANDOC_METRICS_FILE"))
+    )
+
+
+def reports_timings(settings):
+    """Check if the settings of a build ask for a report of its timings."""
+    return any(settings.get(name) for name in REPORT_SETTINGS)
+
+
+def get_timings(settings):
+    """Return the Timings of a build, or None if it is not timed."""
+    if not timings_enabled(settings):
+        return None
+    with _TIMINGS_LOCK:
+        timings = _TIMINGS.get(id(settings))
+        if timings is None or timings.settings is not settings:
+            timings = Timings(settings)
+            _TIMINGS[id(settings)] = timings
+        return timings
+
+
+def record_subprocess(pid):
+    """Note that the span being traced, if any, runs the process with pid."""
+    arguments = _CURRENT_SPAN.get()
+    if arguments is not None:
+        arguments.setdefault("pandoc_pids", []).append(pid)
+
+
+def record_usage(usage):
+    """Add the ResourceUsage of a process to the stage being timed, if any.
+
+    The usage is added to the article the stage belongs to, and to the span
+    being traced.
+    """
+    if usage is None:
+        return
+    stage = _CURRENT_STAGE.get()
+    if stage is not None:
+        timings, source_path = stage
+        timings.add_usage(source_path, usage)
+    arguments = _CURRENT_SPAN.get()
+    if arguments is not None:
+        arguments.setdefault("pandoc_usage", []).append(dataclasses.asdict(usage))
+
+
+def finish_timings(settings):
+    """Stop timing a build, returning its Timings or None if it was not timed."""
+    with _TIMINGS_LOCK:
+        timings = _TIMINGS.get(id(settings))
+        if timings is None or timings.settings is not settings:
+            return None
+        del _TIMINGS[id(settings)]
+    return timings
+
+
+class Timings:
+    """Seconds spent in each stage of reading each article of a build.
+
+    Stages are attributed to the article given to article() in the thread
+    or asyncio task timing them, unless they name their article themselves.
+    Articles and stages are also traced as spans if PANDOC_TRACE_FILE is set.
+    """
+
+    def __init__(self, settings):
+        """Start timing the build with the given settings."""
+        self.settings = settings
+        self.budget = settings.get("PANDOC_TIME_BUDGET")
+        self._lock = threading.Lock()
+        self._articles = {}
+        self._usage = {}
+        self._over_budget = set()
+        self._events = [] if settings.get("PANDOC_TRACE_FILE") else None
+        self._threads = {}
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def article(self, source_path):
+        """Attribute the stages timed within to the article at source_path.
+
+        Warns once the time spent on the article is over PANDOC_TIME_BUDGET.
+        """
+        if _CURRENT_ARTICLE.get() == source_path:
+            # Already within a span for the article
+            yield
+            return
+
+        token = _CURRENT_ARTICLE.set(source_path)
+        try:
+            with self._span(os.path.basename(source_path), "article", source_path):
+                yield
+        finally:
+            _CURRENT_ARTICLE.reset(token)
+            self._check_budget(source_path)
+
+    @contextlib.contextmanager
+    def stage(self, stage, source_path=None):
+        """Time a stage of reading the article at source_path or the current one."""
+        source_path = source_path or _CURRENT_ARTICLE.get()
+        token = _CURRENT_STAGE.set((self, source_path))
+        start = time.perf_counter()
+        try:
+            with self._span(stage, "stage", source_path):
+                yield
+        finally:
+            self.add(source_path, stage, time.perf_counter() - start)
+            _CURRENT_STAGE.reset(token)
+
+    def add(self, source_path, stage, seconds):
+        """Add seconds to a stage of the article at source_path."""
+        if source_path is None:
+            # Work done for no article in particular
+            return
+        with self._lock:
+            stages = self._articles.setdefault(source_path, {})
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def add_usage(self, source_path, usage):
+        """Add the ResourceUsage of a Pandoc process to the article at source_path."""
+        if source_path is None:
+            return
+        with self._lock:
+            total = self._usage.get(source_path, ResourceUsage())
+            self._usage[source_path] = total + usage
+
+    def articles(self):
+        """Return the seconds spent in each stage keyed on source path."""
+        with self._lock:
+            return {path: dict(stages) for path, stages in self._articles.items()}
+
+    def usage(self):
+        """Return the ResourceUsage of the Pandoc processes of each article."""
+        with self._lock:
+            return dict(self._usage)
+
+    def report(self, slowest=DEFAULT_SLOWEST):
+        """Return totals, percentiles and the slowest articles as a dict."""
+        articles = self.articles()
+        usage = self.usage()
+        totals = {path: sum(stages.values()) for path, stages in articles.items()}
+
+        stages = {}
+        for stage in sorted(
+            {stage for timed in articles.values() for stage in timed},
+            key=_stage_order,
+        ):
+            stages[stage] = _summarize(
+                [timed[stage] for timed in articles.values() if stage in timed]
+            )
+
+        report = {
+            "articles": len(articles),
+            "total": sum(totals.values()),
+            "per_article": _summarize(list(totals.values())),
+            "stages": stages,
+            "slowest": [
+                {
+                    "source_path": path,
+                    "total": totals[path],
+                    "stages": articles[path],
+                    "resources": _usage_dict(usage.get(path)),
+                }
+                for path in sorted(totals, key=totals.get, reverse=True)[:slowest]
+            ],
+        }
+        if usage:
+            report["resources"] = {
+                **dataclasses.asdict(sum(usage.values(), ResourceUsage())),
+                # The articles Pandoc needed the most memory for
+                "largest": [
+                    {"source_path": path, **dataclasses.asdict(usage[path])}
+                    for path in sorted(
+                        usage, key=lambda path: usage[path].max_rss, reverse=True
+                    )[:slowest]
+                ],
+            }
+        if self.budget:
+            report["budget"] = self.budget
+            report["over_budget"] = sorted(
+                path for path, total in totals.items() if total > self.budget
+            )
+        return report
+
+    def trace(self):
+        """Return the spans traced as a Trace Event Format object."""
+        with self._lock:
+            events = list(self._events or ())
+            threads = dict(self._threads)
+
+        process_id = os.getpid()
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": process_id,
+                "tid": 0,
+                "args": {"name": "pelican"},
+            },
+            *(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": process_id,
+                    "tid": thread_id,
+                    "args": {"name": name},
+                }
+                for thread_id, name in sorted(threads.items())
+            ),
+        ]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    @contextlib.contextmanager
+    def _span(self, name, category, source_path):
+        """Trace what is done within as a span if tracing."""
+        if self._events is None:
+            yield
+            return
+
+        arguments = {} if source_path is None else {"source_path": source_path}
+        token = _CURRENT_SPAN.set(arguments)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            _CURRENT_SPAN.reset(token)
+            thread_id = threading.get_native_id()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": thread_id,
+                "args": arguments,
+            }
+            with self._lock:
+                self._events.append(event)
+                self._threads.setdefault(thread_id, threading.current_thread().name)
+
+    def _check_budget(self, source_path):
+        """Warn the first time an article takes longer than the budget."""
+        if not self.budget:
+            return
+        with self._lock:
+            total = sum(self._articles.get(source_path, {}).values())
+            if total <= self.budget or source_path in self._over_budget:
+                return
+            self._over_budget.add(source_path)
+        logger.warning(
+            "Reading %s took %.3f s, over the PANDOC_TIME_BUDGET of %s s",
+            source_path,
+            total,
+            self.budget,
+        )
+
+
+def write_trace(timings):
+    """Write the spans traced in a build to PANDOC_TRACE_FILE."""
+    atomic_write(
+        os.path.abspath(timings.settings["PANDOC_TRACE_FILE"]),
+        json.dumps(timings.trace()),
+    )
+
+
+def write_report(timings):
+    """Log the report of a build and write it to PANDOC_TIMINGS_FILE if set."""
+    settings = timings.settings
+    report = timings.report(settings.get("PANDOC_TIMINGS_SLOWEST", DEFAULT_SLOWEST))
+
+    logger.info(
+        "Pandoc reader spent %.3f s on %d articles, %.3f s per article at the"
+        " median and %.3f s at most",
+        report["total"],
+        report["articles"],
+        report["per_article"]["p50"],
+        report["per_article"]["max"],
+    )
+    for stage, summary in report["stages"].items():
+        logger.info(
+            "  %-12s %9.3f s total, p50 %.4f s, p90 %.4f s, p99 %.4f s, max %.4f s",
+            stage,
+            summary["total"],
+            summary["p50"],
+            summary["p90"],
+            summary["p99"],
+            summary["max"],
+        )
+    for article in report["slowest"]:
+        logger.info("  %9.3f s %s", article["total"], article["source_path"])
+
+    report_path = settings.get("PANDOC_TIMINGS_FILE")
+    if report_path:
+        atomic_write(os.path.abspath(report_path), json.dumps(report, indent=1))
+    return report
+
+
+def log_resource_summary(timings):
+    """Log the resources used by Pandoc in a build and its largest articles."""
+    report = timings.report(
+        timings.settings.get("PANDOC_TIMINGS_SLOWEST", DEFAULT_SLOWEST)
+    )
+    resources = report.get("resources")
+    if resources is None:
+        return
+    logger.info(
+        "Pandoc ran %d processes using %.3f s of user and %.3f s of system CPU"
+        " time, %d major page faults and at most %.1f MiB of memory",
+        resources["processes"],
+        resources["user_time"],
+        resources["system_time"],
+        resources["major_faults"],
+        resources["max_rss"] / 2**20,
+    )
+    for article in resources["largest"]:
+        logger.info(
+            "  %8.1f MiB %7.3f s CPU %s",
+            article["max_rss"] / 2**20,
+            article["user_time"] + article["system_time"],
+            article["source_path"],
+        )
+
+
+def _usage_dict(usage):
+    """Return a ResourceUsage as a dict, or None if there is none."""
+    return None if usage is None else dataclasses.asdict(usage)
+
+
+def _summarize(values):
+    """Return the total, count, mean, percentiles and maximum of values."""
+    values = sorted(values)
+    summary = {
+        "total": sum(values),
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+    }
+    for percentile in PERCENTILES:
+        summary[f"p{percentile}"] = _percentile(values, percentile)
+    summary["max"] = values[-1] if values else 0.0
+    return summary
+
+
+def _percentile(values, percentile):
+    """Return the nearest-rank percentile of the sorted values."""
+    if not values:
+        return 0.0
+    rank = math.ceil(percentile / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+def _stage_order(stage):
+    """Sort known stages in the order articles go through them."""
+    return STAGES.index(stage) if stage in STAGES else len(STAGES), stage
@@ -0,0 +1,256 @@
+"""Convert content in long-running Pandoc processes fed over a pipe."""
+
+import atexit
+import contextlib
+import os
+import struct
+import subprocess
+import threading
+
+from .metrics import count_process_started
+from .prefetch import available_cpus
+from .timing import record_subprocess
+
+# Lua filter that converts the documents sent to a worker on its stdin
+WORKER_DRIVER = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "filters", "worker.lua")
+)
+
+# Workers are replaced after converting this many documents or once they use
+# more than this many MiB of memory, whichever comes first
+DEFAULT_WORKER_MAX_DOCUMENTS = 500
+DEFAULT_WORKER_MAX_MEMORY = 1024
+
+# Frames are a 4-byte big-endian length followed by that many bytes
+FRAME_HEADER = struct.Struct(">I")
+
+# First byte of the responses to documents converted, the responses to
+# documents that failed starting with "-" and the error instead
+STATUS_CONVERTED = b"+"
+
+# Options that differ from one document to another, such as the
+# bibliographies found next to each article, mapped to the metadata fields
+# they set. They are sent along with each document rather than given to the
+# worker, so that documents differing only in them share workers.
+DOCUMENT_OPTIONS = {
+    "--bibliography": "bibliography",
+    "--csl": "csl",
+    "--citation-abbreviations": "citation-abbreviations",
+}
+
+# Workers waiting for a document, least recently used first
+_IDLE_WORKERS = []
+_IDLE_WORKERS_LOCK = threading.Lock()
+
+
+class PandocWorkerError(Exception):
+    """Raised when a worker fails to convert a document or stops answering."""
+
+
+def convert_with_worker(
+    pandoc_cmd,
+    batch_plan,
+    content,
+    max_documents=DEFAULT_WORKER_MAX_DOCUMENTS,
+    max_memory=DEFAULT_WORKER_MAX_MEMORY,
+):
+    """Convert content with pandoc_cmd in an idle worker, starting one if needed.
+
+    batch_plan is the BatchPlan for pandoc_cmd. Returns None if the worker
+    cannot convert the content, so that the caller may run Pandoc itself
+    instead.
+    """
+    worker_cmd, document_options = split_document_options(pandoc_cmd)
+    try:
+        worker = _take_worker(worker_cmd, batch_plan)
+    except (OSError, PandocWorkerError):
+        return None
+
+    record_subprocess(worker.pid)
+    try:
+        output = worker.convert(content, document_options)
+    except PandocWorkerError:
+        if worker.is_running():
+            _return_worker(worker, max_documents, max_memory)
+        else:
+            worker.stop()
+        return None
+
+    _return_worker(worker, max_documents, max_memory)
+    return output
+
+
+def split_document_options(pandoc_cmd):
+    """Split the options in DOCUMENT_OPTIONS out of pandoc_cmd.
+
+    Returns the rest of the command, which workers are started with, and
+    the metadata fields and values set by the options split out.
+    """
+    worker_cmd = [pandoc_cmd[0]]
+    document_options = []
+    arguments = iter(pandoc_cmd[1:])
+    for argument in arguments:
+        option, has_value, value = argument.partition("=")
+        if option not in DOCUMENT_OPTIONS:
+            worker_cmd.append(argument)
+            continue
+
+        if not has_value:
+            value = next(arguments, "")
+        document_options.append((DOCUMENT_OPTIONS[option], value))
+    return tuple(worker_cmd), tuple(document_options)
+
+
+def stop_workers():
+    """Stop all the workers waiting for a document."""
+    with _IDLE_WORKERS_LOCK:
+        workers = _IDLE_WORKERS[:]
+        del _IDLE_WORKERS[:]
+    for worker in workers:
+        worker.stop()
+
+
+atexit.register(stop_workers)
+
+
+class PandocWorker:
+    """A Pandoc process converting documents read from its stdin."""
+
+    def __init__(self, pandoc_cmd, batch_plan):
+        """Start a worker converting documents with pandoc_cmd."""
+        self.pandoc_cmd = tuple(pandoc_cmd)
+        self.documents = 0
+
+        # Pandoc reads an empty input before running the driver, which then
+        # takes over stdin, and writes nothing to stdout until it is done
+        count_process_started()
+        self._process = subprocess.Popen(
+            [
+                pandoc_cmd[0],
+                f"--lua-filter={WORKER_DRIVER}",
+                *pandoc_cmd[1:],
+                os.devnull,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self._send(
+                "".join(
+                    [
+                        f"{batch_plan.input_format}\n",
+                        *(
+                            f"{kind} {path}\n" if path else f"{kind}\n"
+                            for kind, path in batch_plan.steps
+                        ),
+                    ]
+                ).encode("utf-8")
+            )
+        except PandocWorkerError:
+            self.stop()
+            raise
+
+    def convert(self, content, document_options=()):
+        """Convert a document and return the output.
+
+        document_options are the metadata fields and values to set for this
+        document only, as returned by split_document_options().
+        """
+        self._send(
+            "".join(
+                [
+                    *(f"{field} {value}\n" for field, value in document_options),
+                    "\n",
+                    content,
+                ]
+            ).encode("utf-8")
+        )
+        response = self._receive()
+        self.documents += 1
+
+        status, output = response[:1], response[1:].decode("utf-8")
+        if status != STATUS_CONVERTED:
+            raise PandocWorkerError(output)
+        return output
+
+    @property
+    def pid(self):
+        """Return the process ID of the worker."""
+        return self._process.pid
+
+    def is_running(self):
+        """Check if the worker process has not exited."""
+        return self._process.poll() is None
+
+    def memory_usage(self):
+        """Return the resident memory of the worker in MiB, or None if unknown."""
+        try:
+            with open(f"/proc/{self._process.pid}/status") as file_handle:
+                for line in file_handle:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+    def stop(self):
+        """Close the stdin of the worker and wait for it to exit."""
+        for stream in (self._process.stdin, self._process.stdout):
+            with contextlib.suppress(OSError):
+                stream.close()
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+    def _send(self, payload):
+        """Write a frame to the worker."""
+        try:
+            self._process.stdin.write(FRAME_HEADER.pack(len(payload)))
+            self._process.stdin.write(payload)
+            self._process.stdin.flush()
+        except OSError as write_error:
+            raise PandocWorkerError(str(write_error)) from write_error
+
+    def _receive(self):
+        """Read a frame from the worker."""
+        header = self._process.stdout.read(FRAME_HEADER.size)
+        if len(header) < FRAME_HEADER.size:
+            raise PandocWorkerError("Worker exited before answering.")
+        (length,) = FRAME_HEADER.unpack(header)
+
+        payload = self._process.stdout.read(length)
+        if len(payload) < length:
+            raise PandocWorkerError("Worker exited before answering.")
+        return payload
+
+
+def _take_worker(pandoc_cmd, batch_plan):
+    """Return an idle worker for pandoc_cmd or start a new one."""
+    pandoc_cmd = tuple(pandoc_cmd)
+    with _IDLE_WORKERS_LOCK:
+        for index in range(len(_IDLE_WORKERS) - 1, -1, -1):
+            if _IDLE_WORKERS[index].pandoc_cmd == pandoc_cmd:
+                return _IDLE_WORKERS.pop(index)
+    return PandocWorker(pandoc_cmd, batch_plan)
+
+
+def _return_worker(worker, max_documents, max_memory):
+    """Keep a worker for the next document unless it is due to be replaced."""
+    memory_usage = worker.memory_usage()
+    if worker.documents >= max_documents or (
+        memory_usage is not None and memory_usage > max_memory
+    ):
+        worker.stop()
+        return
+
+    # Keep no more idle workers than could be busy at once, stopping the
+    # least recently used ones, which may serve other command lines
+    with _IDLE_WORKERS_LOCK:
+        _IDLE_WORKERS.append(worker)
+        surplus = _IDLE_WORKERS[: max(len(_IDLE_WORKERS) - available_cpus(), 0)]
+        del _IDLE_WORKERS[: len(surplus)]
+    for surplus_worker in surplus:
+        surplus_worker.stop()
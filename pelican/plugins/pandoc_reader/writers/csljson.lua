@@ -0,0 +1,85 @@
+-- writes the references of a bibliography as CSL JSON
+--
+-- Unlike Pandoc's own csljson writer, rich text such as case protection
+-- is kept as CSL JSON markup so that citations are rendered the same as
+-- when Pandoc reads the original bibliography.
+--
+-- Citeproc reads CSL JSON text as it is, without decoding entities, and
+-- has no markup for math. Text is written unescaped, and bibliographies
+-- with math or with text citeproc would take for markup are refused, so
+-- that the original bibliography is used instead.
+
+local function escape(text)
+  if text:find("</?[ibs][^>]*>") then
+    error("text looking like CSL JSON markup cannot be written: " .. text)
+  end
+  return text
+end
+
+local render_inlines
+
+local function render_inline(el)
+  if el.t == "Str" then
+    return escape(el.text)
+  elseif el.t == "Math" then
+    -- Citeproc renders math from BibTeX as math, which CSL JSON cannot hold
+    error("math cannot be written as CSL JSON: " .. el.text)
+  elseif el.t == "Space" or el.t == "SoftBreak" or el.t == "LineBreak" then
+    return " "
+  elseif el.t == "Emph" then
+    return "<i>" .. render_inlines(el.content) .. "</i>"
+  elseif el.t == "Strong" then
+    return "<b>" .. render_inlines(el.content) .. "</b>"
+  elseif el.t == "SmallCaps" then
+    return '<span style="font-variant:small-caps;">'
+      .. render_inlines(el.content) .. "</span>"
+  elseif el.t == "Superscript" then
+    return "<sup>" .. render_inlines(el.content) .. "</sup>"
+  elseif el.t == "Subscript" then
+    return "<sub>" .. render_inlines(el.content) .. "</sub>"
+  elseif el.t == "Span" and el.classes:includes("nocase") then
+    return '<span class="nocase">' .. render_inlines(el.content) .. "</span>"
+  elseif el.t == "Quoted" then
+    if el.quotetype == "SingleQuote" then
+      return "‘" .. render_inlines(el.content) .. "’"
+    end
+    return "“" .. render_inlines(el.content) .. "”"
+  elseif el.content then
+    return render_inlines(el.content)
+  end
+  return escape(pandoc.utils.stringify(el))
+end
+
+render_inlines = function(inlines)
+  local rendered = {}
+  for _, el in ipairs(inlines) do
+    rendered[#rendered + 1] = render_inline(el)
+  end
+  return table.concat(rendered)
+end
+
+local function to_json_value(value)
+  local value_type = pandoc.utils.type(value)
+  if value_type == "Inlines" then
+    return render_inlines(value)
+  elseif value_type == "Blocks" then
+    return escape(pandoc.utils.stringify(value))
+  elseif value_type == "List" then
+    local list = {}
+    for index, item in ipairs(value) do
+      list[index] = to_json_value(item)
+    end
+    return list
+  elseif value_type == "table" then
+    local map = {}
+    for key, item in pairs(value) do
+      map[key] = to_json_value(item)
+    end
+    return map
+  end
+  return value
+end
+
+function Writer(doc, opts)
+  return pandoc.json.encode(to_json_value(doc.meta.references or pandoc.List()))
+end
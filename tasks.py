@@ -38,6 +38,16 @@ def tests(c, deprecations=False):
     c.run(f"{CMD_PREFIX}pytest {deprecations_flag}", pty=PTY)
 
 
+@task
+def benchmark(c, sizes="100 1000 10000", output="benchmark.json"):
+    """Benchmark the reader on generated corpora of the given `--sizes`."""
+    c.run(
+        f"{CMD_PREFIX}python -m pelican.plugins.{PKG_NAME}.benchmark"
+        f" --sizes {sizes} --output {output}",
+        pty=PTY,
+    )
+
+
 @task
 def format(c, check=False, diff=False):
     """Run Ruff's auto-formatter, optionally with `--check` or `--diff`."""